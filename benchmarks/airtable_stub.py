@@ -0,0 +1,292 @@
+"""A local stand-in for the Airtable API and attachment hosts, for exercising the fetcher and mirror in tests and benchmarks without a network."""
+
+import json
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Final, Mapping, Optional, Type, Union
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from lakeland_db_migrate_v4.sources import AIRTABLE_JSON, stream_from_file
+
+STUB_BASE_ID: Final = "appLakelandStub"
+STUB_TOKEN: Final = "patLakelandStub"
+MAX_PAGE_SIZE: Final = 100
+ATTACHMENT_PREFIX: Final = "/attachments/"
+
+range_regex = re.compile(r"^bytes=(\d+)-$")
+
+
+def api_shape(rec: AIRTABLE_JSON) -> dict[str, Any]:
+    """
+    Turn an airtable-export record back into what the API returns.
+
+    :param rec: A raw record with airtable_id and airtable_createdTime
+    :return: A record with id, createdTime and fields
+    """
+    return {
+        "id": rec["airtable_id"],
+        "createdTime": rec["airtable_createdTime"],
+        "fields": {
+            k: v
+            for k, v in rec.items()
+            if k not in ("airtable_id", "airtable_createdTime")
+        },
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer list records requests the way Airtable does."""
+
+    protocol_version = "HTTP/1.1"
+    server: "StubServer"
+
+    def send_json(self, status: int, body: Any) -> None:
+        """Send a json response that keeps the connection open."""
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_error_json(self, status: int, error_type: str) -> None:
+        """Send an Airtable style error."""
+        self.send_json(status, {"error": {"type": error_type}})
+
+    def send_attachment(self, name: str) -> None:
+        """Serve an attachment, honouring a Range header and any interruption asked for."""
+        stub = self.server.stub
+        with stub._lock:
+            stub.attachment_requests += 1
+        content = stub.attachments.get(name)
+        if content is None:
+            self.send_error_json(404, "NOT_FOUND")
+            return
+
+        start = 0
+        m = range_regex.match(self.headers.get("Range", ""))
+        if m:
+            start = int(m.group(1))
+            if start >= len(content):
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */{}".format(len(content)))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                "Content-Range",
+                "bytes {}-{}/{}".format(start, len(content) - 1, len(content)),
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+
+        with stub._lock:
+            cut = stub.interrupt.pop(name, None)
+        if cut is not None and start < cut < len(content):
+            # Drop the connection partway through, like a flaky network would
+            self.wfile.write(content[start:cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(content[start:])
+
+    def do_GET(self) -> None:
+        """Serve one page of a table, or an attachment."""
+        stub = self.server.stub
+        if self.path.startswith(ATTACHMENT_PREFIX):
+            self.send_attachment(unquote(self.path[len(ATTACHMENT_PREFIX) :]))
+            return
+        stub.count_request()
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.over_rate_limit():
+            self.send_error_json(429, "RATE_LIMIT_REACHED")
+            return
+        if self.headers.get("Authorization") != "Bearer {}".format(stub.token):
+            self.send_error_json(401, "AUTHENTICATION_REQUIRED")
+            return
+
+        parts = urlsplit(self.path)
+        segments = [unquote(s) for s in parts.path.strip("/").split("/")]
+        if (
+            len(segments) != 3
+            or segments[0] != "v0"
+            or segments[1] != stub.base_id
+            or segments[2] not in stub.tables
+        ):
+            self.send_error_json(404, "NOT_FOUND")
+            return
+
+        query = parse_qs(parts.query)
+        try:
+            page_size = min(
+                int(query.get("pageSize", [MAX_PAGE_SIZE])[0]), MAX_PAGE_SIZE
+            )
+            offset = int(query.get("offset", ["0"])[0])
+        except ValueError:
+            self.send_error_json(422, "LIST_RECORDS_ITERATOR_NOT_AVAILABLE")
+            return
+
+        records = stub.tables[segments[2]]
+        body: dict[str, Any] = {
+            "records": [api_shape(r) for r in records[offset : offset + page_size]]
+        }
+        if offset + page_size < len(records):
+            body["offset"] = str(offset + page_size)
+        self.send_json(200, body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Keep quiet."""
+
+
+class StubServer(ThreadingHTTPServer):
+    """A threading HTTP server that knows which stub it serves."""
+
+    daemon_threads = True
+
+    def __init__(self, stub: "AirtableStub") -> None:
+        """Bind to a free port on localhost."""
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.stub = stub
+
+
+class AirtableStub:
+    """
+    Serve source tables over a local HTTP server the way the Airtable API would.
+
+    Use it as a context manager and point the fetcher at its url.
+    """
+
+    def __init__(
+        self,
+        tables: Mapping[str, list[AIRTABLE_JSON]],
+        base_id: str = STUB_BASE_ID,
+        token: str = STUB_TOKEN,
+        rate_limit: Optional[float] = None,
+        latency: float = 0.0,
+        attachments: Optional[Mapping[str, bytes]] = None,
+    ) -> None:
+        """
+        Set up a stub without starting it.
+
+        :param tables: Raw records in airtable-export shape by table name
+        :param base_id: The base ID requests have to use
+        :param token: The token requests have to carry
+        :param rate_limit: Answer 429 once more than this many requests arrive within a second
+        :param latency: Seconds to wait before answering, to look like a real network
+        :param attachments: File contents served under /attachments/<name>
+        """
+        self.tables = dict(tables)
+        self.base_id = base_id
+        self.token = token
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self.attachments = dict(attachments or {})
+        # Attachment name -> byte offset to drop the connection at, once
+        self.interrupt: dict[str, int] = {}
+        self.requests = 0
+        self.attachment_requests = 0
+        self.rate_limited = 0
+        self._recent: deque[float] = deque()
+        self._lock = threading.Lock()
+        self._server: Optional[StubServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_directory(
+        cls, source_dir: Union[str, Path], **kwargs: Any
+    ) -> "AirtableStub":
+        """
+        Serve the airtable-export files in a directory.
+
+        :param source_dir: Directory holding e.g. files.json and items.json
+        :return: An AirtableStub with one table per file
+        """
+        tables = {
+            path.stem: list(stream_from_file(path.name, source_dir=Path(source_dir)))
+            for path in sorted(Path(source_dir).glob("*.json"))
+        }
+        return cls(tables, **kwargs)
+
+    @property
+    def url(self) -> str:
+        """Where the stub is listening."""
+        if self._server is None:
+            raise RuntimeError("Stub isn't running")
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    def attachment_url(self, name: str) -> str:
+        """
+        Where an attachment is served.
+
+        :param name: The attachment's name in attachments
+        :return: A URL
+        """
+        return "{}{}{}".format(self.url, ATTACHMENT_PREFIX, quote(name))
+
+    def count_request(self) -> None:
+        """Note a request for the counters and the rate limit."""
+        with self._lock:
+            self.requests += 1
+            self._recent.append(time.monotonic())
+
+    def over_rate_limit(self) -> bool:
+        """Whether more requests came in over the last second than allowed."""
+        if self.rate_limit is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if len(self._recent) > self.rate_limit:
+                self.rate_limited += 1
+                return True
+            return False
+
+    def start(self) -> "AirtableStub":
+        """
+        Start serving on a background thread.
+
+        :return: The running stub
+        """
+        self._server = StubServer(self)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Shut the server down.
+
+        :return: None
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "AirtableStub":
+        """Start the stub."""
+        return self.start()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        """Stop the stub."""
+        self.stop()
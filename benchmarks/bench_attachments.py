@@ -0,0 +1,76 @@
+"""Time mirroring attachments from the local stub, then checking an up to date mirror.
+
+Usage: python benchmarks/bench_attachments.py [--attachments N] [--size BYTES] [--workers N]
+
+Every attachment is served by the stub. Half of them drop the connection
+partway through the first time, and each is shared by two records. The
+second run finds everything already mirrored. tests/test_attachments.py
+checks resume, skip and rewrite behaviour.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+from airtable_stub import AirtableStub
+
+from lakeland_db_migrate_v4.attachments import mirror_attachments
+
+
+def main() -> None:
+    """Run both passes and report download throughput."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attachments", type=int, default=200)
+    parser.add_argument("--size", type=int, default=256 * 1024)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    contents = {
+        "summary_{:05d}.pdf".format(i): os.urandom(args.size)
+        for i in range(args.attachments)
+    }
+    with AirtableStub(
+        {}, attachments=contents
+    ) as stub, tempfile.TemporaryDirectory() as tmp:
+        for i, name in enumerate(contents):
+            if i % 2:
+                stub.interrupt[name] = args.size // 3
+
+        def attachment(i: int, name: str) -> dict:
+            return {
+                "id": "att{:014d}".format(i),
+                "url": stub.attachment_url(name),
+                "filename": name,
+                "size": args.size,
+                "type": "application/pdf",
+            }
+
+        records = [
+            SimpleNamespace(interview_summary_attachment=[attachment(i, name)])
+            for i, name in enumerate(contents)
+            for _ in range(2)
+        ]
+
+        start = time.perf_counter()
+        report = mirror_attachments(records, tmp, args.workers)
+        elapsed = time.perf_counter() - start
+        print(
+            "first run: {} attachments, {} resumed, {} failed, {:.2f}s, {:.1f} MB/s".format(
+                report.downloaded,
+                report.resumed,
+                len(report.failed),
+                elapsed,
+                report.bytes / elapsed / 1e6,
+            )
+        )
+
+        report = mirror_attachments(records, tmp, args.workers)
+        print(
+            "second run: {} skipped in {:.2f}s".format(report.skipped, report.elapsed)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the memory held by a tuple of source dataclasses with a ColumnarTable.
+
+Usage: python benchmarks/bench_columnar.py [ROWS ...]
+
+Raw records are generated lazily inside each measurement so the figures
+include the strings each representation keeps alive.
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+from typing import Any, Callable
+
+from lakeland_db_migrate_v4.columnar import ColumnarTable
+from lakeland_db_migrate_v4.parallel import TABLE_FIELDMAPS
+from lakeland_db_migrate_v4.sources import (
+    FileSourceRecord,
+    ItemSourceRecord,
+    iter_transformed,
+)
+
+from synthetic import Sizes, files, items
+
+TABLES = {"files": (files, FileSourceRecord), "items": (items, ItemSourceRecord)}
+
+
+def retained(build: Callable[[], Any]) -> tuple[int, Any]:
+    """Measure how many bytes the result of build keeps allocated."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before, result)
+
+
+def main() -> None:
+    """Print bytes per row for each table and size."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", nargs="*", type=int, default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(
+        "{:>6} {:>9} {:>14} {:>14} {:>7}".format(
+            "table", "rows", "tuple (MB)", "columnar (MB)", "saved"
+        )
+    )
+    for rows in args.rows:
+        for table, (gen, cls) in TABLES.items():
+            # Files is the unit synthetic exports are sized by; items are a third of that
+            sizes = Sizes(rows if table == "files" else rows * 3)
+
+            def validated() -> Any:
+                return iter_transformed(
+                    gen(random.Random(0), sizes), cls, TABLE_FIELDMAPS[table]
+                )
+
+            as_tuple, held = retained(lambda: tuple(validated()))
+            del held
+            as_columns, held = retained(
+                lambda: ColumnarTable.from_records(validated(), cls)
+            )
+            del held
+            print(
+                "{:>6} {:>9} {:>14.1f} {:>14.1f} {:>6.0%}".format(
+                    table,
+                    rows,
+                    as_tuple / 1e6,
+                    as_columns / 1e6,
+                    1 - as_columns / as_tuple,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Compare the date normalizer against the old per-record derive_date path.
+
+Usage: python benchmarks/bench_dates.py [--dates N] [--seed N]
+
+The old path called derive_date and then strftime twice for every Items
+record, and only understood full ISO dates. Both are timed over a column
+of ISO dates (as repetitive as a real export, where many items share a
+date), and normalize_dates alone over a column of mixed fuzzy dates.
+tests/test_utils.py checks normalize_date agrees with derive_date and
+handles partial, circa and ranged dates.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+from lakeland_db_migrate_v4.utils import derive_date, normalize_date, normalize_dates
+
+sys.path.insert(0, str(Path(__file__).parent))
+from synthetic import fuzzy_date, iso_date  # noqa: E402
+
+
+def legacy(datestring: str) -> tuple[str, str]:
+    """What ItemRecord did with a created date before normalize_date."""
+    dtobj = derive_date(datestring)
+    if dtobj is None:
+        return ("", "")
+    return (dtobj.strftime("%Y-%m-%d"), dtobj.strftime("%Y"))
+
+
+def timed(label: str, count: int, fn) -> None:
+    """Run fn once and print its throughput."""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print("{:>24}: {:.2f}s, {:.0f} dates/s".format(label, elapsed, count / elapsed))
+
+
+def main() -> None:
+    """Time both paths."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dates", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    iso_pool = [iso_date(rng) for _ in range(max(args.dates // 50, 1))]
+    iso_corpus = [rng.choice(iso_pool) for _ in range(args.dates)]
+    fuzzy_pool = [fuzzy_date(rng) for _ in range(max(args.dates // 50, 1))]
+    fuzzy_corpus = [rng.choice(fuzzy_pool) for _ in range(args.dates)]
+
+    normalize_date.cache_clear()
+    timed("per-record derive_date", args.dates, lambda: [legacy(d) for d in iso_corpus])
+    timed("normalize_dates (ISO)", args.dates, lambda: normalize_dates(iso_corpus))
+    normalize_date.cache_clear()
+    timed("normalize_dates (fuzzy)", args.dates, lambda: normalize_dates(fuzzy_corpus))
+    unparsed = sum(
+        1 for n in normalize_dates(fuzzy_pool) if n is not None and not n.parsed
+    )
+    print("{} of {} distinct fuzzy dates unparsed".format(unparsed, len(fuzzy_pool)))
+
+
+if __name__ == "__main__":
+    main()
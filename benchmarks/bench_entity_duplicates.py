@@ -0,0 +1,179 @@
+"""Time duplicate entity detection at growing scales and report how many planted duplicates it finds.
+
+Usage: python benchmarks/bench_entity_duplicates.py [--entities N ...] [--compare N] [--seed N]
+
+Entities get made-up names, and about one in twenty is copied with a
+typo, a respelling, its name parts reordered or its name moved into
+alt_name. Each copy is linked from an item and a relationship. The time
+per entity should stay roughly flat as the table grows while recall
+holds; tests/test_entity_duplicates.py checks recall and the links on a
+small table. At --compare entities, every pair is also scored to see
+what blocking misses.
+"""
+
+import argparse
+import random
+import string
+import time
+from itertools import combinations
+from types import SimpleNamespace
+from typing import Any, Callable
+
+from lakeland_db_migrate_v4.entity_duplicates import (
+    DEFAULT_THRESHOLD,
+    find_duplicate_records,
+    name_similarity,
+    name_variants,
+)
+
+SYLLABLES = [
+    onset + vowel + coda
+    for onset in "bcdfghjklmnprstvwz"
+    for vowel in ("a", "e", "i", "o", "u", "ai", "ea", "ou")
+    for coda in ("", "n", "r", "l", "st")
+]
+
+
+def made_up_name(rng: random.Random) -> str:
+    """A name part that is probably unique."""
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def typo(rng: random.Random, name: str) -> str:
+    """Drop or change one letter of the longest part of a name."""
+    parts = name.split()
+    longest = max(range(len(parts)), key=lambda i: len(parts[i]))
+    word = parts[longest]
+    i = rng.randrange(1, len(word))
+    if rng.random() < 0.5:
+        word = word[:i] + word[i + 1 :]
+    else:
+        word = word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1 :]
+    parts[longest] = word
+    return " ".join(parts)
+
+
+def respell(rng: random.Random, name: str) -> str:
+    """Swap letters that sound alike."""
+    for a, b in (("i", "y"), ("c", "k"), ("ph", "f"), ("s", "z"), ("o", "ou")):
+        if a in name:
+            return name.replace(a, b, 1)
+    return name + "e"
+
+
+def reorder(rng: random.Random, name: str) -> str:
+    """Surname first."""
+    given, surname = name.rsplit(" ", 1)
+    return "{}, {}".format(surname, given)
+
+
+VARIANTS: list[Callable[[random.Random, str], str]] = [typo, respell, reorder]
+
+
+def generate(
+    count: int, seed: int
+) -> tuple[list[Any], dict[str, list[Any]], set[tuple[str, str]]]:
+    """Make entities with planted duplicates, and items and relationships linking to the copies."""
+    rng = random.Random(seed)
+    entities = []
+    items = []
+    relationships = []
+    planted = set()
+    for i in range(count):
+        idno = "recE{:09d}".format(i)
+        if entities and rng.random() < 0.05:
+            original = rng.choice(entities)
+            if rng.random() < 0.25:
+                name, alt_name = (
+                    made_up_name(rng) + " " + made_up_name(rng),
+                    original.name,
+                )
+            else:
+                name, alt_name = rng.choice(VARIANTS)(rng, original.name), ""
+            rec = SimpleNamespace(
+                airtable_idno=idno,
+                airtable_created_time="2021-03-04T15:16:17.000Z",
+                name=name,
+                alt_name=alt_name,
+                category=original.category,
+                lchp_source_code="",
+                date_of_birth="",
+            )
+            planted.add(tuple(sorted((original.airtable_idno, idno))))
+            items.append(
+                SimpleNamespace(
+                    airtable_idno="recI{:09d}".format(i), linked_people=[idno]
+                )
+            )
+            relationships.append(
+                SimpleNamespace(
+                    airtable_idno="recR{:09d}".format(i),
+                    entity_1=idno,
+                    entity_2=original.airtable_idno,
+                )
+            )
+        else:
+            rec = SimpleNamespace(
+                airtable_idno=idno,
+                airtable_created_time="2021-03-04T15:16:17.000Z",
+                name="{} {}".format(made_up_name(rng), made_up_name(rng)),
+                alt_name="",
+                category=rng.choice(["Person", "Person", "Organization"]),
+                lchp_source_code="",
+                date_of_birth="",
+            )
+        entities.append(rec)
+    return (entities, {"items": items, "relationships": relationships}, planted)
+
+
+def main() -> None:
+    """Run each scale, report recall, compare against all pairs."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, nargs="+", default=[2000, 8000, 32000])
+    parser.add_argument("--compare", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for count in args.entities:
+        entities, linking, planted = generate(count, args.seed)
+        report = find_duplicate_records(entities, linking)
+        suggested = {tuple(sorted((s.keep, s.merge))): s for s in report.suggestions}
+        found = planted & set(suggested)
+        recall = len(found) / len(planted)
+        precision = len(found) / len(suggested) if suggested else 1.0
+        print(
+            "{:>7} entities: {:>8} candidate pairs, {:.2f}s ({:.0f} us/entity), recall {:.1%}, precision {:.1%}".format(
+                count,
+                report.candidate_pairs,
+                report.elapsed,
+                report.elapsed / count * 1e6,
+                recall,
+                precision,
+            )
+        )
+
+    entities, linking, planted = generate(args.compare, args.seed)
+    variants = [name_variants(rec) for rec in entities]
+    start = time.perf_counter()
+    above = set()
+    for i, j in combinations(range(len(entities)), 2):
+        score = max(
+            (name_similarity(x, y) for x in variants[i] for y in variants[j]),
+            default=0.0,
+        )
+        if score >= DEFAULT_THRESHOLD and entities[i].category == entities[j].category:
+            above.add(
+                tuple(sorted((entities[i].airtable_idno, entities[j].airtable_idno)))
+            )
+    every_pair = time.perf_counter() - start
+    report = find_duplicate_records(entities, linking)
+    blocked = {tuple(sorted((s.keep, s.merge))) for s in report.suggestions}
+    print(
+        "every pair at {} entities: {:.1f}s, blocking finds {} of its {} pairs above the threshold".format(
+            args.compare, every_pair, len(above & blocked), len(above)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Time fetching a synthetic base from the local Airtable stub, one table at a time vs all at once.
+
+Usage: python benchmarks/bench_fetch.py [--files N] [--latency S] [--seed N]
+
+The stub enforces Airtable's 5 requests/s limit (answering 429 above it)
+and waits --latency seconds before each response, like a real round trip.
+tests/test_airtable.py checks that fetching gives what validate_all makes
+from the same export on disk.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from lakeland_db_migrate_v4.airtable import RATE_LIMIT, fetch_all
+from lakeland_db_migrate_v4.parallel import TABLE_FIELDMAPS
+
+sys.path.insert(0, str(Path(__file__).parent))
+from airtable_stub import AirtableStub  # noqa: E402
+from synthetic import generate_export  # noqa: E402
+
+
+def main() -> None:
+    """Generate, serve, fetch both ways."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_export(Path(tmp), args.files, args.seed)
+        stub = AirtableStub.from_directory(
+            tmp, rate_limit=RATE_LIMIT, latency=args.latency
+        )
+
+    with stub:
+        runs = {}
+        start = time.perf_counter()
+        for table in TABLE_FIELDMAPS:
+            fetch_all(stub.base_id, stub.token, [table], api_url=stub.url)
+        runs["one table at a time"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fetch_all(stub.base_id, stub.token, api_url=stub.url)
+        runs["all tables at once"] = time.perf_counter() - start
+
+    pages = (stub.requests - stub.rate_limited) // 2
+    for label, elapsed in runs.items():
+        print(
+            "{:>20}: {:.2f}s, {:.1f} requests/s".format(label, elapsed, pages / elapsed)
+        )
+
+
+if __name__ == "__main__":
+    main()
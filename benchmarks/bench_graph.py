@@ -0,0 +1,98 @@
+"""Build the entity graph from a synthetic export and time landing pages against scanning.
+
+Usage: python benchmarks/bench_graph.py [--files N] [--sample N] [--seed N]
+
+Every entity's landing page is gathered from the graph in one pass over
+its edges. For a sample of entities the same page is also put together
+the old way, by scanning every relationship and item, and the scan time
+is extrapolated to all entities. That the two agree is checked in
+tests/test_graph.py.
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from lakeland_db_migrate_v4.graph import (
+    ITEM_LINK_PREDICATES,
+    EntityGraph,
+    build_entity_graph,
+)
+from lakeland_db_migrate_v4.joins import build_destination_records
+from lakeland_db_migrate_v4.parallel import validate_all
+from lakeland_db_migrate_v4.writers import iter_migrated, link_value
+
+sys.path.insert(0, str(Path(__file__).parent))
+from synthetic import generate_export  # noqa: E402
+
+
+def scanned_page(migrated: Any, idno: str) -> tuple[Counter, Counter]:
+    """Put a landing page together by scanning every relationship and item."""
+    relationships: Counter = Counter()
+    for rel in migrated.relationships:
+        if rel.subject_entity == idno:
+            relationships[(rel.object_entity, rel.relationship_predicate, False)] += 1
+        if rel.object_entity == idno:
+            relationships[(rel.subject_entity, rel.relationship_predicate, True)] += 1
+    items: Counter = Counter()
+    for item in migrated.items:
+        for field_name, predicate in ITEM_LINK_PREDICATES.items():
+            for target in link_value(getattr(item, field_name)):
+                if target == idno:
+                    items[(item.idno, predicate, True)] += 1
+    return (relationships, items)
+
+
+def main() -> None:
+    """Generate, migrate, build, compare."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=30_000)
+    parser.add_argument("--sample", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_export(Path(tmp), args.files, args.seed)
+        migrated = build_destination_records(validate_all(tmp, workers=1))
+        graph_path = Path(tmp) / "entities.graph"
+        stats = build_entity_graph(iter_migrated(migrated), graph_path)
+        print(
+            "{} entities, {} items, {} edges, {} predicates into {:.1f} KB in {:.2f}s".format(
+                stats.entities,
+                stats.items,
+                stats.edges,
+                stats.predicates,
+                stats.bytes / 1024,
+                stats.elapsed,
+            )
+        )
+
+        with EntityGraph(graph_path) as graph:
+            start = time.perf_counter()
+            pages = {
+                page.idno: page for page in graph.iter_landing_pages(every_entity=True)
+            }
+            from_graph = time.perf_counter() - start
+
+            sample = random.Random(args.seed).sample(
+                [e.idno for e in migrated.entities], args.sample
+            )
+            start = time.perf_counter()
+            for idno in sample:
+                scanned_page(migrated, idno)
+            scanning = (time.perf_counter() - start) / len(sample) * len(pages)
+
+        print(
+            "all {} landing pages: {:.2f}s from the graph, ~{:.1f}s scanning ({:.0f}x)".format(
+                len(pages), from_graph, scanning, scanning / from_graph
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
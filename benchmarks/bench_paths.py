@@ -0,0 +1,117 @@
+"""Time utils.handle_paths against the old pathlib implementation.
+
+Usage: python benchmarks/bench_paths.py [--paths N] [--seed N]
+
+The old implementation and the generator of randomized, deliberately awkward
+path strings (quotes, runs of unicode whitespace, doubled and leading
+slashes, dot segments, unknown roots, empty paths) are also used by
+tests/test_utils.py to check both give the same output.
+"""
+
+import argparse
+import random
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from lakeland_db_migrate_v4.utils import handle_paths, ldt_nas_root, root_mapping
+
+ROOTS = list(root_mapping) + ["abc123", "9f8e7d6c", "ABC123", "Unknown Root", "ab12"]
+PIECES = [
+    "Box 1",
+    "scan_0001.jpg",
+    "Folder  A",
+    ".",
+    "..",
+    "",
+    " ",
+    "\t",
+    "  ",
+    "photo   1.tif",
+    '"',
+    "notes.pdf",
+    "a\u00a0\u00a0b",
+    " \n",
+]
+
+
+def reference_handle_paths(pathstrings: list[str]) -> list[str]:
+    """The original pathlib based handle_paths, kept verbatim for comparison."""
+    deslashed = []
+    normed = []
+
+    for p in pathstrings:
+        p = re.sub(r"[\s]{2,}", " ", p)
+        unquoted_p = p.strip('"')
+        if unquoted_p.startswith("/"):
+            deslashed.append(unquoted_p[1:])
+        else:
+            deslashed.append(unquoted_p)
+
+    if deslashed != [""]:
+        pathobjs = [Path(p) for p in deslashed]
+        for po in pathobjs:
+            if po.parts[0] in root_mapping:
+                full_path = Path(root_mapping[po.parts[0]])
+                normed.append(full_path.joinpath(po))
+            elif re.compile(r"[a-z0-9]{6}").match(po.parts[0]):
+                normed.append(ldt_nas_root.joinpath(po))
+            else:
+                pass
+    return [n.as_posix() for n in normed]
+
+
+def random_path(rng: random.Random) -> str:
+    """Build one messy path string."""
+    segments = [rng.choice(ROOTS)] + [
+        rng.choice(PIECES) for _ in range(rng.randint(0, 4))
+    ]
+    sep = rng.choice(["/", "/", "/", "//"])
+    path = sep.join(segments)
+    if rng.random() < 0.3:
+        path = rng.choice(["/", "//", "///", "./"]) + path
+    if rng.random() < 0.3:
+        path = '"' + path + '"'
+    if rng.random() < 0.05:
+        path = rng.choice(["", "/", '""', ".", "  "])
+    return path
+
+
+def random_field(rng: random.Random) -> list[str]:
+    """Build the list handle_paths receives for one File Path value."""
+    return '","'.join(random_path(rng) for _ in range(rng.randint(1, 3))).split('","')
+
+
+def outcome(fn: Callable[[list[str]], list[str]], arg: list[str]) -> Any:
+    """Return output or the type of exception raised."""
+    try:
+        return fn(arg)
+    except Exception as err:
+        return type(err)
+
+
+def main() -> None:
+    """Time both implementations over a synthetic corpus."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [
+        ['"/{}/Box {}/scan_{:07d}.jpg"'.format(rng.choice(ROOTS[:12]), i % 40, i)]
+        for i in range(args.paths)
+    ]
+    for name, fn in (("pathlib", reference_handle_paths), ("string", handle_paths)):
+        start = time.perf_counter()
+        for field in corpus:
+            fn(field)
+        elapsed = time.perf_counter() - start
+        print(
+            "{:>8}: {:.2f}s, {:.0f} paths/s".format(name, elapsed, args.paths / elapsed)
+        )
+
+
+if __name__ == "__main__":
+    main()
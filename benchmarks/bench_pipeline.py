@@ -0,0 +1,157 @@
+"""Time each stage of the migration over synthetic exports and record the results.
+
+Usage: python benchmarks/bench_pipeline.py [--files N ...] [--output PATH] [--compare PATH]
+
+For every scale a synthetic export is written to a temporary directory and
+timed through load, validate, path normalization, date derivation and
+destination mapping. Results go to a json file so runs can be compared
+across code changes and pydantic upgrades; --compare prints the ratio
+against an earlier results file.
+"""
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import pydantic
+
+import lakeland_db_migrate_v4
+from lakeland_db_migrate_v4.joins import build_destination_records
+from lakeland_db_migrate_v4.parallel import TABLE_FIELDMAPS, validate_all
+from lakeland_db_migrate_v4.sources import stream_from_file
+from lakeland_db_migrate_v4.utils import handle_paths, normalize_dates
+
+from synthetic import generate_export
+
+
+def timed(fn: Callable[[], int]) -> dict[str, float]:
+    """Run a stage that returns how many records it touched and time it."""
+    start = time.perf_counter()
+    records = fn()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "records": records,
+        "records_per_second": records / seconds if seconds else 0.0,
+    }
+
+
+def run_scale(files_count: int, workers: int) -> dict[str, Any]:
+    """Benchmark every stage over one synthetic export."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source_dir = Path(tmp)
+        counts = generate_export(source_dir, files_count)
+        stages: dict[str, Any] = {}
+
+        stages["load"] = timed(
+            lambda: sum(
+                1
+                for table in TABLE_FIELDMAPS
+                for _ in stream_from_file(
+                    "{}.json".format(table), source_dir=source_dir
+                )
+            )
+        )
+
+        reports: dict[str, Any] = {}
+
+        def validate() -> int:
+            reports.update(validate_all(source_dir, workers=workers))
+            return sum(len(r.records) + len(r.failures) for r in reports.values())
+
+        stages["validate"] = timed(validate)
+        for table, report in reports.items():
+            stages["validate:{}".format(table)] = {
+                "seconds": report.elapsed,
+                "records": len(report.records),
+                "failures": len(report.failures),
+                "records_per_second": report.records_per_second,
+            }
+
+        path_fields = [
+            str(raw["File Path"]).split('","')
+            for raw in stream_from_file("files.json", source_dir=source_dir)
+            if raw.get("File Path", "NO FILE") != "NO FILE"
+        ]
+        stages["path_normalization"] = timed(
+            lambda: sum(len(handle_paths(p)) for p in path_fields)
+        )
+
+        dates = [
+            str(raw["Creation Date"])
+            for raw in stream_from_file("items.json", source_dir=source_dir)
+            if raw.get("Creation Date")
+        ]
+        stages["date_derivation"] = timed(
+            lambda: sum(1 for d in normalize_dates(dates) if d is not None)
+        )
+
+        stages["destination_mapping"] = timed(
+            lambda: sum(
+                len(v)
+                for v in vars(build_destination_records(reports)).values()
+                if isinstance(v, list)
+            )
+        )
+
+    return {"files": files_count, "counts": counts, "stages": stages}
+
+
+def compare(current: dict[str, Any], previous: dict[str, Any]) -> None:
+    """Print how much slower (>1) or faster (<1) each stage got."""
+    earlier = {r["files"]: r["stages"] for r in previous["runs"]}
+    for run in current["runs"]:
+        old_stages = earlier.get(run["files"])
+        if old_stages is None:
+            continue
+        for stage, result in run["stages"].items():
+            old = old_stages.get(stage)
+            if old and old["seconds"]:
+                print(
+                    "{:>9} {:<28} {:>6.2f}x".format(
+                        run["files"], stage, result["seconds"] / old["seconds"]
+                    )
+                )
+
+
+def main() -> None:
+    """Run the suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, nargs="+", default=[1_000, 10_000])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", type=Path, default=Path("bench_results.json"))
+    parser.add_argument("--compare", type=Path)
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pydantic": pydantic.VERSION,
+        "package": lakeland_db_migrate_v4.__version__,
+        "workers": args.workers,
+        "runs": [run_scale(n, args.workers) for n in args.files],
+    }
+
+    for run in results["runs"]:
+        for stage, result in run["stages"].items():
+            print(
+                "{:>9} {:<28} {:>8.3f}s {:>12.0f}/s".format(
+                    run["files"], stage, result["seconds"], result["records_per_second"]
+                )
+            )
+
+    with open(args.output, "w") as fobject:
+        json.dump(results, fobject, indent=2)
+
+    if args.compare:
+        with open(args.compare) as fobject:
+            compare(results, json.load(fobject))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Build a search index from a synthetic export and time queries against scanning the records.
+
+Usage: python benchmarks/bench_search.py [--files N] [--queries N] [--seed N]
+
+The index is built in one pass over the destination records and queried
+through mmap. tests/test_search.py checks its rankings against a brute
+force BM25 over the same records.
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from lakeland_db_migrate_v4.joins import build_destination_records
+from lakeland_db_migrate_v4.parallel import validate_all
+from lakeland_db_migrate_v4.search import (
+    SEARCH_FIELDS,
+    SearchIndex,
+    build_search_index,
+    tokenize,
+)
+from lakeland_db_migrate_v4.writers import iter_migrated
+
+sys.path.insert(0, str(Path(__file__).parent))
+from synthetic import generate_export  # noqa: E402
+
+
+def main() -> None:
+    """Generate, migrate, index, time queries against a scan."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=30_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_export(Path(tmp), args.files, args.seed)
+        migrated = build_destination_records(validate_all(tmp, workers=1))
+        documents = [
+            rec
+            for rec in iter_migrated(migrated)
+            if type(rec).__name__ in SEARCH_FIELDS
+        ]
+        index_path = Path(tmp) / "search.idx"
+        stats = build_search_index(iter_migrated(migrated), index_path)
+        print(
+            "indexed {} records, {} terms, {} postings into {:.1f} KB in {:.2f}s".format(
+                stats.documents,
+                stats.terms,
+                stats.postings,
+                stats.bytes / 1024,
+                stats.elapsed,
+            )
+        )
+
+        rng = random.Random(args.seed)
+        vocabulary = sorted(
+            {t for rec in documents for t in tokenize(str(getattr(rec, "name", "")))}
+            | {t for rec in documents for t in tokenize(str(getattr(rec, "title", "")))}
+        )
+        queries = [
+            " ".join(rng.sample(vocabulary, rng.randint(1, 3)))
+            for _ in range(args.queries)
+        ]
+
+        with SearchIndex(index_path) as index:
+            start = time.perf_counter()
+            for query in queries:
+                index.search(query)
+            indexed = (time.perf_counter() - start) / len(queries)
+
+            # What the site does now: a case-insensitive substring scan
+            start = time.perf_counter()
+            found = 0
+            for query in queries:
+                word = query.split()[0]
+                found += sum(
+                    1
+                    for rec in documents
+                    if any(
+                        word in str(getattr(rec, field_name, "")).lower()
+                        for field_name in SEARCH_FIELDS[type(rec).__name__]
+                    )
+                )
+            scanned = (time.perf_counter() - start) / len(queries)
+
+        print(
+            "ranked query: {:.3f} ms, substring scan: {:.3f} ms ({:.0f}x, {:.0f} matches per scan)".format(
+                indexed * 1000, scanned * 1000, scanned / indexed, found / len(queries)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Time how long lakeland-migrate takes to start.
+
+Usage: python benchmarks/bench_startup.py [--runs N]
+
+Times `python -m lakeland_db_migrate_v4 --help` against a bare
+interpreter, and prints what importing every record dataclass up front
+costs for comparison. tests/test_cli.py checks the difference stays
+within cli.STARTUP_BUDGET and that --help doesn't load pydantic.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+from lakeland_db_migrate_v4.cli import STARTUP_BUDGET
+
+
+def timed_run(code: list[str], runs: int) -> float:
+    """Median wall time of running the interpreter with some arguments."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *code], check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main() -> None:
+    """Time each way of starting up."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    bare = timed_run(["-c", "pass"], args.runs)
+    help_time = timed_run(["-m", "lakeland_db_migrate_v4", "--help"], args.runs)
+    eager = timed_run(
+        [
+            "-c",
+            "import lakeland_db_migrate_v4.destinations, lakeland_db_migrate_v4.parallel",
+        ],
+        args.runs,
+    )
+    print("bare interpreter: {:.1f} ms".format(bare * 1000))
+    print(
+        "lakeland-migrate --help: {:.1f} ms (+{:.1f} ms, budget {:.0f} ms)".format(
+            help_time * 1000, (help_time - bare) * 1000, STARTUP_BUDGET * 1000
+        )
+    )
+    print(
+        "importing every dataclass up front: {:.1f} ms (+{:.1f} ms)".format(
+            eager * 1000, (eager - bare) * 1000
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
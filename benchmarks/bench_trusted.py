@@ -0,0 +1,84 @@
+"""Time trusted fast construction against full validation on a synthetic export.
+
+Usage: python benchmarks/bench_trusted.py [--files N] [--seed N]
+
+Every table is validated three ways: in full, with validate_trusted
+recording a schema fingerprint, and with validate_trusted building records
+from that fingerprint. All three have to come out identical, down to value
+types and attribute order. Then a record with a value of a new shape is
+planted in every table; it has to be validated in full, and the results
+still have to match.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from lakeland_db_migrate_v4.parallel import TABLE_FIELDMAPS
+from lakeland_db_migrate_v4.sources import (
+    same_value,
+    stream_from_file,
+    validate_records,
+    validate_trusted,
+    validator_switch,
+)
+
+sys.path.insert(0, str(Path(__file__).parent))
+from synthetic import generate_export  # noqa: E402
+
+
+def main() -> None:
+    """Generate, validate each way, compare."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        generate_export(Path(tmp), args.files, args.seed)
+        schema_file = Path(tmp) / "schema_fingerprints.json"
+        print(
+            "{:>14} {:>9} {:>10} {:>10} {:>10}".format(
+                "", "records", "full", "record", "trusted"
+            )
+        )
+        for table, fieldmap in TABLE_FIELDMAPS.items():
+            validator = validator_switch[table]
+            raw = list(stream_from_file(table + ".json", source_dir=Path(tmp)))
+            timings = []
+            reports = []
+            for run in (validate_records, validate_trusted, validate_trusted):
+                kwargs = (
+                    {}
+                    if run is validate_records
+                    else {"schema_file": schema_file, "reopen": lambda: raw}
+                )
+                start = time.perf_counter()
+                reports.append(run(raw, validator, fieldmap, table, **kwargs))
+                timings.append(time.perf_counter() - start)
+
+            full = reports[0]
+            for report in reports[1:]:
+                assert same_value(report.records, full.records), table
+                assert same_value(report.failures, full.failures), table
+            print(
+                "{:>14} {:>9} {:>9.2f}s {:>9.2f}s {:>9.2f}s  {:.1f}x".format(
+                    table, len(raw), *timings, timings[0] / timings[2]
+                )
+            )
+
+            # A number where Airtable has always sent a string
+            drifted = [dict(rec) for rec in raw]
+            drifted[0]["airtable_createdTime"] = 20210304
+            full = validate_records(drifted, validator, fieldmap, table)
+            trusted = validate_trusted(
+                drifted, validator, fieldmap, table, schema_file=schema_file
+            )
+            assert same_value(trusted.records, full.records), table
+            assert same_value(trusted.failures, full.failures), table
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Show how batch validation scales with table size.
+
+Usage: python benchmarks/bench_validation.py [ROWS ...] [--legacy-max N]
+
+The legacy column replays the old validate_inputs loop (tuple concatenation
+plus separate rename and unwrap passes) and is skipped above --legacy-max
+rows because it is quadratic.
+"""
+
+import argparse
+import random
+import time
+from typing import Any
+
+from lakeland_db_migrate_v4.source_mappings import files_source_column_mappings
+from lakeland_db_migrate_v4.sources import FileSourceRecord, validate_records
+
+from synthetic import Sizes, files
+
+
+def synthetic_files(rows: int) -> list[dict[str, Any]]:
+    """Build raw Files table records shaped like the Airtable export."""
+    return list(files(random.Random(0), Sizes(rows)))
+
+
+def legacy_validate(records: list[dict[str, Any]], fieldmap: dict[str, str]) -> tuple:
+    """Replay the pre-engine validation loop."""
+    validated: tuple = ()
+    for rec in records:
+        rec = {fieldmap[name]: val for name, val in rec.items() if name in fieldmap}
+        for k in rec.keys():
+            if isinstance(rec[k], list):
+                if len(rec[k]) == 1:
+                    rec[k] = rec[k][0]
+        validated += (FileSourceRecord(**rec),)
+    return validated
+
+
+def main() -> None:
+    """Run the benchmark and print one line per table size."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "rows", nargs="*", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--legacy-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(
+        "{:>10} {:>12} {:>14} {:>12}".format(
+            "rows", "engine (s)", "records/s", "legacy (s)"
+        )
+    )
+    for rows in args.rows:
+        records = synthetic_files(rows)
+        report = validate_records(
+            records, FileSourceRecord, files_source_column_mappings, "files"
+        )
+        assert len(report.records) == rows, report.failures[:3]
+
+        legacy = "skipped"
+        if rows <= args.legacy_max:
+            start = time.perf_counter()
+            legacy_validate(records, files_source_column_mappings)
+            legacy = "{:.2f}".format(time.perf_counter() - start)
+
+        print(
+            "{:>10} {:>12.2f} {:>14.0f} {:>12}".format(
+                rows, report.elapsed, report.records_per_second, legacy
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Generate synthetic Airtable exports shaped like the Lakeland source base.
+
+Usage: python benchmarks/synthetic.py OUT_DIR [--files N] [--seed N]
+
+Writes accessions.json, files.json, items.json, entities.json, subjects.json
+and relationships.json. Keys come from source_mappings, restricted to the ones
+the *SourceRecord dataclasses accept. Link fields are lists of Airtable IDs
+(often singletons) that always point at records that exist, and both sides of
+Accession/File, Item/File and Item/Subject links agree. Records are
+written one at a time, so memory stays flat from 1k up to 1M files.
+"""
+
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import Any, Callable, Final, Iterator, TextIO
+
+from lakeland_db_migrate_v4.utils import root_mapping
+
+# Everything else is sized relative to the Files table
+FILES_PER_ACCESSION: Final = 200
+FILES_PER_ITEM: Final = 3
+FILES_PER_ENTITY: Final = 20
+FILES_PER_SUBJECT: Final = 100
+ENTITIES_PER_RELATIONSHIP: Final = 2
+
+CREATED_TIME: Final = "2021-03-04T15:16:17.000Z"
+ROOTS: Final = [r for r in root_mapping if r != "Projects"]
+FORMATS: Final = ["JPG", "TIF", "PDF", "MP3", "MP4", "WAV", "DOCX"]
+COLLECTIONS: Final = ["Lakeland Community Heritage Project", "Lakeland Book", ""]
+OBJ_TYPES: Final = ["Photograph", "Document", "Oral History", "Map", "Newspaper"]
+CATEGORIES: Final = ["Church", "School", "Family", "Sports", "Urban Renewal"]
+ENTITY_CATEGORIES: Final = ["Person", "Organization", "Place"]
+SUBJECT_CATEGORIES: Final = ["Topic", "Event", "Place"]
+RELATION_TYPES: Final = ["parentOf", "spouseOf", "memberOf", "livedAt", "attended"]
+SURNAMES: Final = ["Brown", "Gray", "Johnson", "Mack", "Owens", "Smith", "Tyler"]
+GIVEN_NAMES: Final = ["Alice", "Edward", "Grace", "Henry", "Mary", "Violetta", "Wil"]
+
+
+def rec_id(prefix: str, n: int) -> str:
+    """Build a stable fake Airtable record ID."""
+    return "rec{}{:013d}".format(prefix, n)
+
+
+def iso_date(rng: random.Random) -> str:
+    """A plausible date in the archive's range."""
+    return "{:04d}-{:02d}-{:02d}".format(
+        rng.randint(1890, 2020), rng.randint(1, 12), rng.randint(1, 28)
+    )
+
+
+def fuzzy_date(rng: random.Random) -> str:
+    """A date the way archivists actually typed them: partial, circa or a range."""
+    year = rng.randint(1890, 2020)
+    return rng.choice(
+        [
+            iso_date(rng),
+            str(year),
+            "{:04d}-{:02d}".format(year, rng.randint(1, 12)),
+            "circa {}".format(year),
+            "{}s".format(year // 10 * 10),
+            "{}-{}".format(year, year + rng.randint(1, 10)),
+            "{}/{}/{}".format(rng.randint(1, 12), rng.randint(1, 28), year),
+        ]
+    )
+
+
+def links(rng: random.Random, prefix: str, count: int, most: int = 3) -> list[str]:
+    """A link field: a list of Airtable IDs, a singleton more often than not."""
+    k = 1 if rng.random() < 0.6 else rng.randint(1, most)
+    return [rec_id(prefix, rng.randrange(count)) for _ in range(k)]
+
+
+class Sizes:
+    """Row counts for each table at a given scale."""
+
+    def __init__(self, files: int) -> None:
+        """Derive every table's size from the number of files."""
+        self.files = files
+        self.accessions = max(1, files // FILES_PER_ACCESSION)
+        self.items = max(1, files // FILES_PER_ITEM)
+        self.entities = max(2, files // FILES_PER_ENTITY)
+        self.subjects = max(1, files // FILES_PER_SUBJECT)
+        self.relationships = max(1, self.entities // ENTITIES_PER_RELATIONSHIP)
+
+
+def accessions(rng: random.Random, n: Sizes) -> Iterator[dict[str, Any]]:
+    """Accessions table records."""
+    for i in range(n.accessions):
+        files = [rec_id("F", f) for f in range(i, n.files, n.accessions)]
+        yield {
+            "airtable_id": rec_id("A", i),
+            "airtable_createdTime": CREATED_TIME,
+            "ID": "LAA{:05d}".format(i),
+            "Date of Donation": iso_date(rng),
+            "Donor Name (Form Entry)": "{} {}".format(
+                rng.choice(GIVEN_NAMES), rng.choice(SURNAMES)
+            ),
+            "Donor Name (Linked)": links(rng, "E", n.entities, 2),
+            "Files": files,
+            "# Files": len(files),
+            "Donation Grouping Title": "Donation {}".format(i),
+            "Description": "Materials donated at a community scanning event.",
+        }
+
+
+def file_path(rng: random.Random, i: int) -> str:
+    """A File Path value: quoted, sometimes several paths, sometimes NO FILE."""
+    roll = rng.random()
+    if roll < 0.02:
+        return "NO FILE"
+    count = 2 if roll > 0.9 else 1
+    paths = []
+    for k in range(count):
+        if rng.random() < 0.25:
+            root = "{:06x}".format(rng.randrange(16**6))
+        else:
+            root = rng.choice(ROOTS)
+        paths.append('"/{}/Box {}/scan_{:07d}_{}.jpg"'.format(root, i % 40, i, k))
+    return ",".join(paths)
+
+
+def files(rng: random.Random, n: Sizes) -> Iterator[dict[str, Any]]:
+    """Files table records."""
+    for i in range(n.files):
+        rec: dict[str, Any] = {
+            "airtable_id": rec_id("F", i),
+            "airtable_createdTime": CREATED_TIME,
+            "ID": "LAF{:07d}".format(i),
+            "Part of Accession": [rec_id("A", i % n.accessions)],
+            "Format": [rng.choice(FORMATS)],
+            "File Path": file_path(rng, i),
+            "Checksum": "{:032x}".format(rng.getrandbits(128)),
+        }
+        if i // FILES_PER_ITEM < n.items:
+            rec["Part of Item"] = [rec_id("I", i // FILES_PER_ITEM)]
+        if rng.random() < 0.1:
+            rec["Source (Provenance)"] = links(rng, "E", n.entities)
+        yield rec
+
+
+def items(rng: random.Random, n: Sizes) -> Iterator[dict[str, Any]]:
+    """Items table records."""
+    for i in range(n.items):
+        rec: dict[str, Any] = {
+            "airtable_id": rec_id("I", i),
+            "airtable_createdTime": CREATED_TIME,
+            "ID": "LAI{:07d}".format(i),
+            "Legacy ID-UMD": "umd_{}".format(i),
+            "Files": [
+                rec_id("F", f)
+                for f in range(
+                    i * FILES_PER_ITEM, min(n.files, (i + 1) * FILES_PER_ITEM)
+                )
+            ],
+            "Title": "{} of the {} family".format(
+                rng.choice(OBJ_TYPES), rng.choice(SURNAMES)
+            ),
+            "Description": "Taken in Lakeland, College Park, Maryland.",
+            "Creation Date": iso_date(rng) if rng.random() < 0.7 else "",
+            "Object Type": rng.choice(OBJ_TYPES),
+            "Object Category": [rng.choice(CATEGORIES)],
+            "Lakeland Collection": rng.choice(COLLECTIONS),
+            "People": links(rng, "E", n.entities),
+            "Subjects": [rec_id("S", i % n.subjects)],
+            "In Lakeland Book?": rng.random() < 0.1,
+        }
+        if rng.random() < 0.2:
+            rec["Places/Organizations"] = links(rng, "E", n.entities)
+        if rng.random() < 0.05:
+            rec["Interviewer"] = links(rng, "E", n.entities, 1)
+            rec["Interviewee"] = links(rng, "E", n.entities, 2)
+        yield rec
+
+
+def entities(rng: random.Random, n: Sizes) -> Iterator[dict[str, Any]]:
+    """Entities table records."""
+    for i in range(n.entities):
+        rec: dict[str, Any] = {
+            "airtable_id": rec_id("E", i),
+            "airtable_createdTime": CREATED_TIME,
+            "Name": "{} {}".format(rng.choice(GIVEN_NAMES), rng.choice(SURNAMES)),
+            "Entity Category": rng.choice(ENTITY_CATEGORIES),
+            "Linked Items (EntityAsSubject)": links(rng, "I", n.items),
+        }
+        if rng.random() < 0.3:
+            rec["Biography/History"] = "Lifelong Lakeland resident."
+        if rng.random() < 0.1:
+            rec["Alternate Name"] = rng.choice(GIVEN_NAMES)
+        if rng.random() < 0.2:
+            rec["Date of Birth"] = fuzzy_date(rng)
+        yield rec
+
+
+def subjects(rng: random.Random, n: Sizes) -> Iterator[dict[str, Any]]:
+    """Subjects table records."""
+    for i in range(n.subjects):
+        yield {
+            "airtable_id": rec_id("S", i),
+            "airtable_createdTime": CREATED_TIME,
+            "Name": "{} {}".format(rng.choice(CATEGORIES), i),
+            "Subject Category": rng.choice(SUBJECT_CATEGORIES),
+            "Items": [rec_id("I", k) for k in range(i, n.items, n.subjects)],
+        }
+
+
+def relationships(rng: random.Random, n: Sizes) -> Iterator[dict[str, Any]]:
+    """Relationships table records."""
+    for i in range(n.relationships):
+        yield {
+            "airtable_id": rec_id("R", i),
+            "airtable_createdTime": CREATED_TIME,
+            "Name": "Relationship {}".format(i),
+            "Entity 1": [rec_id("E", rng.randrange(n.entities))],
+            "Entity 2": [rec_id("E", rng.randrange(n.entities))],
+            "Relation Type": rng.choice(RELATION_TYPES),
+            "Date Range (Start)": iso_date(rng) if rng.random() < 0.3 else "",
+        }
+
+
+TABLES: Final[dict[str, Callable[[random.Random, Sizes], Iterator[dict[str, Any]]]]] = {
+    "accessions": accessions,
+    "files": files,
+    "items": items,
+    "entities": entities,
+    "subjects": subjects,
+    "relationships": relationships,
+}
+
+
+def write_array(fobject: TextIO, records: Iterator[dict[str, Any]]) -> int:
+    """Write records as a json array one at a time, returning how many there were."""
+    count = 0
+    fobject.write("[")
+    for rec in records:
+        if count:
+            fobject.write(",\n")
+        json.dump(rec, fobject, ensure_ascii=False)
+        count += 1
+    fobject.write("]\n")
+    return count
+
+
+def generate_export(out_dir: Path, files_count: int, seed: int = 0) -> dict[str, int]:
+    """
+    Write a full synthetic export.
+
+    :param out_dir: Directory to write the six json files into
+    :param files_count: Number of Files records; other tables scale from it
+    :param seed: Seed for the random generator
+    :return: A dictionary of table name to record count
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    sizes = Sizes(files_count)
+    counts = {}
+    for table, make in TABLES.items():
+        rng = random.Random("{}-{}".format(seed, table))
+        with open(out_dir / "{}.json".format(table), "w") as fobject:
+            counts[table] = write_array(fobject, make(rng, sizes))
+    return counts
+
+
+def main() -> None:
+    """Write an export from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir", type=Path)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate_export(args.out_dir, args.files, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,38 @@
 """Migrate Lakeland Digital Archive Airtable Data."""
-import lakeland_db_migrate_v4.source_mappings
-from .sources import validate_inputs
-from .destinations import *
 
-__version__ = "0.6.5"
\ No newline at end of file
+from importlib import import_module
+from typing import Any
+
+__version__ = "0.6.5"
+
+# Public names and the submodule each comes from. Nothing is imported until it is
+# first used, so the command line tool can answer --help without loading pydantic.
+_LAZY_ATTRIBUTES: dict[str, str] = {
+    "source_mappings": ".source_mappings",
+    "validate_inputs": ".sources",
+    "validate_all": ".parallel",
+    "DonationGroupingRecord": ".destinations",
+    "FileRecord": ".destinations",
+    "ItemRecord": ".destinations",
+    "SubjectRecord": ".destinations",
+    "EntityRecord": ".destinations",
+    "EntityRelationshipRecord": ".destinations",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str) -> Any:
+    """Import a public name the first time it is looked up."""
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    module = import_module(module_name, __name__)
+    value = module if module_name == "." + name else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    """List lazy names alongside the ones already loaded."""
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
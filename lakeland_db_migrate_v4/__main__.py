@@ -0,0 +1,7 @@
+"""Run the lakeland-migrate command with python -m lakeland_db_migrate_v4."""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,397 @@
+"""Fetch source tables straight from the Airtable API and validate them as pages arrive."""
+
+import asyncio
+import http.client
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Final, Iterable, Iterator, Optional, Union
+from urllib.parse import quote, urlencode, urlsplit
+
+from .instrumentation import Instrumentation
+from .parallel import TABLE_FIELDMAPS
+from .sources import AIRTABLE_JSON, ValidationReport, validate_records, validator_switch
+
+AIRTABLE_API_URL: Final = "https://api.airtable.com"
+# Airtable allows 5 requests per second per base, and makes you wait 30 seconds if you go over
+RATE_LIMIT: Final = 5.0
+RATE_LIMIT_PENALTY: Final = 30.0
+PAGE_SIZE: Final = 100
+MAX_RETRIES: Final = 5
+RETRY_BACKOFF: Final = 1.0
+REQUEST_TIMEOUT: Final = 60.0
+# Pages fetched ahead of validation; past this the table's fetching waits for validation to catch up
+MAX_QUEUED_PAGES: Final = 16
+QUEUE_POLL_INTERVAL: Final = 0.01
+
+
+class TokenBucket:
+    """Space out requests shared by every table fetched from one base."""
+
+    def __init__(self, rate: float = RATE_LIMIT, capacity: float = 1.0) -> None:
+        """
+        Start with a full bucket.
+
+        :param rate: Tokens added per second
+        :param capacity: Most tokens the bucket holds, i.e. the largest burst allowed
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self) -> None:
+        """
+        Wait until a request may be sent.
+
+        :return: None
+        """
+        # Made here rather than in __init__ so it belongs to the running loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def export_shape(rec: dict[str, Any]) -> AIRTABLE_JSON:
+    """
+    Flatten an API record into the shape airtable-export writes and the loaders expect.
+
+    :param rec: A record from the "records" list of an API response
+    :return: The fields plus airtable_id and airtable_createdTime
+    """
+    return {
+        "airtable_id": rec["id"],
+        **rec.get("fields", {}),
+        "airtable_createdTime": rec["createdTime"],
+    }
+
+
+class AirtableClient:
+    """Access to one base's list records endpoint, one persistent connection per table."""
+
+    def __init__(
+        self,
+        base_id: str,
+        token: str,
+        api_url: str = AIRTABLE_API_URL,
+        page_size: int = PAGE_SIZE,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> None:
+        """
+        Set up a client without connecting yet.
+
+        :param base_id: The app... ID of the base
+        :param token: A personal access token or API key
+        :param api_url: Scheme and host of the API, e.g. a local stub
+        :param page_size: Records per page, 100 at most
+        :param timeout: Seconds to wait on a socket before giving up
+        """
+        parts = urlsplit(api_url)
+        self.base_id = base_id
+        self.token = token
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip("/")
+        self.page_size = page_size
+        self.timeout = timeout
+        self.requests = 0
+
+    def connect(self) -> http.client.HTTPConnection:
+        """
+        Open a keep-alive connection to the API.
+
+        :return: An HTTP(S)Connection; it reconnects by itself after being closed
+        """
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def page_path(self, table_name: str, offset: str = "") -> str:
+        """
+        Build the request path for one page of a table.
+
+        :param table_name: The table's name or ID in Airtable
+        :param offset: The offset returned with the previous page, if any
+        :return: A path with query string
+        """
+        query: dict[str, Union[int, str]] = {"pageSize": self.page_size}
+        if offset:
+            query["offset"] = offset
+        return "{}/v0/{}/{}?{}".format(
+            self.prefix,
+            quote(self.base_id, safe=""),
+            quote(table_name, safe=""),
+            urlencode(query),
+        )
+
+    def request_page(
+        self, conn: http.client.HTTPConnection, table_name: str, offset: str = ""
+    ) -> tuple[int, bytes, str]:
+        """
+        Send one request for a page, without retrying.
+
+        :param conn: The table's connection
+        :param table_name: The table's name or ID in Airtable
+        :param offset: The offset returned with the previous page, if any
+        :return: The status, body and Retry-After header of the response
+        """
+        headers = {"Authorization": "Bearer {}".format(self.token)}
+        try:
+            conn.request("GET", self.page_path(table_name, offset), headers=headers)
+            resp = conn.getresponse()
+            return (resp.status, resp.read(), resp.getheader("Retry-After") or "")
+        finally:
+            self.requests += 1
+
+    async def get_page(
+        self,
+        conn: http.client.HTTPConnection,
+        table_name: str,
+        offset: str,
+        bucket: TokenBucket,
+        executor: ThreadPoolExecutor,
+    ) -> dict[str, Any]:
+        """
+        Fetch one page, retrying on rate limiting, server errors and dropped connections.
+
+        Every attempt, retries included, waits its turn with the rate limiter.
+
+        :param conn: The table's connection
+        :param table_name: The table's name or ID in Airtable
+        :param offset: The offset returned with the previous page, if any
+        :param bucket: The base's rate limiter
+        :param executor: Where the blocking requests run
+        :return: The decoded response, with "records" and, unless this is the last page, "offset"
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(MAX_RETRIES + 1):
+            await bucket.acquire()
+            try:
+                status, body, retry_after = await loop.run_in_executor(
+                    executor, self.request_page, conn, table_name, offset
+                )
+            except (http.client.HTTPException, OSError) as err:
+                conn.close()
+                if attempt == MAX_RETRIES:
+                    raise RuntimeError(
+                        "Couldn't fetch {}: {}".format(table_name, err)
+                    ) from err
+                await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+                continue
+
+            if status == 200:
+                return json.loads(body)
+            if attempt < MAX_RETRIES and (status == 429 or status >= 500):
+                if status == 429:
+                    wait = float(retry_after or RATE_LIMIT_PENALTY)
+                else:
+                    wait = RETRY_BACKOFF * 2**attempt
+                await asyncio.sleep(wait)
+                continue
+            raise RuntimeError(
+                "Couldn't fetch {}: HTTP {} {}".format(
+                    table_name, status, body.decode("utf-8", "replace")[:200]
+                )
+            )
+        raise RuntimeError("Couldn't fetch {}: out of retries".format(table_name))
+
+    async def iter_pages(
+        self,
+        table_name: str,
+        bucket: TokenBucket,
+        executor: ThreadPoolExecutor,
+    ) -> AsyncIterator[list[AIRTABLE_JSON]]:
+        """
+        Follow a table's offset pagination, yielding each page in export shape.
+
+        :param table_name: The table's name or ID in Airtable
+        :param bucket: The base's rate limiter
+        :param executor: Where the blocking requests run
+        :return: An async iterator of pages of records
+        """
+        conn = self.connect()
+        offset = ""
+        try:
+            while True:
+                data = await self.get_page(conn, table_name, offset, bucket, executor)
+                yield [export_shape(rec) for rec in data.get("records", [])]
+                offset = data.get("offset", "")
+                if not offset:
+                    return
+        finally:
+            conn.close()
+
+
+def drain(
+    pages: "queue.Queue[Optional[list[AIRTABLE_JSON]]]",
+) -> Iterator[AIRTABLE_JSON]:
+    """
+    Turn pages handed over by the fetcher into a flat stream of records.
+
+    :param pages: Pages of records, then None once the table is done
+    :return: An iterator of raw records
+    """
+    while True:
+        page = pages.get()
+        if page is None:
+            return
+        yield from page
+
+
+async def hand_over(
+    pages: "queue.Queue[Optional[list[AIRTABLE_JSON]]]",
+    page: Optional[list[AIRTABLE_JSON]],
+    validation: "asyncio.Future[ValidationReport]",
+) -> bool:
+    """
+    Queue a page for validation, waiting without blocking the loop while the queue is full.
+
+    :param pages: The table's bounded page queue
+    :param page: A page of records, or None once the table is done
+    :param validation: The table's validation, which empties the queue
+    :return: True once queued, False if validation stopped and the page was dropped
+    """
+    while True:
+        try:
+            pages.put_nowait(page)
+            return True
+        except queue.Full:
+            if validation.done():
+                return False
+            await asyncio.sleep(QUEUE_POLL_INTERVAL)
+
+
+async def fetch_table(
+    client: AirtableClient,
+    table: str,
+    table_name: str,
+    bucket: TokenBucket,
+    executor: ThreadPoolExecutor,
+    instrumentation: Optional[Instrumentation] = None,
+) -> ValidationReport:
+    """
+    Fetch one table and validate it in a single pass while later pages are still in flight.
+
+    :param client: The base's client
+    :param table: Our name for the table, e.g. "files"
+    :param table_name: Airtable's name or ID for it
+    :param bucket: The base's rate limiter
+    :param executor: Where requests and validation run
+    :param instrumentation: Optional Instrumentation to collect per stage timings in
+    :return: A ValidationReport for the table
+    """
+    loop = asyncio.get_running_loop()
+    pages: "queue.Queue[Optional[list[AIRTABLE_JSON]]]" = queue.Queue(MAX_QUEUED_PAGES)
+    validation = loop.run_in_executor(
+        executor,
+        validate_records,
+        drain(pages),
+        validator_switch[table],
+        TABLE_FIELDMAPS[table],
+        table,
+        instrumentation,
+    )
+    try:
+        async for page in client.iter_pages(table_name, bucket, executor):
+            if not await hand_over(pages, page, validation):
+                break
+    finally:
+        await hand_over(pages, None, validation)
+        # Even if fetching failed, let validation see the end of the table so its thread is free before the executor shuts down
+        report = await validation
+    return report
+
+
+async def fetch_tables(
+    client: AirtableClient,
+    tables: dict[str, str],
+    rate: float = RATE_LIMIT,
+    instrumentation: Optional[Instrumentation] = None,
+) -> dict[str, ValidationReport]:
+    """
+    Fetch and validate several tables of one base concurrently.
+
+    :param client: The base's client
+    :param tables: Our table names mapped to Airtable's
+    :param rate: Requests per second allowed across all of them
+    :param instrumentation: Optional Instrumentation; each table collects into its own copy, merged in afterwards, so hooks don't run
+    :return: A dictionary of table name to ValidationReport
+    """
+    bucket = TokenBucket(rate)
+    # Tables validate on separate threads, so they can't share one Instrumentation
+    per_table = {
+        table: (
+            Instrumentation(
+                instrumentation.profile_every, instrumentation.profile_slowest
+            )
+            if instrumentation is not None
+            else None
+        )
+        for table in tables
+    }
+    # A thread per table for its requests and another for its validation
+    with ThreadPoolExecutor(max_workers=2 * len(tables)) as executor:
+        tasks = [
+            asyncio.ensure_future(
+                fetch_table(client, table, name, bucket, executor, per_table[table])
+            )
+            for table, name in tables.items()
+        ]
+        try:
+            reports = await asyncio.gather(*tasks)
+        except BaseException:
+            # Leaving the with block blocks the loop on the executor's threads, so wind the other tables down first
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    if instrumentation is not None:
+        for table_instrumentation in per_table.values():
+            if table_instrumentation is not None:
+                instrumentation.merge(table_instrumentation)
+    return dict(zip(tables, reports))
+
+
+def fetch_all(
+    base_id: str,
+    token: str,
+    tables: Optional[Union[Iterable[str], dict[str, str]]] = None,
+    api_url: str = AIRTABLE_API_URL,
+    rate: float = RATE_LIMIT,
+    instrumentation: Optional[Instrumentation] = None,
+) -> dict[str, ValidationReport]:
+    """
+    Pull every source table from Airtable and validate it, without writing anything to disk.
+
+    Reports are shaped like the ones validate_all builds from airtable-export output, so they can go straight into build_destination_records.
+
+    :param base_id: The app... ID of the base
+    :param token: A personal access token or API key
+    :param tables: Tables to fetch, as names or a mapping of our names to Airtable's; all six by default
+    :param api_url: Scheme and host of the API, e.g. a local stub
+    :param rate: Requests per second allowed across all tables
+    :param instrumentation: Optional Instrumentation to collect per stage timings in
+    :return: A dictionary of table name to ValidationReport
+    """
+    if tables is None:
+        tables = list(TABLE_FIELDMAPS)
+    if not isinstance(tables, dict):
+        tables = {table: table for table in tables}
+    for table in tables:
+        if table not in TABLE_FIELDMAPS:
+            raise KeyError("Unexpected table: {}".format(table))
+
+    client = AirtableClient(base_id, token, api_url)
+    return asyncio.run(fetch_tables(client, tables, rate, instrumentation))
@@ -0,0 +1,391 @@
+"""Mirror Airtable attachments locally before their URLs expire."""
+
+import dataclasses
+import http.client
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Final, Iterable, Iterator, Optional, Union
+from urllib.parse import urljoin, urlsplit
+
+from .fixity import DEFAULT_WORKERS, bounded_map, hash_file
+
+ATTACHMENT_FIELDS: Final = (
+    "interview_summary_attachment",
+    "interview_transcript_attachment",
+)
+MANIFEST_FILE: Final = "manifest.json"
+DOWNLOAD_CHUNK_SIZE: Final = 1024 * 1024
+MAX_RETRIES: Final = 5
+MAX_REDIRECTS: Final = 5
+RETRY_BACKOFF: Final = 0.5
+REQUEST_TIMEOUT: Final = 60.0
+
+unsafe_filename_regex = re.compile(r"[^\w.\- ]+")
+
+# (scheme, host:port)
+Origin = tuple[str, str]
+
+
+@dataclasses.dataclass
+class MirrorReport:
+    """The outcome of mirroring a batch of attachments."""
+
+    downloaded: int = 0
+    resumed: int = 0
+    skipped: int = 0
+    failed: dict[str, str] = dataclasses.field(default_factory=dict)
+    rewritten: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Download throughput."""
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+
+class ConnectionPool:
+    """Keep-alive connections shared by download threads, pooled per origin."""
+
+    def __init__(self, timeout: float = REQUEST_TIMEOUT) -> None:
+        """
+        Start with no connections.
+
+        :param timeout: Seconds to wait on a socket before giving up
+        """
+        self.timeout = timeout
+        self._idle: dict[Origin, list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, origin: Origin) -> http.client.HTTPConnection:
+        """
+        Borrow an idle connection to an origin, or open a new one.
+
+        :param origin: The (scheme, netloc) to connect to
+        :return: A connection the caller has to put back or close
+        """
+        with self._lock:
+            idle = self._idle.get(origin)
+            if idle:
+                return idle.pop()
+        scheme, netloc = origin
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def put(self, origin: Origin, conn: http.client.HTTPConnection) -> None:
+        """
+        Return a connection whose last response was read to the end.
+
+        :param origin: The (scheme, netloc) it is connected to
+        :param conn: The connection
+        :return: None
+        """
+        with self._lock:
+            self._idle.setdefault(origin, []).append(conn)
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+def iter_attachments(records: Iterable[Any]) -> Iterator[dict[str, Any]]:
+    """
+    Find every attachment dictionary on source or destination item records.
+
+    :param records: ItemSourceRecords, ItemRecords or anything else with attachment fields
+    :return: An iterator of the attachment dictionaries themselves, so they can be rewritten in place
+    """
+    for rec in records:
+        for field_name in ATTACHMENT_FIELDS:
+            value = getattr(rec, field_name, None)
+            if isinstance(value, dict):
+                value = [value]
+            for attachment in value or ():
+                if isinstance(attachment, dict) and attachment.get("url"):
+                    yield attachment
+
+
+def local_path(mirror_dir: Path, attachment: dict[str, Any]) -> Path:
+    """
+    Decide where an attachment lives in the mirror.
+
+    :param mirror_dir: Root of the mirror
+    :param attachment: An Airtable attachment dictionary
+    :return: mirror_dir/<attachment id>/<filename>
+    """
+    filename = unsafe_filename_regex.sub("_", str(attachment.get("filename") or ""))
+    filename = filename.strip(". ") or "attachment"
+    return mirror_dir / str(attachment["id"]) / filename
+
+
+def expected_size(attachment: dict[str, Any]) -> Optional[int]:
+    """
+    The size Airtable reported for an attachment.
+
+    Validating an ItemRecord turns the size into a string, so it is converted back here.
+
+    :param attachment: An Airtable attachment dictionary
+    :return: The size in bytes, or None if there isn't one
+    """
+    size = attachment.get("size")
+    return int(size) if size is not None else None
+
+
+def source_url(attachment: dict[str, Any]) -> str:
+    """
+    The URL an attachment came from, even after it has been rewritten.
+
+    :param attachment: An Airtable attachment dictionary
+    :return: The original URL
+    """
+    return str(attachment.get("source_url") or attachment["url"])
+
+
+class AttachmentMirror:
+    """
+    A directory of downloaded attachments and a manifest of their sizes and hashes.
+
+    Downloads go to a .part file first, so an interrupted run picks up where it left off.
+    """
+
+    def __init__(
+        self,
+        mirror_dir: Union[str, Path],
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = REQUEST_TIMEOUT,
+    ) -> None:
+        """
+        Open or create a mirror.
+
+        :param mirror_dir: Where attachments are stored
+        :param workers: Number of concurrent downloads
+        :param timeout: Seconds to wait on a socket before giving up
+        """
+        self.directory = Path(mirror_dir)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self.pool = ConnectionPool(timeout)
+        self.manifest: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        manifest_path = self.directory / MANIFEST_FILE
+        if manifest_path.is_file():
+            with open(manifest_path) as fobject:
+                self.manifest = json.load(fobject)
+
+    def save_manifest(self) -> None:
+        """
+        Write the manifest atomically.
+
+        :return: None
+        """
+        target = self.directory / MANIFEST_FILE
+        tmp = target.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp, "w") as fobject:
+                json.dump(self.manifest, fobject, ensure_ascii=False, indent=1)
+        tmp.replace(target)
+
+    def is_current(self, attachment: dict[str, Any], path: Path) -> bool:
+        """
+        Whether an attachment is already mirrored intact.
+
+        :param attachment: An Airtable attachment dictionary
+        :param path: Where it would be stored
+        :return: True if the file is there with the expected size and the hash recorded when it was downloaded
+        """
+        entry = self.manifest.get(str(attachment["id"]))
+        if entry is None or not path.is_file():
+            return False
+        size = path.stat().st_size
+        expected = expected_size(attachment)
+        if size != entry["size"] or (expected is not None and size != expected):
+            return False
+        return hash_file(path)[0] == entry["sha256"]
+
+    def request(
+        self, url: str, offset: int
+    ) -> tuple[http.client.HTTPResponse, http.client.HTTPConnection, Origin]:
+        """
+        Start a GET, following redirects, asking for the bytes after offset.
+
+        :param url: The attachment URL
+        :param offset: Bytes already on disk
+        :return: The response, its connection and the origin it came from
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            origin = (parts.scheme, parts.netloc)
+            path = parts.path + ("?" + parts.query if parts.query else "")
+            headers = {"Range": "bytes={}-".format(offset)} if offset else {}
+            conn = self.pool.get(origin)
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                raise
+            if resp.status in (301, 302, 303, 307, 308):
+                location = resp.getheader("Location", "")
+                resp.read()
+                self.pool.put(origin, conn)
+                url = urljoin(url, location)
+                continue
+            return (resp, conn, origin)
+        raise RuntimeError("Too many redirects")
+
+    def download(self, attachment: dict[str, Any], path: Path) -> tuple[int, bool]:
+        """
+        Fetch one attachment into path, resuming from a .part file if there is one.
+
+        :param attachment: An Airtable attachment dictionary
+        :param path: Where it goes
+        :return: A tuple of (bytes transferred, whether an earlier partial download was resumed)
+        """
+        part = path.with_name(path.name + ".part")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        expected = expected_size(attachment)
+        transferred = 0
+        resumed = False
+
+        for attempt in range(MAX_RETRIES + 1):
+            offset = part.stat().st_size if part.is_file() else 0
+            if expected is not None and offset == expected:
+                break
+            conn = None
+            before = transferred
+            try:
+                resp, conn, origin = self.request(source_url(attachment), offset)
+                if resp.status == 206:
+                    mode = "ab"
+                    resumed = resumed or offset > 0
+                elif resp.status == 200:
+                    mode = "wb"
+                elif resp.status == 416 and offset:
+                    # Nothing left to send, the part file was already complete
+                    resp.read()
+                    self.pool.put(origin, conn)
+                    break
+                else:
+                    body = resp.read()
+                    self.pool.put(origin, conn)
+                    raise RuntimeError(
+                        "HTTP {} {}".format(
+                            resp.status, body.decode("utf-8", "replace")[:200]
+                        )
+                    )
+                with open(part, mode) as fobject:
+                    while True:
+                        chunk = resp.read(DOWNLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        fobject.write(chunk)
+                        transferred += len(chunk)
+                if resp.length:
+                    # http.client doesn't complain when the body stops short
+                    raise http.client.IncompleteRead(b"", resp.length)
+                self.pool.put(origin, conn)
+                break
+            except (http.client.HTTPException, OSError):
+                # Whatever made it into the part file is kept for the next attempt
+                if conn is not None:
+                    conn.close()
+                if attempt == MAX_RETRIES:
+                    raise
+                # Only back off if nothing got through; a dropped transfer resumes straight away
+                if transferred == before:
+                    time.sleep(RETRY_BACKOFF * 2**attempt)
+
+        size = part.stat().st_size
+        if expected is not None and size != expected:
+            part.unlink()
+            raise RuntimeError("Expected {} bytes but got {}".format(expected, size))
+        sha256 = hash_file(part)[0]
+        part.replace(path)
+        with self._lock:
+            self.manifest[str(attachment["id"])] = {
+                "path": path.relative_to(self.directory).as_posix(),
+                "size": size,
+                "sha256": sha256,
+                "source_url": source_url(attachment),
+            }
+        return (transferred, resumed)
+
+    def mirror(self, records: Iterable[Any], rewrite: bool = True) -> MirrorReport:
+        """
+        Download every attachment the records refer to and point the records at the local copies.
+
+        Each attachment is fetched once however many records share it. Rewritten attachments keep their original URL under source_url, so running again after the URLs have expired still finds them.
+
+        :param records: ItemSourceRecords, ItemRecords or anything else with attachment fields
+        :param rewrite: Replace each attachment's url with its local path
+        :return: A MirrorReport
+        """
+        report = MirrorReport()
+        by_id: dict[str, list[dict[str, Any]]] = {}
+        for attachment in iter_attachments(records):
+            by_id.setdefault(str(attachment["id"]), []).append(attachment)
+
+        def work(attachment_id: str) -> tuple[str, str, int, bool]:
+            attachment = by_id[attachment_id][0]
+            path = local_path(self.directory, attachment)
+            if self.is_current(attachment, path):
+                return (attachment_id, "skipped", 0, False)
+            try:
+                transferred, resumed = self.download(attachment, path)
+            except (RuntimeError, http.client.HTTPException, OSError) as err:
+                return (attachment_id, str(err) or type(err).__name__, 0, False)
+            return (attachment_id, "downloaded", transferred, resumed)
+
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for attachment_id, outcome, transferred, resumed in bounded_map(
+                    executor, work, list(by_id), self.workers * 4
+                ):
+                    if outcome == "skipped":
+                        report.skipped += 1
+                    elif outcome == "downloaded":
+                        report.downloaded += 1
+                        report.resumed += resumed
+                        report.bytes += transferred
+                    else:
+                        report.failed[attachment_id] = outcome
+                        continue
+                    if rewrite:
+                        path = local_path(self.directory, by_id[attachment_id][0])
+                        for attachment in by_id[attachment_id]:
+                            attachment["source_url"] = source_url(attachment)
+                            attachment["url"] = path.as_posix()
+                            report.rewritten += 1
+        finally:
+            self.save_manifest()
+            self.pool.close()
+        report.elapsed = time.perf_counter() - start
+        return report
+
+
+def mirror_attachments(
+    records: Iterable[Any],
+    mirror_dir: Union[str, Path],
+    workers: int = DEFAULT_WORKERS,
+    rewrite: bool = True,
+) -> MirrorReport:
+    """
+    Download every attachment the records refer to into mirror_dir.
+
+    :param records: ItemSourceRecords, ItemRecords or anything else with attachment fields
+    :param mirror_dir: Where attachments are stored
+    :param workers: Number of concurrent downloads
+    :param rewrite: Replace each attachment's url with its local path, keeping the original under source_url
+    :return: A MirrorReport
+    """
+    return AttachmentMirror(mirror_dir, workers).mirror(records, rewrite)
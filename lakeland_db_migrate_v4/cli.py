@@ -0,0 +1,207 @@
+"""The lakeland-migrate command: load, validate, map and write a source export in one go."""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Final, Optional, Sequence
+
+# Same as parallel.TABLE_FIELDMAPS, spelled out so --help doesn't have to import it
+TABLES: Final = (
+    "accessions",
+    "files",
+    "items",
+    "entities",
+    "subjects",
+    "relationships",
+)
+OUTPUT_FORMATS: Final = ("ndjson", "csv", "sqlite")
+SEARCH_INDEX_FILE: Final = "search.idx"
+GRAPH_FILE: Final = "entities.graph"
+# Most seconds `lakeland-migrate --help` may add to a bare interpreter's startup; checked by benchmarks/bench_startup.py
+STARTUP_BUDGET: Final = 0.05
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Describe the command line.
+
+    :return: An ArgumentParser with a subcommand per pipeline mode
+    """
+    parser = argparse.ArgumentParser(
+        prog="lakeland-migrate",
+        description="Migrate Lakeland Digital Archive Airtable exports to the v4 data model.",
+    )
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    shared = argparse.ArgumentParser(add_help=False)
+    shared.add_argument(
+        "source_dir",
+        type=Path,
+        help="directory holding the airtable-export json files",
+    )
+    shared.add_argument(
+        "--tables",
+        nargs="+",
+        choices=TABLES,
+        metavar="TABLE",
+        help="only these tables ({}); all of them by default".format(", ".join(TABLES)),
+    )
+    shared.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="validation processes; 1 validates in this process, one per CPU by default",
+    )
+    shared.add_argument(
+        "--cache",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DIR",
+        help="reuse validation results for unchanged tables, kept in DIR or .lakeland_cache",
+    )
+
+    validate = subcommands.add_parser(
+        "validate",
+        parents=[shared],
+        help="validate source tables and report failures",
+    )
+    validate.set_defaults(handler=run_validate)
+
+    run = subcommands.add_parser(
+        "run",
+        parents=[shared],
+        help="validate, map to destination records and write them out",
+    )
+    run.add_argument("out_dir", type=Path, help="directory to write into")
+    run.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="ndjson",
+        help="output format (default: %(default)s)",
+    )
+    run.add_argument(
+        "--search-index",
+        action="store_true",
+        help="also write a full-text index to {}".format(SEARCH_INDEX_FILE),
+    )
+    run.add_argument(
+        "--graph",
+        action="store_true",
+        help="also write the entity graph to {}".format(GRAPH_FILE),
+    )
+    run.set_defaults(handler=run_pipeline)
+    return parser
+
+
+def validate_tables(args: argparse.Namespace) -> dict[str, Any]:
+    """
+    Validate the tables asked for and print a line per table.
+
+    :param args: Parsed arguments
+    :return: A dictionary of table name to ValidationReport
+    """
+    from .parallel import validate_all
+    from .snapshot_cache import SnapshotCache
+
+    cache = SnapshotCache(args.cache or None) if args.cache is not None else None
+    start = time.perf_counter()
+    reports = validate_all(args.source_dir, args.workers, args.tables, cache=cache)
+    for table, report in reports.items():
+        for failure in report.failures:
+            print(failure)
+        print(
+            "{}: {} records, {} failures".format(
+                table, len(report.records), len(report.failures)
+            )
+        )
+    print("Validated in {:.2f}s".format(time.perf_counter() - start))
+    return reports
+
+
+def run_validate(args: argparse.Namespace) -> int:
+    """
+    Validate source tables without writing anything.
+
+    :param args: Parsed arguments
+    :return: Exit status
+    """
+    validate_tables(args)
+    return 0
+
+
+def run_pipeline(args: argparse.Namespace) -> int:
+    """
+    Validate, map and write, then build the search index and graph if asked to.
+
+    :param args: Parsed arguments
+    :return: Exit status
+    """
+    reports = validate_tables(args)
+
+    from .joins import build_destination_records
+    from .writers import iter_migrated, write_migrated
+
+    start = time.perf_counter()
+    migrated = build_destination_records(reports)
+    print(
+        "Mapped to destination records in {:.2f}s, {} links didn't resolve".format(
+            time.perf_counter() - start, len(migrated.unresolved)
+        )
+    )
+
+    stats = write_migrated(migrated, args.out_dir, args.format)
+    print(
+        "Wrote {} records to {} as {} in {:.2f}s".format(
+            stats.rows, args.out_dir, args.format, stats.elapsed
+        )
+    )
+
+    if args.search_index:
+        from .search import build_search_index
+
+        search_stats = build_search_index(
+            iter_migrated(migrated), args.out_dir / SEARCH_INDEX_FILE
+        )
+        print(
+            "Indexed {} records, {} terms in {:.2f}s".format(
+                search_stats.documents, search_stats.terms, search_stats.elapsed
+            )
+        )
+
+    if args.graph:
+        from .graph import build_entity_graph
+
+        graph_stats = build_entity_graph(
+            iter_migrated(migrated), args.out_dir / GRAPH_FILE
+        )
+        print(
+            "Graphed {} entities, {} items, {} edges in {:.2f}s".format(
+                graph_stats.entities,
+                graph_stats.items,
+                graph_stats.edges,
+                graph_stats.elapsed,
+            )
+        )
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """
+    Run lakeland-migrate.
+
+    Everything past argument parsing is imported only once a subcommand needs it.
+
+    :param argv: Arguments, defaults to sys.argv[1:]
+    :return: Exit status
+    """
+    args = build_parser().parse_args(argv)
+    if args.command == "run" and args.source_dir.resolve() == args.out_dir.resolve():
+        print("Refusing to write output over the source export", file=sys.stderr)
+        return 2
+    return int(args.handler(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""Hold validated source records as compact columns instead of one dataclass per record."""
+
+import dataclasses
+from array import array
+from typing import (
+    Any,
+    Final,
+    Iterable,
+    Iterator,
+    Optional,
+    Text,
+    Union,
+    get_args,
+    get_origin,
+)
+
+LINK_TYPE: Final = Union[str, list[str]]
+# Rows seen before deciding whether a string column repeats itself enough to be worth a dictionary
+DICT_SAMPLE_ROWS: Final = 1024
+# Past this share of distinct values, e.g. ids and titles, codes and a lookup only add to the strings
+MAX_DISTINCT_RATIO: Final = 0.5
+
+
+class DictColumn:
+    """Strings stored once each, with a code per row, or as a plain list once most of them turn out to be distinct."""
+
+    __slots__ = ("values", "codes", "plain", "_lookup")
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self.values: list[str] = []
+        self.codes = array("I")
+        self.plain: Optional[list[str]] = None
+        self._lookup: Optional[dict[str, int]] = {}
+
+    def encode(self, value: str) -> int:
+        """Intern a string and return its code."""
+        if self._lookup is None:
+            self._lookup = {v: i for i, v in enumerate(self.values)}
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode_all(self) -> None:
+        """Switch to a plain list of strings, keeping the rows so far."""
+        values = self.values
+        self.plain = [values[code] for code in self.codes]
+        self.values = []
+        self.codes = array("I")
+        self._lookup = None
+
+    def mostly_distinct(self) -> bool:
+        """Whether the dictionary holds nearly as many strings as there are rows."""
+        return len(self.values) > len(self.codes) * MAX_DISTINCT_RATIO
+
+    def freeze(self) -> None:
+        """Drop the build-time lookup, and the dictionary too if it didn't pay off; the lookup is rebuilt if anything is appended later."""
+        if self.plain is None and self.codes and self.mostly_distinct():
+            self.decode_all()
+        self._lookup = None
+
+    def append(self, value: str) -> None:
+        """Add a row."""
+        if self.plain is not None:
+            self.plain.append(value)
+            return
+        self.codes.append(self.encode(value))
+        if len(self.codes) == DICT_SAMPLE_ROWS and self.mostly_distinct():
+            self.decode_all()
+
+    def __getitem__(self, i: int) -> str:
+        """Decode a row."""
+        if self.plain is not None:
+            return self.plain[i]
+        return self.values[self.codes[i]]
+
+
+class MultiColumn:
+    """
+    Multi-valued link fields packed into an offsets array and a values array.
+
+    Singleton unwrapping means a link field can hold either a string or a list, so a flag per row remembers which it was.
+    """
+
+    __slots__ = ("dictionary", "offsets", "values", "scalar")
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self.dictionary = DictColumn()
+        self.offsets = array("Q", [0])
+        self.values = array("I")
+        self.scalar = bytearray()
+
+    def append(self, value: Union[str, list[str]]) -> None:
+        """Add a row."""
+        if isinstance(value, str):
+            self.scalar.append(1)
+            if value:
+                self.values.append(self.dictionary.encode(value))
+        else:
+            self.scalar.append(0)
+            encode = self.dictionary.encode
+            self.values.extend(encode(v) for v in value)
+        self.offsets.append(len(self.values))
+
+    def freeze(self) -> None:
+        """Drop the build-time lookup."""
+        self.dictionary.freeze()
+
+    def __getitem__(self, i: int) -> Union[str, list[str]]:
+        """Decode a row back to the shape it came in."""
+        strings = self.dictionary.values
+        decoded = [
+            strings[code] for code in self.values[self.offsets[i] : self.offsets[i + 1]]
+        ]
+        if self.scalar[i]:
+            return decoded[0] if decoded else ""
+        return decoded
+
+
+class ArrayColumn:
+    """Numbers and flags in a typed array."""
+
+    __slots__ = ("data", "cast")
+
+    def __init__(self, typecode: str, cast: type) -> None:
+        """Start empty."""
+        self.data = array(typecode)
+        self.cast = cast
+
+    def append(self, value: Any) -> None:
+        """Add a row."""
+        self.data.append(value)
+
+    def __getitem__(self, i: int) -> Any:
+        """Decode a row."""
+        return self.cast(self.data[i])
+
+
+class ObjectColumn:
+    """Anything we don't have a compact form for, e.g. attachment blobs."""
+
+    __slots__ = ("data",)
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self.data: list[Any] = []
+
+    def append(self, value: Any) -> None:
+        """Add a row."""
+        self.data.append(value)
+
+    def __getitem__(self, i: int) -> Any:
+        """Decode a row."""
+        return self.data[i]
+
+
+Column = Union[DictColumn, MultiColumn, ArrayColumn, ObjectColumn]
+
+
+def column_for(field_type: Any) -> Column:
+    """
+    Pick a column layout from a dataclass field annotation.
+
+    :param field_type: The annotation of a source record field
+    :return: An empty column
+    """
+    if field_type is str or field_type is Text:
+        return DictColumn()
+    if field_type is bool:
+        return ArrayColumn("b", bool)
+    if field_type is int:
+        return ArrayColumn("q", int)
+    if field_type == LINK_TYPE or (
+        get_origin(field_type) is list and get_args(field_type) == (str,)
+    ):
+        return MultiColumn()
+    return ObjectColumn()
+
+
+class RowView:
+    """A lightweight stand-in for one source record, read straight from the columns."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "ColumnarTable", index: int) -> None:
+        """Point at a row."""
+        self._table = table
+        self._index = index
+
+    def __getattr__(self, name: str) -> Any:
+        """Look a field up in its column."""
+        try:
+            column = self._table.columns[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return column[self._index]
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Decode the whole row.
+
+        :return: A dictionary of field name to value
+        """
+        return {name: col[self._index] for name, col in self._table.columns.items()}
+
+    def __repr__(self) -> str:
+        """Show the row like the dataclass would."""
+        return "{}View({})".format(
+            self._table.record_class.__name__,
+            ", ".join("{}={!r}".format(k, v) for k, v in self.as_dict().items()),
+        )
+
+
+class ColumnarTable:
+    """
+    One source table stored column by column.
+
+    Repeated strings are dictionary-encoded while mostly distinct ones are kept as they are, link fields are packed into offset and value arrays and rows are read back through RowView.
+    """
+
+    def __init__(self, record_class: type) -> None:
+        """
+        Lay out columns for a source record dataclass.
+
+        :param record_class: One of the *SourceRecord dataclasses
+        """
+        self.record_class = record_class
+        self.columns: dict[str, Column] = {
+            f.name: column_for(f.type) for f in dataclasses.fields(record_class)
+        }
+        self._length = 0
+
+    @classmethod
+    def from_records(
+        cls, records: Iterable[Any], record_class: type
+    ) -> "ColumnarTable":
+        """
+        Build a table from validated records, which can be a generator so they never all exist at once.
+
+        :param records: Validated source records
+        :param record_class: Their dataclass
+        :return: A ColumnarTable
+        """
+        table = cls(record_class)
+        table.extend(records)
+        table.freeze()
+        return table
+
+    def append(self, record: Any) -> None:
+        """
+        Add a validated record.
+
+        :param record: An instance of the table's record class
+        :return: None
+        """
+        for name, column in self.columns.items():
+            column.append(getattr(record, name))
+        self._length += 1
+
+    def extend(self, records: Iterable[Any]) -> None:
+        """
+        Add many validated records.
+
+        :param records: Instances of the table's record class
+        :return: None
+        """
+        for record in records:
+            self.append(record)
+
+    def freeze(self) -> None:
+        """
+        Release memory only needed while rows are being added.
+
+        :return: None
+        """
+        for column in self.columns.values():
+            if isinstance(column, (DictColumn, MultiColumn)):
+                column.freeze()
+
+    def __len__(self) -> int:
+        """Count rows."""
+        return self._length
+
+    def __getitem__(self, index: int) -> RowView:
+        """Get a view of one row."""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        return RowView(self, index)
+
+    def __iter__(self) -> Iterator[RowView]:
+        """Iterate over row views."""
+        return (RowView(self, i) for i in range(self._length))
+
+    def column(self, name: str) -> list[Any]:
+        """
+        Decode a whole column.
+
+        :param name: A field name
+        :return: The values in row order
+        """
+        col = self.columns[name]
+        return [col[i] for i in range(self._length)]
@@ -0,0 +1,416 @@
+"""Migrate only what changed between two Airtable export snapshots."""
+
+import dataclasses
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Callable, Final, Iterable, Iterator, Mapping, Optional, Union
+
+from pydantic import ValidationError
+
+from .joins import JoinIndex, as_id_list
+from .parallel import TABLE_FIELDMAPS
+from .sources import (
+    AIRTABLE_JSON,
+    ValidationFailure,
+    check_key_mappings,
+    compile_transformer,
+    error_hint,
+    stream_from_file,
+    validator_switch,
+)
+
+ADDED: Final = "added"
+CHANGED: Final = "changed"
+REMOVED: Final = "removed"
+UNCHANGED: Final = "unchanged"
+# Changed records whose destination idno changed with them
+RENUMBERED: Final = "renumbered"
+DEPENDENT: Final = "dependent"
+
+# (table, link field, linked table) where the table's destination records embed the linked records whole
+EMBEDDED_LINKS: Final[tuple[tuple[str, str, str], ...]] = (
+    ("items", "linked_people", "entities"),
+    ("items", "linked_places_orgs", "entities"),
+    ("items", "linked_entity_source", "entities"),
+    ("items", "linked_entity_interviewers", "entities"),
+    ("items", "linked_entity_interviewees", "entities"),
+    ("items", "linked_subjects", "subjects"),
+)
+# (table, link field, linked table) where the table's destination records only hold the linked records' idnos
+REFERENCE_LINKS: Final[tuple[tuple[str, str, str], ...]] = (
+    ("items", "linked_entity_as_creator", "entities"),
+    ("files", "linked_accession", "accessions"),
+    ("files", "part_of_item", "items"),
+    ("subjects", "linked_items_array", "items"),
+    ("relationships", "entity_1", "entities"),
+    ("relationships", "entity_2", "entities"),
+)
+# An item's donors are the donor entities of its files' accessions, so changes reach it along these links, walked backwards
+DONOR_LINKS: Final[tuple[tuple[str, str, str], ...]] = (
+    ("accessions", "linked_entity_array", "entities"),
+    ("files", "linked_accession", "accessions"),
+    ("items", "linked_files_array", "files"),
+)
+
+
+def record_hash(raw: AIRTABLE_JSON) -> str:
+    """
+    Hash the content of a raw Airtable record independently of key order.
+
+    :param raw: A raw Airtable record
+    :return: A hex digest
+    """
+    canonical = json.dumps(
+        raw, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def idno_source(table: str, raw: AIRTABLE_JSON) -> str:
+    """
+    The raw value a record's destination idno comes from.
+
+    :param table: Name of the table
+    :param raw: A raw Airtable record
+    :return: The record's ID field, or its airtable_id for tables whose destination records use that
+    """
+    for key, field_name in TABLE_FIELDMAPS[table].items():
+        if field_name == "idno":
+            return str(raw.get(key, ""))
+    return str(raw["airtable_id"])
+
+
+def snapshot_hashes(
+    table: str, source_dir: Path, idno_collector: Optional[dict[str, str]] = None
+) -> dict[str, str]:
+    """
+    Stream a table from a snapshot keeping only a content hash per record.
+
+    :param table: Name of the table
+    :param source_dir: The snapshot's source data directory
+    :param idno_collector: Optional dictionary to fill with airtable_id to idno_source
+    :return: A dictionary of airtable_id to content hash
+    """
+    hashes = {}
+    for raw in stream_from_file("{}.json".format(table), source_dir=source_dir):
+        airtable_id = str(raw["airtable_id"])
+        hashes[airtable_id] = record_hash(raw)
+        if idno_collector is not None:
+            idno_collector[airtable_id] = idno_source(table, raw)
+    return hashes
+
+
+class LazyTable(Mapping[str, Any]):
+    """
+    Raw records of one table that are only validated when something asks for them.
+
+    Records that fail validation behave as if they were missing, and the failure is kept.
+    """
+
+    def __init__(self, table: str, raw: dict[str, AIRTABLE_JSON]) -> None:
+        """
+        Wrap raw records keyed by airtable_id.
+
+        :param table: Name of the table, used to pick the validator and fieldmap
+        :param raw: Raw Airtable records by airtable_id
+        """
+        self.table = table
+        self.raw = raw
+        self.failures: dict[str, ValidationFailure] = {}
+        self._transform = compile_transformer(
+            validator_switch[table], TABLE_FIELDMAPS[table]
+        )
+        self._validated: dict[str, Any] = {}
+
+    def __getitem__(self, airtable_idno: str) -> Any:
+        """Validate a record the first time it is looked up."""
+        rec = self._validated.get(airtable_idno)
+        if rec is None:
+            if airtable_idno in self.failures:
+                raise KeyError(airtable_idno)
+            result = self._transform(self.raw[airtable_idno])
+            if type(result) is ValidationFailure:
+                self.failures[airtable_idno] = result
+                raise KeyError(airtable_idno)
+            rec = self._validated[airtable_idno] = result
+        return rec
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over airtable_ids without validating anything."""
+        return iter(self.raw)
+
+    def __len__(self) -> int:
+        """Count raw records."""
+        return len(self.raw)
+
+    @property
+    def validated_count(self) -> int:
+        """How many records have actually been validated so far."""
+        return len(self._validated) + len(self.failures)
+
+
+@dataclasses.dataclass
+class TableDelta:
+    """The changes to one table between two snapshots."""
+
+    table: str
+    added: list[Any] = dataclasses.field(default_factory=list)
+    changed: list[Any] = dataclasses.field(default_factory=list)
+    # airtable_idno of records that are gone, i.e. v3_airtable_idno downstream
+    removed: list[str] = dataclasses.field(default_factory=list)
+    unchanged: int = 0
+    failures: list[ValidationFailure] = dataclasses.field(default_factory=list)
+    # airtable_idno of records that didn't change themselves but embed one that did, or hold its changed idno; they are in changed too
+    dependent: list[str] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class Changeset:
+    """Destination records to add, replace or delete to bring a migration up to date."""
+
+    previous: str
+    current: str
+    tables: dict[str, TableDelta] = dataclasses.field(default_factory=dict)
+    validated: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Flatten the changeset into json-friendly data.
+
+        :return: A dictionary with one entry per table
+        """
+        return {
+            "previous": self.previous,
+            "current": self.current,
+            "tables": {
+                name: {
+                    ADDED: [dataclasses.asdict(r) for r in delta.added],
+                    CHANGED: [dataclasses.asdict(r) for r in delta.changed],
+                    REMOVED: delta.removed,
+                    UNCHANGED: delta.unchanged,
+                    DEPENDENT: delta.dependent,
+                    "failures": [dataclasses.asdict(f) for f in delta.failures],
+                }
+                for name, delta in self.tables.items()
+            },
+        }
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        """
+        Save the changeset for a downstream loader.
+
+        :param path: Where to write the json
+        :return: None
+        """
+        with open(path, "w") as fobject:
+            json.dump(self.as_dict(), fobject, ensure_ascii=False)
+
+
+def classify_table(
+    table: str, previous_dir: Path, current_dir: Path
+) -> tuple[dict[str, list[str]], dict[str, AIRTABLE_JSON]]:
+    """
+    Sort the records of one table into added, changed, removed and unchanged, noting which changed records were renumbered.
+
+    :param table: Name of the table
+    :param previous_dir: Source data directory of the previous snapshot
+    :param current_dir: Source data directory of the current snapshot
+    :return: A tuple of (airtable_ids by status, raw current records by airtable_id)
+    """
+    previous_idnos: dict[str, str] = {}
+    previous = snapshot_hashes(table, previous_dir, previous_idnos)
+    status: dict[str, list[str]] = {
+        ADDED: [],
+        CHANGED: [],
+        REMOVED: [],
+        UNCHANGED: [],
+        RENUMBERED: [],
+    }
+    current: dict[str, AIRTABLE_JSON] = {}
+    keys: dict[str, None] = {}
+
+    for raw in stream_from_file(
+        "{}.json".format(table), key_collector=keys, source_dir=current_dir
+    ):
+        airtable_id = str(raw["airtable_id"])
+        current[airtable_id] = raw
+        old_hash = previous.pop(airtable_id, None)
+        if old_hash is None:
+            status[ADDED].append(airtable_id)
+        elif old_hash != record_hash(raw):
+            status[CHANGED].append(airtable_id)
+            if previous_idnos[airtable_id] != idno_source(table, raw):
+                status[RENUMBERED].append(airtable_id)
+        else:
+            status[UNCHANGED].append(airtable_id)
+
+    status[REMOVED] = list(previous)
+
+    try:
+        check_key_mappings(tuple(keys), TABLE_FIELDMAPS[table])
+    except RuntimeError as err:
+        print("Warning — {}. Key: {}".format(err.args[0], err.args[1]))
+        raise
+
+    return (status, current)
+
+
+def linking_records(
+    raw: Mapping[str, AIRTABLE_JSON], table: str, field_name: str, targets: set[str]
+) -> set[str]:
+    """
+    Find the records of a table whose link field points at any of some records.
+
+    :param raw: Raw records of the table by airtable_id
+    :param table: Name of the table
+    :param field_name: A link field, as named on the source dataclass
+    :param targets: airtable_ids of the linked records to look for
+    :return: airtable_ids of the records linking to them
+    """
+    keys = [k for k, v in TABLE_FIELDMAPS[table].items() if v == field_name]
+    return {
+        airtable_id
+        for airtable_id, rec in raw.items()
+        if any(link in targets for key in keys for link in as_id_list(rec.get(key, "")))
+    }
+
+
+def dependent_records(
+    statuses: Mapping[str, dict[str, list[str]]],
+    raw: Mapping[str, Mapping[str, AIRTABLE_JSON]],
+) -> dict[str, set[str]]:
+    """
+    Find unchanged records whose destination records embed something that changed, or refer to something by an idno that changed.
+
+    :param statuses: airtable_ids by status for each table that was diffed
+    :param raw: Raw current records by airtable_id for every table
+    :return: airtable_ids of dependent records by table, for the tables that were diffed
+    """
+    # Records whose destination record may differ, and those whose idno may differ or that appeared or went away
+    touched: dict[str, set[str]] = {table: set() for table in raw}
+    renumbered: dict[str, set[str]] = {table: set() for table in raw}
+    for table, status in statuses.items():
+        touched[table] = set(status[ADDED] + status[CHANGED] + status[REMOVED])
+        renumbered[table] = set(status[ADDED] + status[RENUMBERED] + status[REMOVED])
+
+    # A change anywhere along entity -> accession -> file reaches the items holding those files as donors
+    reached: set[str] = set()
+    for table, field_name, target in DONOR_LINKS:
+        reached = touched[target] | reached
+        if reached:
+            reached = linking_records(raw[table], table, field_name, reached)
+    touched["items"] |= reached
+
+    for table, field_name, target in REFERENCE_LINKS:
+        if renumbered[target]:
+            touched[table] |= linking_records(
+                raw[table], table, field_name, renumbered[target]
+            )
+
+    # Items embed subjects, so a subject holding a renumbered item's idno reaches the items embedding it
+    for table, field_name, target in EMBEDDED_LINKS:
+        if touched[target]:
+            touched[table] |= linking_records(
+                raw[table], table, field_name, touched[target]
+            )
+
+    return {
+        table: set(status[UNCHANGED]) & touched[table]
+        for table, status in statuses.items()
+    }
+
+
+def diff_snapshots(
+    previous_dir: Union[str, Path],
+    current_dir: Union[str, Path],
+    tables: Optional[Iterable[str]] = None,
+) -> Changeset:
+    """
+    Compare two snapshots and map only added and changed records to destination records.
+
+    Every record is hashed, but only records that changed, or that a changed record links to, are validated. Unchanged records whose destination records embed a record that was added, changed or removed, e.g. items linking to a renamed entity, are mapped again and listed as changed too, so the changeset is complete for loaders that store items with their entities and subjects inline. Changes are only known, and dependents only listed, for the tables being compared.
+
+    :param previous_dir: Source data directory of the previous export
+    :param current_dir: Source data directory of the current export
+    :param tables: Names of the tables to compare, defaults to all six
+    :return: A Changeset
+    """
+    previous_path = Path(previous_dir)
+    current_path = Path(current_dir)
+    table_names = list(tables) if tables is not None else list(TABLE_FIELDMAPS)
+
+    # Links have to resolve against the current snapshot even for tables we aren't diffing
+    statuses: dict[str, dict[str, list[str]]] = {}
+    lazy: dict[str, LazyTable] = {}
+    for table in TABLE_FIELDMAPS:
+        if table in table_names:
+            statuses[table], raw = classify_table(table, previous_path, current_path)
+        else:
+            raw = {
+                str(r["airtable_id"]): r
+                for r in stream_from_file(
+                    "{}.json".format(table), source_dir=current_path
+                )
+            }
+        lazy[table] = LazyTable(table, raw)
+
+    index = JoinIndex(
+        accessions=lazy["accessions"],
+        files=lazy["files"],
+        items=lazy["items"],
+        entities=lazy["entities"],
+        subjects=lazy["subjects"],
+        relationships=lazy["relationships"],
+    )
+    mappers: dict[str, Callable[[Any], Any]] = {
+        "accessions": index.donation_grouping_record,
+        "files": index.file_record,
+        "items": index.item_record,
+        "entities": index.entity_record,
+        "subjects": index.subject_record,
+        "relationships": index.entity_relationship_record,
+    }
+
+    dependents = dependent_records(
+        statuses, {table: lazy[table].raw for table in TABLE_FIELDMAPS}
+    )
+
+    changeset = Changeset(previous=str(previous_path), current=str(current_path))
+    for table in table_names:
+        status = statuses[table]
+        dependent = [i for i in status[UNCHANGED] if i in dependents[table]]
+        delta = TableDelta(
+            table=table,
+            removed=status[REMOVED],
+            unchanged=len(status[UNCHANGED]) - len(dependent),
+            dependent=dependent,
+        )
+        for kind, airtable_ids in (
+            (ADDED, status[ADDED]),
+            (CHANGED, status[CHANGED] + dependent),
+        ):
+            out = getattr(delta, kind)
+            for airtable_id in airtable_ids:
+                try:
+                    src = lazy[table][airtable_id]
+                except KeyError:
+                    delta.failures.append(lazy[table].failures[airtable_id])
+                    continue
+                try:
+                    out.append(mappers[table](src))
+                except (RuntimeError, ValidationError) as err:
+                    # Report it with the validation failures and carry on with the rest of the diff
+                    print("Error mapping record {}: {}".format(airtable_id, err))
+                    delta.failures.append(
+                        ValidationFailure(
+                            airtable_idno=airtable_id,
+                            hint=error_hint(type(src).__name__, vars(src)),
+                            error_type=type(err).__name__,
+                            message=str(err),
+                        )
+                    )
+        changeset.tables[table] = delta
+
+    changeset.validated = sum(t.validated_count for t in lazy.values())
+    return changeset
@@ -1,9 +1,12 @@
 """Map data to v4 data model."""
+
+import time
 from dataclasses import InitVar, field
 from typing import Text, Tuple, Union
 from pydantic import Field
 from pydantic.dataclasses import dataclass
-from .utils import derive_date
+from .instrumentation import POST_INIT, active_instrumentation
+from .utils import normalize_date
 
 __all__ = [
     "DonationGroupingRecord",
@@ -16,7 +19,19 @@ __all__ = [
 
 # TYPE HINTING HELPERS
 AIRTABLE_ATTACHMENTS_THUMBNAILS = dict[str, Union[int, str]]
-AIRTABLE_ATTACHMENTS = list[dict[str, Union[str, int, AIRTABLE_ATTACHMENTS_THUMBNAILS]]]
+# Airtable nests a url, width and height under each of small, large and full
+AIRTABLE_ATTACHMENTS_THUMBNAIL_SIZES = dict[str, AIRTABLE_ATTACHMENTS_THUMBNAILS]
+AIRTABLE_ATTACHMENTS = list[
+    dict[
+        str,
+        Union[
+            str,
+            int,
+            AIRTABLE_ATTACHMENTS_THUMBNAILS,
+            AIRTABLE_ATTACHMENTS_THUMBNAIL_SIZES,
+        ],
+    ]
+]
 
 
 @dataclass
@@ -109,10 +124,22 @@ class ItemRecord(MigratedRecord):
 
     def __post_init_post_parse__(self, v3_created_date: str) -> None:
         """Deal with date information."""
-        dtobj = derive_date(v3_created_date)
-        if dtobj is not None:
-            object.__setattr__(self, "created_date", dtobj.strftime("%Y-%m-%d"))
-            object.__setattr__(self, "creation_year", dtobj.strftime("%Y"))
+        inst = active_instrumentation.get()
+        start = time.perf_counter() if inst is not None else 0.0
+        normalized = normalize_date(v3_created_date)
+        if normalized is not None:
+            if not normalized.parsed:
+                raise RuntimeError("Couldn't handle date: {}".format(v3_created_date))
+            object.__setattr__(self, "created_date", normalized.edtf)
+            object.__setattr__(self, "creation_year", normalized.year)
+        if inst is not None:
+            inst.record(
+                POST_INIT,
+                time.perf_counter() - start,
+                self.v3_airtable_idno,
+                record_class=type(self).__name__,
+                table="items",
+            )
 
 
 @dataclass
@@ -124,4 +151,4 @@ class EntityRelationshipRecord(MigratedRecord):
     object_entity: str
     relationship_predicate: str
     relationship_start_date: str = ""
-    relationship_end_date: str = ""
\ No newline at end of file
+    relationship_end_date: str = ""
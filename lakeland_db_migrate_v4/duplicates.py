@@ -0,0 +1,292 @@
+"""Find files that are stored more than once on the NAS."""
+
+import dataclasses
+import hashlib
+import json
+import os
+import stat
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Final, Iterable, Optional, Union
+from .fixity import DEFAULT_WORKERS, bounded_map, compute_fixity
+from .sources import FileSourceRecord
+
+if TYPE_CHECKING:
+    from .fixity_cache import FixityCache
+
+# Bytes read from each end of a file for the partial hash
+PARTIAL_HASH_SIZE: Final = 64 * 1024
+
+# A file on disk, as (st_dev, st_ino), so hard links and repeated locations count once
+FileKey = tuple[int, int]
+
+
+@dataclasses.dataclass
+class FileCopy:
+    """One location of a file, and the Airtable records that point at it."""
+
+    location: str
+    size: int
+    file_idno: str
+    airtable_idno: str
+    accession: str
+    item: str
+
+
+@dataclasses.dataclass
+class DuplicateCluster:
+    """Every copy of one file's contents."""
+
+    sha256_hexdigest: str
+    size: int
+    stored: int
+    copies: list[FileCopy] = dataclasses.field(default_factory=list)
+
+    @property
+    def wasted_bytes(self) -> int:
+        """Space we'd get back by keeping a single copy."""
+        return self.size * (self.stored - 1)
+
+    @property
+    def accessions(self) -> list[str]:
+        """Accessions owning a copy."""
+        return sorted({c.accession for c in self.copies if c.accession})
+
+    @property
+    def items(self) -> list[str]:
+        """Items owning a copy."""
+        return sorted({c.item for c in self.copies if c.item})
+
+
+@dataclasses.dataclass
+class DuplicateReport:
+    """The outcome of a duplicate search, with how much each stage narrowed it."""
+
+    clusters: list[DuplicateCluster] = dataclasses.field(default_factory=list)
+    missing: list[str] = dataclasses.field(default_factory=list)
+    files: int = 0
+    size_candidates: int = 0
+    partial_candidates: int = 0
+    bytes_hashed: int = 0
+    cache_hits: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def wasted_bytes(self) -> int:
+        """Space taken up by redundant copies."""
+        return sum(c.wasted_bytes for c in self.clusters)
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Flatten the report into json-friendly data.
+
+        :return: A dictionary of clusters, largest waste first, and stage counts
+        """
+        return {
+            "files": self.files,
+            "size_candidates": self.size_candidates,
+            "partial_candidates": self.partial_candidates,
+            "bytes_hashed": self.bytes_hashed,
+            "cache_hits": self.cache_hits,
+            "wasted_bytes": self.wasted_bytes,
+            "missing": self.missing,
+            "clusters": [
+                {
+                    "sha256_hexdigest": c.sha256_hexdigest,
+                    "size": c.size,
+                    "stored": c.stored,
+                    "wasted_bytes": c.wasted_bytes,
+                    "accessions": c.accessions,
+                    "items": c.items,
+                    "copies": [dataclasses.asdict(copy) for copy in c.copies],
+                }
+                for c in self.clusters
+            ],
+        }
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        """
+        Save the clusters for review before deduplicating.
+
+        :param path: Where to write the json
+        :return: None
+        """
+        with open(path, "w") as fobject:
+            json.dump(self.as_dict(), fobject, ensure_ascii=False)
+
+
+def partial_hash(
+    path: Path, size: int, sample: int = PARTIAL_HASH_SIZE
+) -> tuple[str, bool]:
+    """
+    Hash the head and tail of a file, enough to tell most same-sized files apart.
+
+    Files no bigger than both samples are read whole, and get a SHA-256 that needs no second pass.
+
+    :param path: The file to sample
+    :param size: Its size from stat
+    :param sample: Bytes to read from each end
+    :return: A tuple of (hex digest, whether it is the SHA-256 of the whole file)
+    """
+    with open(path, "rb") as fobject:
+        if size <= 2 * sample:
+            return (hashlib.sha256(fobject.read()).hexdigest(), True)
+        h = hashlib.blake2b(fobject.read(sample), digest_size=16)
+        fobject.seek(size - sample)
+        h.update(fobject.read(sample))
+    return (h.hexdigest(), False)
+
+
+def stat_location(location: str, mount_root: Path) -> Optional[os.stat_result]:
+    """
+    Stat a location, treating anything that isn't a regular file as missing.
+
+    :param location: A normalized location from FileSourceRecord.locations
+    :param mount_root: Where the NAS is mounted locally
+    :return: The stat, or None
+    """
+    try:
+        st = os.stat(mount_root / location)
+    except OSError:
+        return None
+    return st if stat.S_ISREG(st.st_mode) else None
+
+
+def find_duplicates(
+    sources: Iterable[FileSourceRecord],
+    mount_root: Union[str, Path],
+    workers: int = DEFAULT_WORKERS,
+    cache: Optional["FixityCache"] = None,
+    min_size: int = 1,
+) -> DuplicateReport:
+    """
+    Find every file stored at more than one location across all source records.
+
+    Files are grouped by size, then by a hash of their first and last PARTIAL_HASH_SIZE bytes, and only what still collides gets a full SHA-256. Each stage runs on a thread pool with at most workers * 4 files in flight.
+
+    A file reached from several locations, through hard links or records sharing a location, is reported too, as a cluster stored once that wastes nothing.
+
+    :param sources: Validated FileSourceRecords
+    :param mount_root: Where the NAS is mounted locally
+    :param workers: Number of files read concurrently
+    :param cache: A FixityCache to take SHA-256 digests from, and to add new ones to
+    :param min_size: Ignore files smaller than this, empty ones by default
+    :return: A DuplicateReport with clusters ordered by wasted space
+    """
+    root = Path(mount_root)
+    report = DuplicateReport()
+    limit = workers * 4
+    copies: dict[FileKey, list[FileCopy]] = defaultdict(list)
+    stats: dict[FileKey, tuple[str, os.stat_result]] = {}
+    hits_before = cache.hits if cache is not None else 0
+
+    def locate(
+        pair: tuple[FileSourceRecord, str],
+    ) -> tuple[FileSourceRecord, str, Optional[os.stat_result]]:
+        src, location = pair
+        return (src, location, stat_location(location, root))
+
+    def shared(group: list[FileKey]) -> bool:
+        return len(group) > 1 or len(copies[group[0]]) > 1
+
+    def candidates(
+        groups: dict[Any, list[FileKey]],
+    ) -> list[tuple[FileKey, str, os.stat_result]]:
+        return [
+            (key,) + stats[key]
+            for group in groups.values()
+            if shared(group)
+            for key in group
+        ]
+
+    start = time.perf_counter()
+    pairs = (
+        (src, location) for src in sources for location in dict.fromkeys(src.locations)
+    )
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Stage 1: stat every location, grouping by size
+        by_size: dict[int, list[FileKey]] = defaultdict(list)
+        for src, location, st in bounded_map(pool, locate, pairs, limit):
+            if st is None:
+                report.missing.append(location)
+                continue
+            if st.st_size < min_size:
+                continue
+            key = (st.st_dev, st.st_ino)
+            copies[key].append(
+                FileCopy(
+                    location=location,
+                    size=st.st_size,
+                    file_idno=src.idno,
+                    airtable_idno=src.airtable_idno,
+                    accession=src.linked_accession,
+                    item=src.part_of_item,
+                )
+            )
+            if key not in stats:
+                stats[key] = (location, st)
+                by_size[st.st_size].append(key)
+        report.files = len(stats)
+
+        # Stage 2: partial hash of whatever shares a size with something else
+        size_candidates = candidates(by_size)
+        report.size_candidates = len(size_candidates)
+        by_partial: dict[tuple[int, str], list[FileKey]] = defaultdict(list)
+        complete: dict[FileKey, str] = {}
+
+        def sample(
+            candidate: tuple[FileKey, str, os.stat_result],
+        ) -> tuple[FileKey, str, bool]:
+            key, location, st = candidate
+            return (key,) + partial_hash(root / location, st.st_size)
+
+        for key, digest, whole in bounded_map(pool, sample, size_candidates, limit):
+            by_partial[(stats[key][1].st_size, digest)].append(key)
+            if whole:
+                complete[key] = digest
+
+        # Stage 3: full hash of whatever still collides
+        partial_candidates = candidates(by_partial)
+        report.partial_candidates = len(partial_candidates)
+        by_digest: dict[str, list[FileKey]] = defaultdict(list)
+
+        def digest(
+            candidate: tuple[FileKey, str, os.stat_result],
+        ) -> tuple[FileKey, str, bool]:
+            key, location, st = candidate
+            if key in complete:
+                return (key, complete[key], False)
+            if cache is not None:
+                cached = cache.lookup(location, st)
+                if cached is not None:
+                    return (key, cached.sha256_hexdigest, False)
+            result = compute_fixity(location, root, st=st)
+            if cache is not None:
+                cache.store(result, st.st_ino)
+            return (key, result.sha256_hexdigest, True)
+
+        for key, sha256, hashed in bounded_map(pool, digest, partial_candidates, limit):
+            by_digest[sha256].append(key)
+            if hashed:
+                report.bytes_hashed += stats[key][1].st_size
+
+    for sha256, group in by_digest.items():
+        if not shared(group):
+            continue
+        report.clusters.append(
+            DuplicateCluster(
+                sha256_hexdigest=sha256,
+                size=stats[group[0]][1].st_size,
+                stored=len(group),
+                copies=[c for key in group for c in copies[key]],
+            )
+        )
+    report.clusters.sort(key=lambda c: (-c.wasted_bytes, c.sha256_hexdigest))
+    report.elapsed = time.perf_counter() - start
+
+    if cache is not None:
+        report.cache_hits = cache.hits - hits_before
+
+    return report
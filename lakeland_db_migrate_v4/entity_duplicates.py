@@ -0,0 +1,409 @@
+"""Find Entities that are probably the same person, place or organization entered more than once."""
+
+import dataclasses
+import json
+import random
+import re
+import time
+import zlib
+from collections import defaultdict
+from difflib import SequenceMatcher
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Final, Iterable, Mapping, Optional, Union
+
+from .integrity import FOREIGN_KEYS
+from .joins import as_id_list
+from .search import tokenize
+from .sources import ValidationReport
+from .utils import normalize_date
+
+DEFAULT_THRESHOLD: Final = 0.6
+# Blocks bigger than this hold a name part too common to say anything, e.g. every "john"
+MAX_BLOCK_SIZE: Final = 50
+# Only the first few tokens of a long name make token pair keys
+MAX_KEY_TOKENS: Final = 6
+NGRAM_SIZE: Final = 3
+# 8 bands of 4 rows pick up pairs from a character trigram Jaccard of about 0.6
+MINHASH_BANDS: Final = 8
+MINHASH_ROWS: Final = 4
+MINHASH_PRIME: Final = (1 << 61) - 1
+HONORIFICS: Final = frozenset("mr mrs ms miss dr rev jr sr".split())
+TOKEN_CACHE_SIZE: Final = 65536
+
+alt_name_separator_regex = re.compile(r"[;|\n]+")
+
+SOUNDEX_CODES: Final = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+_minhash_rng = random.Random(0)
+MINHASH_SEEDS: Final = [
+    (
+        _minhash_rng.randrange(1, MINHASH_PRIME),
+        _minhash_rng.randrange(0, MINHASH_PRIME),
+    )
+    for _ in range(MINHASH_BANDS * MINHASH_ROWS)
+]
+
+
+def soundex(token: str) -> str:
+    """
+    American Soundex code of a name part.
+
+    :param token: A normalized name token
+    :return: A letter and three digits, e.g. "s530" for both smith and smyth; digits are kept as they are
+    """
+    if not token.isalpha():
+        return token
+    code = token[0]
+    last = SOUNDEX_CODES.get(token[0], "")
+    for c in token[1:]:
+        digit = SOUNDEX_CODES.get(c, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w don't separate letters with the same code, vowels do
+        if c not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+
+def minhash(grams: Iterable[str]) -> list[int]:
+    """
+    MinHash signature of a set of character n-grams.
+
+    :param grams: The n-grams
+    :return: One minimum per hash function, MINHASH_BANDS * MINHASH_ROWS of them
+    """
+    hashed = [zlib.crc32(g.encode("utf-8")) for g in grams]
+    return [min((a * h + b) % MINHASH_PRIME for h in hashed) for a, b in MINHASH_SEEDS]
+
+
+@dataclasses.dataclass(frozen=True)
+class NameVariant:
+    """One way an entity is named, normalized for comparison."""
+
+    text: str
+    tokens: frozenset[str]
+    codes: frozenset[str]
+    grams: frozenset[str]
+
+    @classmethod
+    def parse(cls, text: str) -> Optional["NameVariant"]:
+        """
+        Normalize a name or alternate name.
+
+        Tokens are sorted before n-grams are taken, so "Smith, John" and "John Smith" come out the same.
+
+        :param text: The name as entered
+        :return: A NameVariant, or None if nothing is left of the name
+        """
+        tokens = [t for t in tokenize(text) if t not in HONORIFICS]
+        if not tokens:
+            return None
+        joined = " {} ".format(" ".join(sorted(tokens)))
+        return cls(
+            text,
+            frozenset(tokens),
+            frozenset(soundex(t) for t in tokens),
+            frozenset(
+                joined[i : i + NGRAM_SIZE] for i in range(len(joined) - NGRAM_SIZE + 1)
+            ),
+        )
+
+    def blocking_keys(self) -> set[str]:
+        """
+        Keys that put this name in a block with names it might be a variant of.
+
+        Token pairs and Soundex pairs catch reordered and respelled names, MinHash bands catch typos.
+
+        :return: A set of keys
+        """
+        tokens = sorted(self.tokens)[:MAX_KEY_TOKENS]
+        keys = set()
+        if len(tokens) == 1:
+            keys.add("t:" + tokens[0])
+            keys.add("p:" + soundex(tokens[0]))
+        for a, b in combinations(tokens, 2):
+            keys.add("t:{}|{}".format(a, b))
+            keys.add("p:{}|{}".format(*sorted((soundex(a), soundex(b)))))
+        signature = minhash(self.grams)
+        for band in range(MINHASH_BANDS):
+            rows = signature[band * MINHASH_ROWS : (band + 1) * MINHASH_ROWS]
+            keys.add("m{}:{}".format(band, ",".join(map(str, rows))))
+        return keys
+
+
+def jaccard(a: frozenset[str], b: frozenset[str]) -> float:
+    """Size of the intersection over size of the union."""
+    if not a or not b:
+        return 0.0
+    common = len(a & b)
+    return common / (len(a) + len(b) - common)
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def token_similarity(a: str, b: str) -> float:
+    """How alike two name tokens are, e.g. 0.8 for smith and smyth."""
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def soft_token_overlap(a: frozenset[str], b: frozenset[str]) -> float:
+    """
+    Match every token to its closest counterpart on the other side, in both directions.
+
+    :param a: Tokens of a name
+    :param b: Tokens of another name
+    :return: 0 to 1; a missing middle name costs less than a different surname
+    """
+    if not a or not b:
+        return 0.0
+    forward = sum(max(token_similarity(x, y) for y in b) for x in a) / len(a)
+    backward = sum(max(token_similarity(x, y) for y in a) for x in b) / len(b)
+    return (forward + backward) / 2
+
+
+def name_similarity(a: NameVariant, b: NameVariant) -> float:
+    """
+    Score how alike two names are.
+
+    :param a: A name
+    :param b: Another name
+    :return: 0 to 1, from closest matching tokens, character trigrams of the whole name and Soundex codes
+    """
+    return (
+        0.5 * soft_token_overlap(a.tokens, b.tokens)
+        + 0.3 * jaccard(a.grams, b.grams)
+        + 0.2 * jaccard(a.codes, b.codes)
+    )
+
+
+def birth_year(rec: Any) -> str:
+    """The year an entity was born, if its date of birth can be read."""
+    normalized = normalize_date(getattr(rec, "date_of_birth", "") or "")
+    if normalized is None or not normalized.parsed:
+        return ""
+    return normalized.year
+
+
+@dataclasses.dataclass
+class MergeSuggestion:
+    """Two entities that look like one, and what merging them would touch."""
+
+    keep: str
+    merge: str
+    score: float
+    keep_name: str
+    merge_name: str
+    reasons: list[str] = dataclasses.field(default_factory=list)
+    # Table name to airtable_idnos of records linking to the entity that would be merged away
+    links: dict[str, list[str]] = dataclasses.field(default_factory=dict)
+
+    @property
+    def items(self) -> list[str]:
+        """Items that would have to be relinked."""
+        return self.links.get("items", [])
+
+    @property
+    def relationships(self) -> list[str]:
+        """Relationships that would have to be repointed."""
+        return self.links.get("relationships", [])
+
+
+@dataclasses.dataclass
+class EntityDuplicateReport:
+    """Ranked merge suggestions, with how much blocking narrowed the search."""
+
+    suggestions: list[MergeSuggestion] = dataclasses.field(default_factory=list)
+    entities: int = 0
+    blocks: int = 0
+    oversized_blocks: int = 0
+    candidate_pairs: int = 0
+    elapsed: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Flatten the report into json-friendly data.
+
+        :return: A dictionary of suggestions, best first, and blocking counts
+        """
+        return {
+            "entities": self.entities,
+            "blocks": self.blocks,
+            "oversized_blocks": self.oversized_blocks,
+            "candidate_pairs": self.candidate_pairs,
+            "suggestions": [dataclasses.asdict(s) for s in self.suggestions],
+        }
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        """
+        Save the suggestions for review before merging anything.
+
+        :param path: Where to write the json
+        :return: None
+        """
+        with open(path, "w") as fobject:
+            json.dump(self.as_dict(), fobject, ensure_ascii=False)
+
+
+def name_variants(rec: Any) -> list[NameVariant]:
+    """
+    Parse an entity's name and every alternate name.
+
+    :param rec: An EntitySourceRecord
+    :return: NameVariants, the name first
+    """
+    texts = [rec.name]
+    texts.extend(alt_name_separator_regex.split(getattr(rec, "alt_name", "") or ""))
+    variants = []
+    for text in texts:
+        variant = NameVariant.parse(text)
+        if variant is not None and variant not in variants:
+            variants.append(variant)
+    return variants
+
+
+def find_duplicate_records(
+    entities: Iterable[Any],
+    linking: Optional[Mapping[str, Iterable[Any]]] = None,
+    threshold: float = DEFAULT_THRESHOLD,
+    max_block_size: int = MAX_BLOCK_SIZE,
+) -> EntityDuplicateReport:
+    """
+    Suggest entities to merge, scoring only pairs that share a blocking key.
+
+    Every entity gets keys from its name and alternate names, plus its LCHP source code. Pairs in the same block are scored once each, so the work grows with the number of entities times the size of their blocks rather than with the number of pairs.
+
+    :param entities: Validated EntitySourceRecords
+    :param linking: Other validated tables by name, e.g. items and relationships, to list what each merge would touch
+    :param threshold: Lowest score worth suggesting
+    :param max_block_size: Blocks bigger than this are skipped
+    :return: An EntityDuplicateReport, best suggestions first
+    """
+    start = time.perf_counter()
+    records = list(entities)
+    report = EntityDuplicateReport(entities=len(records))
+    variants = [name_variants(rec) for rec in records]
+
+    blocks: dict[str, list[int]] = defaultdict(list)
+    for i, (rec, names) in enumerate(zip(records, variants)):
+        keys: set[str] = set()
+        for variant in names:
+            keys |= variant.blocking_keys()
+        code = getattr(rec, "lchp_source_code", "")
+        if code:
+            keys.add("c:" + code)
+        for key in keys:
+            blocks[key].append(i)
+
+    pairs: set[tuple[int, int]] = set()
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        report.blocks += 1
+        if len(members) > max_block_size:
+            report.oversized_blocks += 1
+            continue
+        pairs.update(combinations(members, 2))
+    report.candidate_pairs = len(pairs)
+
+    scored = []
+    for i, j in pairs:
+        a, b = records[i], records[j]
+        similarity = max(
+            (name_similarity(x, y) for x in variants[i] for y in variants[j]),
+            default=0.0,
+        )
+        score = similarity
+        reasons = ["names {:.2f} alike".format(similarity)]
+        code = getattr(a, "lchp_source_code", "")
+        if code and code == getattr(b, "lchp_source_code", ""):
+            score += 0.2
+            reasons.append("same LCHP source code")
+        category_a = getattr(a, "category", "")
+        category_b = getattr(b, "category", "")
+        if category_a and category_b and category_a != category_b:
+            score *= 0.5
+            reasons.append("different categories")
+        if score < threshold:
+            continue
+        year_a, year_b = birth_year(a), birth_year(b)
+        if year_a and year_b and year_a != year_b:
+            score *= 0.5
+            reasons.append("born in different years")
+            if score < threshold:
+                continue
+        scored.append((min(score, 1.0), i, j, reasons))
+
+    # Records linking to each entity, found in one pass over the other tables
+    linked: dict[str, dict[str, set[str]]] = defaultdict(lambda: defaultdict(set))
+    for table, field_name, target in FOREIGN_KEYS:
+        if target != "entities" or not linking or table not in linking:
+            continue
+        for rec in linking[table]:
+            for link in as_id_list(getattr(rec, field_name, "")):
+                linked[link][table].add(rec.airtable_idno)
+
+    def link_count(rec: Any) -> int:
+        return sum(len(ids) for ids in linked.get(rec.airtable_idno, {}).values())
+
+    for score, i, j, reasons in scored:
+        # Keep whichever is linked from more places, then the older record
+        keep, merge = sorted(
+            (records[i], records[j]),
+            key=lambda rec: (
+                -link_count(rec),
+                getattr(rec, "airtable_created_time", ""),
+                rec.airtable_idno,
+            ),
+        )
+        report.suggestions.append(
+            MergeSuggestion(
+                keep.airtable_idno,
+                merge.airtable_idno,
+                score,
+                keep.name,
+                merge.name,
+                reasons,
+                {
+                    table: sorted(ids)
+                    for table, ids in sorted(
+                        linked.get(merge.airtable_idno, {}).items()
+                    )
+                },
+            )
+        )
+    report.suggestions.sort(key=lambda s: (-s.score, s.keep, s.merge))
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def find_duplicate_entities(
+    reports: Mapping[str, ValidationReport],
+    threshold: float = DEFAULT_THRESHOLD,
+    max_block_size: int = MAX_BLOCK_SIZE,
+) -> EntityDuplicateReport:
+    """
+    Suggest entities to merge from the output of validate_all.
+
+    :param reports: A dictionary of table name to ValidationReport, including entities
+    :param threshold: Lowest score worth suggesting
+    :param max_block_size: Blocks bigger than this are skipped
+    :return: An EntityDuplicateReport
+    """
+    return find_duplicate_records(
+        reports["entities"].records,
+        {table: r.records for table, r in reports.items() if table != "entities"},
+        threshold,
+        max_block_size,
+    )
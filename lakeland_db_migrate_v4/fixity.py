@@ -0,0 +1,374 @@
+"""Compute fixity information for files on the NAS."""
+
+import dataclasses
+import hashlib
+import mmap
+import os
+import stat
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Final,
+    Iterable,
+    Iterator,
+    Optional,
+    TypeVar,
+    Union,
+)
+from .destinations import FileRecord
+from .sources import FileSourceRecord
+
+if TYPE_CHECKING:
+    from .fixity_cache import FixityCache
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+HASH_CHUNK_SIZE: Final = 8 * 1024 * 1024
+# Above this size map the file instead of copying it through a buffer
+MMAP_THRESHOLD: Final = 64 * 1024 * 1024
+MAGIC_READ_SIZE: Final = 32
+DEFAULT_WORKERS: Final = 8
+
+# Checksums recorded in Airtable came from a mix of tools so go by length
+LEGACY_ALGORITHMS: Final[dict[int, str]] = {
+    32: "md5",
+    40: "sha1",
+    64: "sha256",
+    128: "sha512",
+}
+
+# (format, ((offset, signature), ...)) — every signature has to match
+MAGIC_NUMBERS: Final[tuple[tuple[str, tuple[tuple[int, bytes], ...]], ...]] = (
+    ("jpeg", ((0, b"\xff\xd8\xff"),)),
+    ("png", ((0, b"\x89PNG\r\n\x1a\n"),)),
+    ("tiff", ((0, b"II*\x00"),)),
+    ("tiff", ((0, b"MM\x00*"),)),
+    ("gif", ((0, b"GIF87a"),)),
+    ("gif", ((0, b"GIF89a"),)),
+    ("bmp", ((0, b"BM"),)),
+    ("pdf", ((0, b"%PDF"),)),
+    ("wav", ((0, b"RIFF"), (8, b"WAVE"))),
+    ("avi", ((0, b"RIFF"), (8, b"AVI "))),
+    ("webp", ((0, b"RIFF"), (8, b"WEBP"))),
+    ("mov", ((4, b"ftypqt"),)),
+    ("m4a", ((4, b"ftypM4A"),)),
+    ("mp4", ((4, b"ftyp"),)),
+    ("mp3", ((0, b"ID3"),)),
+    ("mp3", ((0, b"\xff\xfb"),)),
+    ("flac", ((0, b"fLaC"),)),
+    ("ogg", ((0, b"OggS"),)),
+    ("zip", ((0, b"PK\x03\x04"),)),
+    ("ole", ((0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"),)),
+    ("rtf", ((0, b"{\\rtf"),)),
+)
+
+
+@dataclasses.dataclass
+class FixityResult:
+    """Fixity information for one file on disk."""
+
+    location: str
+    size: int
+    mtime_ns: int
+    created_time: str
+    sha256_hexdigest: str
+    file_format: str
+    legacy_algorithm: str = ""
+    legacy_hexdigest: str = ""
+
+
+@dataclasses.dataclass
+class FixityReport:
+    """The outcome of running fixity over a batch of file records."""
+
+    records: list[FileRecord] = dataclasses.field(default_factory=list)
+    missing: list[str] = dataclasses.field(default_factory=list)
+    legacy_matches: int = 0
+    legacy_mismatches: list[str] = dataclasses.field(default_factory=list)
+    files: int = 0
+    # Only what was actually read, so cache hits don't inflate bytes_per_second
+    bytes: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        """Hashing throughput in bytes."""
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        """Hashing throughput in files."""
+        return self.files / self.elapsed if self.elapsed else 0.0
+
+
+def legacy_algorithm_for(checksum: str) -> str:
+    """
+    Guess which algorithm produced a checksum recorded in Airtable.
+
+    :param checksum: The hex digest from the Checksum column
+    :return: A hashlib algorithm name, or an empty string if we can't tell
+    """
+    return LEGACY_ALGORITHMS.get(len(checksum.strip()), "")
+
+
+def detect_format(head: bytes) -> str:
+    """
+    Identify a file format from its leading bytes.
+
+    :param head: At least the first MAGIC_READ_SIZE bytes of the file
+    :return: A short format name, or an empty string for anything we don't recognize
+    """
+    for file_format, signatures in MAGIC_NUMBERS:
+        if all(head[o : o + len(sig)] == sig for o, sig in signatures):
+            return file_format
+    return ""
+
+
+def hash_file(
+    path: Path,
+    legacy_algorithm: str = "",
+    chunk_size: int = HASH_CHUNK_SIZE,
+) -> tuple[str, str, bytes]:
+    """
+    Hash a file with SHA-256, and optionally a legacy algorithm, in one read.
+
+    Small files are read into a reused buffer, large ones are mapped; either way hashlib releases the GIL while it works.
+
+    :param path: The file to hash
+    :param legacy_algorithm: A hashlib algorithm name to compute alongside SHA-256
+    :param chunk_size: How many bytes to feed the hashes at a time
+    :return: A tuple of (sha256 hex digest, legacy hex digest, leading bytes)
+    """
+    hashers = [hashlib.sha256()]
+    if legacy_algorithm and legacy_algorithm != "sha256":
+        hashers.append(hashlib.new(legacy_algorithm))
+
+    with open(path, "rb") as fobject:
+        size = os.fstat(fobject.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(fobject.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    head = bytes(view[:MAGIC_READ_SIZE])
+                    for offset in range(0, size, chunk_size):
+                        block = view[offset : offset + chunk_size]
+                        for h in hashers:
+                            h.update(block)
+                        block.release()
+                finally:
+                    view.release()
+        else:
+            buf = bytearray(min(chunk_size, max(size, 1)))
+            view = memoryview(buf)
+            head = b""
+            while True:
+                n = fobject.readinto(buf)
+                if not n:
+                    break
+                if len(head) < MAGIC_READ_SIZE:
+                    # The head can span reads when chunk_size is tiny
+                    head += bytes(view[: min(n, MAGIC_READ_SIZE - len(head))])
+                for h in hashers:
+                    h.update(view[:n])
+
+    sha256 = hashers[0].hexdigest()
+    if legacy_algorithm == "sha256":
+        legacy = sha256
+    elif legacy_algorithm:
+        legacy = hashers[1].hexdigest()
+    else:
+        legacy = ""
+    return (sha256, legacy, head)
+
+
+def timestamp_to_iso(ts: float) -> str:
+    """
+    Format a filesystem timestamp the way Airtable formats created times.
+
+    :param ts: Seconds since the epoch
+    :return: An ISO 8601 string in UTC
+    """
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def compute_fixity(
+    location: str,
+    mount_root: Path,
+    legacy_algorithm: str = "",
+    st: Optional[os.stat_result] = None,
+) -> FixityResult:
+    """
+    Stat, hash and identify one file.
+
+    :param location: A normalized location from FileSourceRecord.locations
+    :param mount_root: Where the NAS is mounted locally
+    :param legacy_algorithm: A hashlib algorithm name to compute alongside SHA-256
+    :param st: A stat of the file if the caller already has one
+    :return: A FixityResult
+    """
+    full_path = mount_root / location
+    if st is None:
+        st = full_path.stat()
+    sha256, legacy, head = hash_file(full_path, legacy_algorithm)
+    # Not every filesystem tracks birth time
+    created = getattr(st, "st_birthtime", st.st_mtime)
+
+    return FixityResult(
+        location=location,
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        created_time=timestamp_to_iso(created),
+        sha256_hexdigest=sha256,
+        file_format=detect_format(head) or Path(location).suffix.lstrip(".").lower(),
+        legacy_algorithm=legacy_algorithm,
+        legacy_hexdigest=legacy,
+    )
+
+
+def first_present(
+    locations: Iterable[str], mount_root: Path
+) -> Optional[tuple[str, os.stat_result]]:
+    """
+    Find the first location that actually exists under the mount root.
+
+    :param locations: Normalized locations from FileSourceRecord.locations
+    :param mount_root: Where the NAS is mounted locally
+    :return: The location and its stat, or None if none of them are there
+    """
+    for location in locations:
+        try:
+            st = os.stat(mount_root / location)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            return (location, st)
+    return None
+
+
+def apply_fixity(record: FileRecord, result: FixityResult) -> FileRecord:
+    """
+    Fill in the fixity fields a FileRecord leaves as placeholders.
+
+    :param record: The destination record to update in place
+    :param result: Fixity computed for the record's file
+    :return: The same record
+    """
+    record.location = result.location
+    record.size = result.size
+    record.sha256_hexdigest = result.sha256_hexdigest
+    record.file_format = result.file_format
+    record.created_time = result.created_time
+    return record
+
+
+def file_record_from_source(src: FileSourceRecord) -> FileRecord:
+    """
+    Build a bare FileRecord from a source record, keeping its Airtable links as they are.
+
+    :param src: A validated FileSourceRecord
+    :return: A FileRecord with fixity fields still unset
+    """
+    return FileRecord(
+        idno=src.idno,
+        v3_airtable_created_time=src.airtable_created_time,
+        v3_airtable_idno=src.airtable_idno,
+        donation_grouping_id=src.linked_accession,
+        item_id=src.part_of_item,
+    )
+
+
+def bounded_map(
+    pool: Executor, fn: Callable[[T], R], items: Iterable[T], limit: int
+) -> Iterator[R]:
+    """
+    Map fn over items on a pool, keeping at most limit calls in flight and yielding in input order.
+
+    :param pool: The executor to run on
+    :param fn: The function to apply
+    :param items: The inputs
+    :param limit: Maximum number of outstanding futures
+    :return: An iterator of results in the order of items
+    """
+    in_flight: deque[Future] = deque()
+    for item in items:
+        in_flight.append(pool.submit(fn, item))
+        if len(in_flight) >= limit:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def build_file_records(
+    sources: Iterable[FileSourceRecord],
+    mount_root: Union[str, Path],
+    workers: int = DEFAULT_WORKERS,
+    make_record: Callable[[FileSourceRecord], FileRecord] = file_record_from_source,
+    cache: Optional["FixityCache"] = None,
+) -> FixityReport:
+    """
+    Hash every file referenced by a batch of source records and return fully populated FileRecords.
+
+    :param sources: Validated FileSourceRecords
+    :param mount_root: Where the NAS is mounted locally
+    :param workers: Number of files hashed concurrently
+    :param make_record: Builds the FileRecord fixity gets applied to
+    :param cache: A FixityCache to consult before hashing and to update afterwards
+    :return: A FixityReport with the records, files we couldn't find and the legacy checksum comparison
+    """
+    root = Path(mount_root)
+    report = FixityReport()
+    hits_before = cache.hits if cache is not None else 0
+    misses_before = cache.misses if cache is not None else 0
+
+    def work(
+        src: FileSourceRecord,
+    ) -> tuple[FileSourceRecord, Optional[FixityResult], bool]:
+        present = first_present(src.locations, root)
+        if present is None:
+            return (src, None, False)
+        location, st = present
+        legacy_algorithm = legacy_algorithm_for(src.legacy_checksum)
+
+        if cache is not None:
+            cached = cache.lookup(location, st, legacy_algorithm)
+            if cached is not None:
+                return (src, cached, False)
+
+        result = compute_fixity(location, root, legacy_algorithm, st)
+        if cache is not None:
+            cache.store(result, st.st_ino)
+        return (src, result, True)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for src, result, hashed in bounded_map(pool, work, sources, workers * 4):
+            record = make_record(src)
+            report.records.append(record)
+            if result is None:
+                report.missing.append(src.idno)
+                continue
+
+            apply_fixity(record, result)
+            report.files += 1
+            if hashed:
+                report.bytes += result.size
+            if result.legacy_hexdigest:
+                if result.legacy_hexdigest == src.legacy_checksum.strip().lower():
+                    report.legacy_matches += 1
+                else:
+                    report.legacy_mismatches.append(src.idno)
+    report.elapsed = time.perf_counter() - start
+
+    if cache is not None:
+        report.cache_hits = cache.hits - hits_before
+        report.cache_misses = cache.misses - misses_before
+
+    return report
@@ -0,0 +1,203 @@
+"""Remember fixity between runs so unchanged files don't get hashed again."""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from types import TracebackType
+from typing import Final, Iterable, Optional, Type, Union
+from .fixity import FixityResult
+from .source_mappings import files_source_column_mappings
+from .sources import source_path, validate_table
+
+DEFAULT_CACHE_FILE: Final = "fixity_cache.sqlite3"
+COMMIT_EVERY: Final = 1000
+
+SCHEMA: Final = """
+CREATE TABLE IF NOT EXISTS fixity (
+    location TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    created_time TEXT NOT NULL,
+    sha256_hexdigest TEXT NOT NULL,
+    file_format TEXT NOT NULL,
+    legacy_algorithm TEXT NOT NULL,
+    legacy_hexdigest TEXT NOT NULL
+)
+"""
+
+
+class FixityCache:
+    """
+    An SQLite cache of fixity results keyed by normalized location.
+
+    An entry is only trusted while the file's size, mtime_ns and inode are the same as when it was hashed.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None) -> None:
+        """
+        Open (or create) the cache.
+
+        :param path: The database file, defaults to fixity_cache.sqlite3 in the working directory
+        """
+        self.path = Path(path) if path else Path.cwd() / DEFAULT_CACHE_FILE
+        # Lookups come from hashing threads so share one connection behind a lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(SCHEMA)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(
+        self, location: str, st: os.stat_result, legacy_algorithm: str = ""
+    ) -> Optional[FixityResult]:
+        """
+        Fetch a cached result if the file hasn't changed since it was hashed.
+
+        :param location: A normalized location from FileSourceRecord.locations
+        :param st: A fresh stat of the file
+        :param legacy_algorithm: The legacy digest the caller needs, if any
+        :return: The cached FixityResult, or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, created_time, sha256_hexdigest, file_format,"
+                " legacy_algorithm, legacy_hexdigest FROM fixity WHERE location = ?",
+                (location,),
+            ).fetchone()
+
+            if (
+                row is None
+                or row[0:3] != (st.st_size, st.st_mtime_ns, st.st_ino)
+                or (legacy_algorithm and row[6] != legacy_algorithm)
+            ):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return FixityResult(
+                location=location,
+                size=row[0],
+                mtime_ns=row[1],
+                created_time=row[3],
+                sha256_hexdigest=row[4],
+                file_format=row[5],
+                legacy_algorithm=row[6],
+                legacy_hexdigest=row[7],
+            )
+
+    def store(self, result: FixityResult, inode: int) -> None:
+        """
+        Record a freshly computed result.
+
+        :param result: The FixityResult to keep
+        :param inode: The inode the file had when it was hashed
+        :return: None
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fixity VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    result.location,
+                    result.size,
+                    result.mtime_ns,
+                    inode,
+                    result.created_time,
+                    result.sha256_hexdigest,
+                    result.file_format,
+                    result.legacy_algorithm,
+                    result.legacy_hexdigest,
+                ),
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+
+    def invalidate(self, location: str) -> None:
+        """
+        Forget a single location.
+
+        :param location: A normalized location from FileSourceRecord.locations
+        :return: None
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM fixity WHERE location = ?", (location,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Forget everything."""
+        with self._lock:
+            self._conn.execute("DELETE FROM fixity")
+            self._conn.commit()
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """
+        Drop entries for locations that are no longer referenced.
+
+        :param keep: Every location still in use, e.g. from the locations of the current files.json
+        :return: The number of entries removed
+        """
+        with self._lock:
+            self._conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS keep (location TEXT PRIMARY KEY)"
+            )
+            self._conn.execute("DELETE FROM keep")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO keep VALUES (?)", ((loc,) for loc in keep)
+            )
+            removed = self._conn.execute(
+                "DELETE FROM fixity WHERE location NOT IN (SELECT location FROM keep)"
+            ).rowcount
+            self._conn.execute("DELETE FROM keep")
+            self._conn.commit()
+        return removed
+
+    def prune_to_export(self, source_dir: Optional[Path] = None) -> int:
+        """
+        Drop entries for locations that don't appear in the current files.json.
+
+        Nothing is dropped unless every record in files.json validates, so a missing, empty or broken export can't empty the cache.
+
+        :param source_dir: Directory holding the source data, defaults to source_data in the working directory
+        :return: The number of entries removed
+        """
+        target_file = source_path("files.json", source_dir)
+        if not target_file.is_file():
+            raise RuntimeError("Not pruning, no files.json at {}".format(target_file))
+        report = validate_table("files.json", files_source_column_mappings, source_dir)
+        if report.failures:
+            raise RuntimeError(
+                "Not pruning, {} records in {} failed validation".format(
+                    len(report.failures), target_file
+                )
+            )
+        if not report.records:
+            raise RuntimeError("Not pruning, {} has no records".format(target_file))
+        return self.prune(loc for rec in report.records for loc in rec.locations)
+
+    def __len__(self) -> int:
+        """Count cached entries."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM fixity").fetchone()[0]
+
+    def close(self) -> None:
+        """Commit anything outstanding and close the database."""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self) -> "FixityCache":
+        """Use the cache as a context manager."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        """Close the cache on the way out."""
+        self.close()
@@ -0,0 +1,472 @@
+"""Compile entities, relationships and item links into a compact graph for entity landing pages."""
+
+import dataclasses
+import json
+import mmap
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Final, Iterable, Iterator, Optional, Type, Union
+
+from .search import pad
+from .writers import TABLE_NAMES, link_value
+
+ENTITY: Final = 0
+ITEM: Final = 1
+# Named like the tables, as search hits are
+NODE_KINDS: Final = (TABLE_NAMES["EntityRecord"], TABLE_NAMES["ItemRecord"])
+# Set on the predicate code of the reverse copy of an edge, e.g. entity -> item for an item's creator link
+INVERSE: Final = 0x8000
+LANDING_PAGE: Final = 1
+
+# Item link fields and the predicate each one becomes, from the item's side
+ITEM_LINK_PREDICATES: Final = {
+    "linked_entities": "depicts",
+    "linked_entities_as_donors": "donated_by",
+    "linked_entities_as_creators": "created_by",
+    "linked_entities_as_sources": "sourced_from",
+    "linked_entities_as_interviewers": "interviewed_by",
+    "linked_entities_as_interviewees": "interview_with",
+}
+
+MAGIC: Final = b"LKGRAPH\0"
+FORMAT_VERSION: Final = 2
+# Node kinds, node flags, idno offsets, idnos, idno order, edge offsets, edge targets, edge predicates, metadata
+SECTIONS: Final = 9
+HEADER: Final = struct.Struct("<8sIQQ{}Q".format(SECTIONS + 1))
+
+
+@dataclasses.dataclass
+class GraphStats:
+    """What went into an entity graph."""
+
+    entities: int = 0
+    items: int = 0
+    edges: int = 0
+    predicates: int = 0
+    unresolved: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+
+@dataclasses.dataclass(frozen=True)
+class Edge:
+    """One edge out of a node, as seen from that node."""
+
+    target: str
+    kind: str
+    predicate: str
+    inverse: bool
+
+
+@dataclasses.dataclass
+class LandingPage:
+    """Everything an entity landing page shows, gathered from its edges."""
+
+    idno: str
+    relationships: list[Edge] = dataclasses.field(default_factory=list)
+    items: list[Edge] = dataclasses.field(default_factory=list)
+
+
+class GraphBuilder:
+    """
+    Collect nodes and edges from destination records as they stream past.
+
+    Relationships can name entities that haven't been seen yet, so edges are kept by idno until write resolves them.
+    """
+
+    def __init__(self) -> None:
+        """Start an empty graph."""
+        self.node_ids: dict[str, int] = {}
+        self.node_kinds = array("B")
+        self.node_flags = array("B")
+        self.predicates: dict[str, int] = {}
+        # (subject idno, predicate code, object idno)
+        self.edges: list[tuple[str, int, str]] = []
+
+    def node(self, idno: str, kind: int, flags: int = 0) -> int:
+        """
+        Add a node, or update the flags of one already added.
+
+        :param idno: The record's idno
+        :param kind: ENTITY or ITEM
+        :param flags: LANDING_PAGE or 0
+        :return: The node's number
+        """
+        node_id = self.node_ids.get(idno)
+        if node_id is None:
+            node_id = self.node_ids[idno] = len(self.node_kinds)
+            self.node_kinds.append(kind)
+            self.node_flags.append(flags)
+        else:
+            self.node_flags[node_id] |= flags
+        return node_id
+
+    def predicate(self, name: str) -> int:
+        """Intern a predicate and return its code."""
+        code = self.predicates.get(name)
+        if code is None:
+            code = self.predicates[name] = len(self.predicates)
+            if code >= INVERSE:
+                raise RuntimeError("Too many relationship predicates")
+        return code
+
+    def add(self, record: Any) -> None:
+        """
+        Take what the graph needs from one destination record.
+
+        :param record: Any destination record; only entities, items and relationships contribute
+        :return: None
+        """
+        name = type(record).__name__
+        if name == "EntityRecord":
+            self.node(
+                record.idno, ENTITY, LANDING_PAGE if record.create_landing_page else 0
+            )
+        elif name == "EntityRelationshipRecord":
+            self.edges.append(
+                (
+                    record.subject_entity,
+                    self.predicate(record.relationship_predicate),
+                    record.object_entity,
+                )
+            )
+        elif name == "ItemRecord":
+            self.node(record.idno, ITEM)
+            for field_name, predicate in ITEM_LINK_PREDICATES.items():
+                code = self.predicate(predicate)
+                for target in link_value(getattr(record, field_name, [])):
+                    self.edges.append((record.idno, code, target))
+
+    def write(self, path: Union[str, Path]) -> GraphStats:
+        """
+        Lay the graph out as compressed sparse rows and write it atomically.
+
+        Every edge is stored twice, once from each end, so neighbours in either direction are one contiguous slice.
+
+        :param path: The graph file
+        :return: GraphStats, without elapsed
+        """
+        if sys.byteorder != "little":
+            raise RuntimeError("Entity graphs are written little-endian only")
+        nodes = len(self.node_kinds)
+        stats = GraphStats(
+            entities=self.node_kinds.count(ENTITY),
+            items=self.node_kinds.count(ITEM),
+            predicates=len(self.predicates),
+        )
+
+        sources = array("I")
+        targets = array("I")
+        codes = array("H")
+        node_ids = self.node_ids
+        for subject, code, obj in self.edges:
+            s = node_ids.get(subject)
+            o = node_ids.get(obj)
+            if s is None or o is None:
+                stats.unresolved += 1
+                continue
+            sources.append(s)
+            targets.append(o)
+            codes.append(code)
+            sources.append(o)
+            targets.append(s)
+            codes.append(code | INVERSE)
+        stats.edges = len(sources) // 2
+
+        # Counting sort by source node keeps each node's edges in the order they were added
+        offsets = array("Q", bytes(8 * (nodes + 1)))
+        for s in sources:
+            offsets[s + 1] += 1
+        for i in range(nodes):
+            offsets[i + 1] += offsets[i]
+        cursor = array("Q", offsets[:-1])
+        csr_targets = array("I", bytes(4 * len(sources)))
+        csr_codes = array("H", bytes(2 * len(sources)))
+        for s, t, c in zip(sources, targets, codes):
+            position = cursor[s]
+            csr_targets[position] = t
+            csr_codes[position] = c
+            cursor[s] = position + 1
+
+        encoded = [idno.encode("utf-8") for idno in node_ids]
+        idno_offsets = array("Q", [0])
+        for idno in encoded:
+            idno_offsets.append(idno_offsets[-1] + len(idno))
+        by_idno = array("I", sorted(range(nodes), key=encoded.__getitem__))
+        metadata = {"kinds": list(NODE_KINDS), "predicates": list(self.predicates)}
+
+        target = Path(path)
+        tmp = target.with_suffix(".tmp")
+        with open(tmp, "wb") as fobject:
+            fobject.write(b"\0" * HEADER.size)
+            section_offsets = []
+            for section in (
+                self.node_kinds,
+                self.node_flags,
+                idno_offsets,
+                b"".join(encoded),
+                by_idno,
+                offsets,
+                csr_targets,
+                csr_codes,
+                json.dumps(metadata).encode("utf-8"),
+            ):
+                section_offsets.append(pad(fobject))
+                if isinstance(section, array):
+                    section.tofile(fobject)
+                else:
+                    fobject.write(section)
+            section_offsets.append(fobject.tell())
+            stats.bytes = section_offsets[-1]
+            fobject.seek(0)
+            fobject.write(
+                HEADER.pack(
+                    MAGIC, FORMAT_VERSION, nodes, len(sources), *section_offsets
+                )
+            )
+        tmp.replace(target)
+        return stats
+
+
+def build_entity_graph(records: Iterable[Any], path: Union[str, Path]) -> GraphStats:
+    """
+    Compile destination records into an entity graph in a single pass and write it to disk.
+
+    :param records: Destination records of any mix of types, e.g. iter_migrated(migrated)
+    :param path: The graph file
+    :return: GraphStats; edges whose ends aren't among the records are counted as unresolved and left out
+    """
+    start = time.perf_counter()
+    builder = GraphBuilder()
+    for record in records:
+        builder.add(record)
+    stats = builder.write(path)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+class EntityGraph:
+    """
+    An entity graph opened with mmap; neighbours of a node are one slice of the edge arrays.
+
+    Use it as a context manager, or call close when done.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """
+        Open a graph written by build_entity_graph.
+
+        :param path: The graph file
+        """
+        if sys.byteorder != "little":
+            raise RuntimeError("Entity graphs can only be read on little-endian hosts")
+        with open(path, "rb") as fobject:
+            self._mmap = mmap.mmap(fobject.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, self.nodes, self.edges, *offsets = HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            view.release()
+            self._mmap.close()
+            raise RuntimeError(
+                "Not an entity graph this version can read: {}".format(path)
+            )
+        self._views = [view]
+
+        def section(i: int, fmt: str = "B", count: int = -1) -> memoryview:
+            # Sections are padded up to 8 bytes, so trim each to what its type needs
+            raw = view[offsets[i] : offsets[i + 1]]
+            if count >= 0:
+                raw = raw[: count * struct.calcsize(fmt)]
+            typed = raw.cast(fmt) if fmt != "B" else raw
+            self._views.append(typed)
+            return typed
+
+        self.node_kinds = section(0, "B", self.nodes)
+        self.node_flags = section(1, "B", self.nodes)
+        self.idno_offsets = section(2, "Q", self.nodes + 1)
+        self.idno_bytes = section(3)
+        self.by_idno = section(4, "I", self.nodes)
+        self.offsets = section(5, "Q", self.nodes + 1)
+        self.targets = section(6, "I", self.edges)
+        self.codes = section(7, "H", self.edges)
+        metadata = json.loads(bytes(section(8)).decode("utf-8"))
+        self.kinds: list[str] = metadata["kinds"]
+        self.predicates: list[str] = metadata["predicates"]
+
+    def _idno_bytes(self, node: int) -> bytes:
+        return bytes(
+            self.idno_bytes[self.idno_offsets[node] : self.idno_offsets[node + 1]]
+        )
+
+    def idno(self, node: int) -> str:
+        """The idno of a node."""
+        return self._idno_bytes(node).decode("utf-8")
+
+    def find(self, idno: str) -> int:
+        """
+        Binary search the nodes by idno.
+
+        :param idno: An entity or item idno
+        :return: The node's number, or -1 if it isn't in the graph
+        """
+        target = idno.encode("utf-8")
+        lo, hi = 0, self.nodes
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._idno_bytes(self.by_idno[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.nodes and self._idno_bytes(self.by_idno[lo]) == target:
+            return int(self.by_idno[lo])
+        return -1
+
+    def node(self, idno: str) -> int:
+        """
+        Look a node up by idno.
+
+        :param idno: An entity or item idno
+        :return: The node's number
+        """
+        node = self.find(idno)
+        if node < 0:
+            raise KeyError("Not in graph: {}".format(idno))
+        return node
+
+    def neighbours(self, node: int) -> tuple[memoryview, memoryview]:
+        """
+        The raw edges out of a node.
+
+        :param node: A node number
+        :return: Views of neighbour node numbers and predicate codes, INVERSE set on edges stored from their object's end
+        """
+        start, end = self.offsets[node], self.offsets[node + 1]
+        return (self.targets[start:end], self.codes[start:end])
+
+    def edges_of(self, node: int) -> list[Edge]:
+        """
+        Every edge touching a node, from its point of view.
+
+        :param node: A node number
+        :return: Edges in the order they were added
+        """
+        targets, codes = self.neighbours(node)
+        return [
+            Edge(
+                self.idno(t),
+                self.kinds[self.node_kinds[t]],
+                self.predicates[c & ~INVERSE],
+                bool(c & INVERSE),
+            )
+            for t, c in zip(targets, codes)
+        ]
+
+    def k_hop(
+        self,
+        idno: str,
+        k: int,
+        predicates: Optional[Iterable[str]] = None,
+        kinds: Optional[Iterable[str]] = None,
+    ) -> dict[str, int]:
+        """
+        Breadth first search out to k edges away.
+
+        :param idno: Where to start
+        :param k: Most edges to follow
+        :param predicates: Only follow edges with these predicates, in either direction; a KeyError for one the graph doesn't have
+        :param kinds: Only pass through nodes of these kinds, e.g. ["entities"] to skip going via items; a KeyError for one not in NODE_KINDS
+        :return: idno of every node reached mapped to its distance, the start included at 0
+        """
+        wanted = None
+        if predicates is not None:
+            wanted = set()
+            for predicate in predicates:
+                if predicate not in self.predicates:
+                    raise KeyError("Unexpected predicate: {}".format(predicate))
+                wanted.add(self.predicates.index(predicate))
+        allowed = None
+        if kinds is not None:
+            allowed = set()
+            for kind in kinds:
+                if kind not in self.kinds:
+                    raise KeyError("Unexpected kind: {}".format(kind))
+                allowed.add(self.kinds.index(kind))
+
+        start = self.node(idno)
+        distances = {start: 0}
+        frontier = deque([start])
+        while frontier:
+            node = frontier.popleft()
+            distance = distances[node]
+            if distance == k:
+                continue
+            targets, codes = self.neighbours(node)
+            for t, c in zip(targets, codes):
+                if t in distances:
+                    continue
+                if wanted is not None and c & ~INVERSE not in wanted:
+                    continue
+                if allowed is not None and self.node_kinds[t] not in allowed:
+                    continue
+                distances[t] = distance + 1
+                frontier.append(t)
+        return {self.idno(node): distance for node, distance in distances.items()}
+
+    def landing_page(self, node: int) -> LandingPage:
+        """
+        Gather an entity's relationships and linked items.
+
+        :param node: An entity's node number
+        :return: A LandingPage
+        """
+        page = LandingPage(self.idno(node))
+        for edge in self.edges_of(node):
+            if edge.kind == NODE_KINDS[ENTITY]:
+                page.relationships.append(edge)
+            else:
+                page.items.append(edge)
+        return page
+
+    def iter_landing_pages(self, every_entity: bool = False) -> Iterator[LandingPage]:
+        """
+        Gather every landing page in one pass over the edges.
+
+        :param every_entity: Include entities without create_landing_page set
+        :return: An iterator of LandingPages in node order
+        """
+        for node in range(self.nodes):
+            if self.node_kinds[node] != ENTITY:
+                continue
+            if every_entity or self.node_flags[node] & LANDING_PAGE:
+                yield self.landing_page(node)
+
+    def close(self) -> None:
+        """
+        Unmap the file.
+
+        :return: None
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self) -> "EntityGraph":
+        """Use the open graph."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        """Close the graph."""
+        self.close()
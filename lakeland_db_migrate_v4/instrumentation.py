@@ -0,0 +1,353 @@
+"""Hooks, counters and timings for seeing where a migration run spends its time."""
+
+import cProfile
+import heapq
+import io
+import json
+import math
+import pstats
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    DefaultDict,
+    Final,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+)
+
+LOAD: Final = "load"
+KEY_CHECK: Final = "key_check"
+RENAME: Final = "rename"
+VALIDATE: Final = "validate"
+POST_INIT: Final = "post_init"
+STAGES: Final = (LOAD, KEY_CHECK, RENAME, VALIDATE, POST_INIT)
+
+# How many functions to keep from each sampled profile
+PROFILE_LINES: Final = 15
+
+Hook = Callable[["StageEvent"], None]
+
+
+class StageEvent:
+    """What a hook is told about one timed stage of one record."""
+
+    __slots__ = (
+        "table",
+        "record_class",
+        "stage",
+        "seconds",
+        "airtable_idno",
+        "error_type",
+    )
+
+    def __init__(
+        self,
+        table: str,
+        record_class: str,
+        stage: str,
+        seconds: float,
+        airtable_idno: str = "",
+        error_type: str = "",
+    ) -> None:
+        """Describe a finished stage."""
+        self.table = table
+        self.record_class = record_class
+        self.stage = stage
+        self.seconds = seconds
+        self.airtable_idno = airtable_idno
+        self.error_type = error_type
+
+
+class Histogram:
+    """Timings bucketed by powers of two microseconds."""
+
+    def __init__(self) -> None:
+        """Start empty."""
+        self.buckets: Counter[int] = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Add one timing.
+
+        :param seconds: How long the stage took
+        :return: None
+        """
+        micros = seconds * 1e6
+        self.buckets[math.frexp(micros)[1] if micros >= 1 else 0] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Fold another histogram into this one.
+
+        :param other: The histogram to add
+        :return: None
+        """
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate a percentile from the bucket upper bounds.
+
+        :param q: A fraction between 0 and 1
+        :return: Seconds
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for exponent in sorted(self.buckets):
+            seen += self.buckets[exponent]
+            if seen >= rank:
+                return min(self.max, (2**exponent) / 1e6)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Summarize for the report."""
+        return {
+            "count": self.count,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else 0.0,
+            "min_seconds": self.min if self.count else 0.0,
+            "max_seconds": self.max,
+            "p50_seconds": self.percentile(0.5),
+            "p90_seconds": self.percentile(0.9),
+            "p99_seconds": self.percentile(0.99),
+            # Upper bound in microseconds -> count
+            "buckets_us": {str(2**e): n for e, n in sorted(self.buckets.items())},
+        }
+
+
+class Instrumentation:
+    """
+    Collects per table, per record class and per stage timings, failure counts and optional profiles.
+
+    Pass one to validate_inputs, validate_records or validate_all. Hooks registered with add_hook are called for every stage of every record in this process.
+    Validation time includes the post_init time nested inside it.
+    """
+
+    def __init__(self, profile_every: int = 0, profile_slowest: int = 10) -> None:
+        """
+        Set up empty counters.
+
+        :param profile_every: Run cProfile on every Nth record validated; 0 turns profiling off
+        :param profile_slowest: How many of the slowest profiled records to keep
+        """
+        self.hooks: DefaultDict[str, list[Hook]] = defaultdict(list)
+        self.timings: DefaultDict[tuple[str, str, str], Histogram] = defaultdict(
+            Histogram
+        )
+        self.failures: Counter[tuple[str, str]] = Counter()
+        self.profile_every = profile_every
+        self.profile_slowest = profile_slowest
+        self.profiles: list[tuple[float, str, str, str]] = []
+        self.table = ""
+        self.record_class = ""
+        self._seen = 0
+
+    def __getstate__(self) -> dict[str, Any]:
+        """Leave hooks behind when crossing into a worker process."""
+        state = self.__dict__.copy()
+        state["hooks"] = defaultdict(list)
+        return state
+
+    def add_hook(self, stage: str, hook: Hook) -> None:
+        """
+        Call hook after every occurrence of a stage.
+
+        :param stage: One of STAGES, or "failure"
+        :param hook: A callable taking a StageEvent
+        :return: None
+        """
+        if stage not in STAGES and stage != "failure":
+            raise ValueError("Unknown stage: {}".format(stage))
+        self.hooks[stage].append(hook)
+
+    def record(
+        self,
+        stage: str,
+        seconds: float,
+        airtable_idno: str = "",
+        record_class: str = "",
+        table: str = "",
+    ) -> None:
+        """
+        Note that the current table and record class spent some time in a stage.
+
+        :param stage: One of STAGES
+        :param seconds: How long it took
+        :param airtable_idno: The record concerned, if there was one
+        :param record_class: Overrides the current record class, e.g. for destination records
+        :param table: Overrides the current table
+        :return: None
+        """
+        record_class = record_class or self.record_class
+        table = table or self.table
+        self.timings[(table, record_class, stage)].observe(seconds)
+        hooks = self.hooks.get(stage)
+        if hooks:
+            event = StageEvent(table, record_class, stage, seconds, airtable_idno)
+            for hook in hooks:
+                hook(event)
+
+    def record_failure(self, error_type: str, airtable_idno: str = "") -> None:
+        """
+        Count a record that didn't validate.
+
+        :param error_type: Name of the exception type
+        :param airtable_idno: The record concerned
+        :return: None
+        """
+        self.failures[(self.table, error_type)] += 1
+        for hook in self.hooks.get("failure", ()):
+            hook(
+                StageEvent(
+                    self.table,
+                    self.record_class,
+                    "failure",
+                    0.0,
+                    airtable_idno,
+                    error_type,
+                )
+            )
+
+    def should_profile(self) -> bool:
+        """Decide whether the next record gets a profile."""
+        if not self.profile_every:
+            return False
+        self._seen += 1
+        return self._seen % self.profile_every == 0
+
+    def keep_profile(
+        self, seconds: float, airtable_idno: str, profile: cProfile.Profile
+    ) -> None:
+        """
+        Hold on to a sampled profile if it is among the slowest seen.
+
+        :param seconds: How long the profiled record took
+        :param airtable_idno: The record concerned
+        :param profile: The finished profiler
+        :return: None
+        """
+        if (
+            len(self.profiles) >= self.profile_slowest
+            and seconds <= self.profiles[0][0]
+        ):
+            return
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(
+            PROFILE_LINES
+        )
+        entry = (seconds, self.table, airtable_idno, out.getvalue())
+        if len(self.profiles) >= self.profile_slowest:
+            heapq.heapreplace(self.profiles, entry)
+        else:
+            heapq.heappush(self.profiles, entry)
+
+    def timed_iter(self, stage: str, items: Iterable[Any]) -> Iterator[Any]:
+        """
+        Time how long each item takes to come out of an iterator.
+
+        :param stage: The stage to charge the time to
+        :param items: Any iterable, e.g. records streaming from a file
+        :return: The same items
+        """
+        it = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.record(stage, time.perf_counter() - start)
+            yield item
+
+    @contextmanager
+    def activate(self) -> Iterator["Instrumentation"]:
+        """
+        Make this the instance that dataclass post-init code reports to, e.g. while mapping destination records.
+
+        :return: A context manager yielding this instance
+        """
+        token = active_instrumentation.set(self)
+        try:
+            yield self
+        finally:
+            active_instrumentation.reset(token)
+
+    def merge(self, other: "Instrumentation") -> None:
+        """
+        Fold in what another instance collected, e.g. in a worker process.
+
+        :param other: The instance to add
+        :return: None
+        """
+        for key, hist in other.timings.items():
+            self.timings[key].merge(hist)
+        self.failures.update(other.failures)
+        for entry in other.profiles:
+            if len(self.profiles) < self.profile_slowest:
+                heapq.heappush(self.profiles, entry)
+            elif entry[0] > self.profiles[0][0]:
+                heapq.heapreplace(self.profiles, entry)
+
+    def report(self) -> dict[str, Any]:
+        """
+        Summarize the run as json-friendly data.
+
+        :return: A dictionary with timings, failures and profiles
+        """
+        tables: dict[str, dict[str, dict[str, Any]]] = {}
+        for (table, record_class, stage), hist in sorted(self.timings.items()):
+            tables.setdefault(table, {}).setdefault(record_class, {})[
+                stage
+            ] = hist.as_dict()
+
+        failures: dict[str, dict[str, int]] = {}
+        for (table, error_type), n in sorted(self.failures.items()):
+            failures.setdefault(table, {})[error_type] = n
+
+        return {
+            "tables": tables,
+            "failures": failures,
+            "slowest_profiles": [
+                {"seconds": s, "table": t, "airtable_idno": i, "profile": p}
+                for s, t, i, p in sorted(self.profiles, reverse=True)
+            ],
+        }
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        """
+        Save the report.
+
+        :param path: Where to write it
+        :return: None
+        """
+        with open(path, "w") as fobject:
+            json.dump(self.report(), fobject, indent=2)
+
+
+# Lets dataclass post-init code report its time without having the instance passed down
+active_instrumentation: ContextVar[Optional[Instrumentation]] = ContextVar(
+    "active_instrumentation", default=None
+)
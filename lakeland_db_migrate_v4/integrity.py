@@ -0,0 +1,283 @@
+"""Check that every Airtable link between source tables points somewhere it should."""
+
+import dataclasses
+import json
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Final, Iterable, Mapping, Union
+from .joins import as_id_list
+from .sources import ValidationReport
+
+MISSING: Final = "missing"
+REMOVED: Final = "removed"
+ONE_SIDED: Final = "one_sided"
+
+# (table, field, table the field links to)
+FOREIGN_KEYS: Final[tuple[tuple[str, str, str], ...]] = (
+    ("accessions", "file_array", "files"),
+    ("accessions", "linked_entity_array", "entities"),
+    ("files", "linked_accession", "accessions"),
+    ("files", "part_of_item", "items"),
+    ("files", "linked_entity_as_source", "entities"),
+    ("items", "linked_files_array", "files"),
+    ("items", "linked_entity_as_creator", "entities"),
+    ("items", "linked_entity_source", "entities"),
+    ("items", "linked_people", "entities"),
+    ("items", "linked_places_orgs", "entities"),
+    ("items", "linked_entity_interviewers", "entities"),
+    ("items", "linked_entity_interviewees", "entities"),
+    ("items", "linked_subjects", "subjects"),
+    ("entities", "linked_items_array", "items"),
+    ("entities", "linked_as_source", "items"),
+    ("entities", "linked_as_interviewer", "items"),
+    ("entities", "linked_as_interviewee", "items"),
+    ("entities", "linked_place_as_subject", "items"),
+    ("entities", "linked_to_item_as_creator", "items"),
+    ("entities", "linked_to_files_as_source", "files"),
+    ("entities", "linked_to_acc_as_donor", "accessions"),
+    ("subjects", "linked_items_array", "items"),
+    ("relationships", "entity_1", "entities"),
+    ("relationships", "entity_2", "entities"),
+)
+
+# Pairs of (table, field) that Airtable keeps as two sides of the same link
+RECIPROCAL_LINKS: Final[tuple[tuple[tuple[str, str], tuple[str, str]], ...]] = (
+    (("accessions", "file_array"), ("files", "linked_accession")),
+    (("items", "linked_files_array"), ("files", "part_of_item")),
+    (("accessions", "linked_entity_array"), ("entities", "linked_to_acc_as_donor")),
+    (("files", "linked_entity_as_source"), ("entities", "linked_to_files_as_source")),
+    (("items", "linked_entity_as_creator"), ("entities", "linked_to_item_as_creator")),
+    (("items", "linked_entity_source"), ("entities", "linked_as_source")),
+    (("items", "linked_entity_interviewers"), ("entities", "linked_as_interviewer")),
+    (("items", "linked_entity_interviewees"), ("entities", "linked_as_interviewee")),
+    (("items", "linked_subjects"), ("subjects", "linked_items_array")),
+)
+
+# The order tables are scanned in; the first side of a reciprocal pair seen records its links, the second checks them off
+TABLE_ORDER: Final = (
+    "accessions",
+    "files",
+    "items",
+    "entities",
+    "subjects",
+    "relationships",
+)
+
+
+@dataclasses.dataclass
+class Violation:
+    """One link that doesn't hold up."""
+
+    table: str
+    field: str
+    airtable_idno: str
+    link: str
+    kind: str
+
+
+@dataclasses.dataclass
+class IntegrityReport:
+    """Every broken link across the source tables, grouped by table and field."""
+
+    violations: dict[str, dict[str, list[Violation]]] = dataclasses.field(
+        default_factory=dict
+    )
+    links: int = 0
+    skipped: list[str] = dataclasses.field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """Whether the tables are safe to migrate."""
+        return not self.violations
+
+    def add(self, violation: Violation) -> None:
+        """
+        File a violation under its table and field.
+
+        :param violation: The broken link
+        :return: None
+        """
+        self.violations.setdefault(violation.table, {}).setdefault(
+            violation.field, []
+        ).append(violation)
+
+    def counts(self) -> dict[str, dict[str, dict[str, int]]]:
+        """
+        Summarize violations by table, field and kind.
+
+        :return: Nested dictionaries of counts
+        """
+        out: dict[str, dict[str, dict[str, int]]] = {}
+        for table, fields in self.violations.items():
+            for field_name, found in fields.items():
+                kinds = out.setdefault(table, {}).setdefault(field_name, {})
+                for v in found:
+                    kinds[v.kind] = kinds.get(v.kind, 0) + 1
+        return out
+
+    def __str__(self) -> str:
+        """One line per table and field with problems."""
+        lines = [
+            "{} links checked, {} broken".format(
+                self.links,
+                sum(
+                    len(v)
+                    for fields in self.violations.values()
+                    for v in fields.values()
+                ),
+            )
+        ]
+        for table, fields in self.counts().items():
+            for field_name, kinds in fields.items():
+                lines.append(
+                    "{}.{}: {}".format(
+                        table,
+                        field_name,
+                        ", ".join(
+                            "{} {}".format(n, k) for k, n in sorted(kinds.items())
+                        ),
+                    )
+                )
+        for reason in self.skipped:
+            lines.append("skipped {}".format(reason))
+        return "\n".join(lines)
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Flatten the report into json-friendly data.
+
+        :return: A dictionary of violations by table and field
+        """
+        return {
+            "links": self.links,
+            "skipped": self.skipped,
+            "violations": {
+                table: {
+                    field_name: [dataclasses.asdict(v) for v in found]
+                    for field_name, found in fields.items()
+                }
+                for table, fields in self.violations.items()
+            },
+        }
+
+    def write_json(self, path: Union[str, Path]) -> None:
+        """
+        Save the report for whoever is fixing the base.
+
+        :param path: Where to write the json
+        :return: None
+        """
+        with open(path, "w") as fobject:
+            json.dump(self.as_dict(), fobject, ensure_ascii=False)
+
+
+def is_removed(rec: Any) -> bool:
+    """
+    Whether a record has been flagged for removal.
+
+    :param rec: A source record
+    :return: True if its "Flag for Removal?" column is set
+    """
+    return bool(getattr(rec, "remove", ""))
+
+
+def check_records(tables: Mapping[str, Iterable[Any]]) -> IntegrityReport:
+    """
+    Check every foreign key field and every reciprocal link pair in one pass over each table.
+
+    ID sets are built once per table first. Links to a table that wasn't supplied can't be judged and are skipped, as are reciprocal pairs where one side is empty in every record, since that side most likely wasn't exported.
+
+    :param tables: Validated source records by table name, e.g. the records of each validate_all report
+    :return: An IntegrityReport
+    """
+    start = time.perf_counter()
+    report = IntegrityReport()
+    rows = {table: list(records) for table, records in tables.items()}
+    ids = {table: {rec.airtable_idno for rec in recs} for table, recs in rows.items()}
+    removed = {
+        table: {rec.airtable_idno for rec in recs if is_removed(rec)}
+        for table, recs in rows.items()
+    }
+
+    fields_by_table: dict[str, list[tuple[str, str]]] = defaultdict(list)
+    for table, field_name, target in FOREIGN_KEYS:
+        if table not in rows:
+            continue
+        if target not in rows:
+            report.skipped.append(
+                "{}.{}: no {} table to check against".format(table, field_name, target)
+            )
+            continue
+        fields_by_table[table].append((field_name, target))
+
+    # For each reciprocal pair, which side records edges and which checks them off
+    recorders: dict[tuple[str, str], int] = {}
+    checkers: dict[tuple[str, str], int] = {}
+    for n, (a, b) in enumerate(RECIPROCAL_LINKS):
+        if a[0] not in rows or b[0] not in rows:
+            continue
+        first, second = sorted((a, b), key=lambda side: TABLE_ORDER.index(side[0]))
+        recorders[first] = n
+        checkers[second] = n
+    # Edges are counted as (owner on the recording side, owner on the checking side), so a link repeated on one side needs repeating on the other
+    pending: dict[int, Counter[tuple[str, str]]] = {
+        n: Counter() for n in checkers.values()
+    }
+    unmatched: dict[int, list[Violation]] = defaultdict(list)
+    populated: set[tuple[str, str]] = set()
+
+    for table in sorted(fields_by_table, key=TABLE_ORDER.index):
+        for rec in rows[table]:
+            owner = rec.airtable_idno
+            for field_name, target in fields_by_table[table]:
+                links = as_id_list(getattr(rec, field_name, ""))
+                if not links:
+                    continue
+                side = (table, field_name)
+                populated.add(side)
+                for link in links:
+                    report.links += 1
+                    if link not in ids[target]:
+                        report.add(Violation(table, field_name, owner, link, MISSING))
+                        continue
+                    if link in removed[target]:
+                        report.add(Violation(table, field_name, owner, link, REMOVED))
+                    if side in recorders:
+                        pending[recorders[side]][(owner, link)] += 1
+                    elif side in checkers:
+                        n = checkers[side]
+                        if pending[n][(link, owner)] > 0:
+                            pending[n][(link, owner)] -= 1
+                        else:
+                            unmatched[n].append(
+                                Violation(table, field_name, owner, link, ONE_SIDED)
+                            )
+
+    for side, n in checkers.items():
+        first = next(s for s, m in recorders.items() if m == n)
+        if first not in populated or side not in populated:
+            report.skipped.append(
+                "{}.{} <-> {}.{}: one side is empty everywhere".format(*first, *side)
+            )
+            continue
+        for v in unmatched[n]:
+            report.add(v)
+        # Whatever the checking side never claimed is one-sided on the recording side
+        for (owner, link), count in sorted(pending[n].items()):
+            for _ in range(count):
+                report.add(Violation(first[0], first[1], owner, link, ONE_SIDED))
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def check_integrity(reports: Mapping[str, ValidationReport]) -> IntegrityReport:
+    """
+    Check the output of validate_all before migrating it.
+
+    :param reports: A dictionary of table name to ValidationReport
+    :return: An IntegrityReport
+    """
+    return check_records({table: r.records for table, r in reports.items()})
@@ -0,0 +1,412 @@
+"""Resolve Airtable links between source tables into v4 destination records."""
+
+import dataclasses
+from typing import Any, Iterable, Mapping, Union
+from pydantic import ValidationError
+from .destinations import (
+    DonationGroupingRecord,
+    EntityRecord,
+    EntityRelationshipRecord,
+    FileRecord,
+    ItemRecord,
+    SubjectRecord,
+)
+from .sources import (
+    AccessionSourceRecord,
+    AirtableSourceRecord,
+    EntityRelationshipSourceRecord,
+    EntitySourceRecord,
+    FileSourceRecord,
+    ItemSourceRecord,
+    SubjectSourceRecord,
+    ValidationReport,
+)
+from .utils import normalized_or_raw
+
+
+@dataclasses.dataclass
+class MigratedRecords:
+    """Every destination record produced from one set of source tables."""
+
+    donation_groupings: list[DonationGroupingRecord] = dataclasses.field(
+        default_factory=list
+    )
+    files: list[FileRecord] = dataclasses.field(default_factory=list)
+    items: list[ItemRecord] = dataclasses.field(default_factory=list)
+    entities: list[EntityRecord] = dataclasses.field(default_factory=list)
+    subjects: list[SubjectRecord] = dataclasses.field(default_factory=list)
+    relationships: list[EntityRelationshipRecord] = dataclasses.field(
+        default_factory=list
+    )
+    # (airtable_idno of the linking record, field, airtable_idno that didn't resolve)
+    unresolved: list[tuple[str, str, str]] = dataclasses.field(default_factory=list)
+
+
+def as_id_list(value: Union[str, list[str]]) -> list[str]:
+    """
+    Undo singleton unwrapping on a link field.
+
+    :param value: A link field from a source record
+    :return: A list of Airtable IDs
+    """
+    if isinstance(value, str):
+        return [value] if value else []
+    return list(value)
+
+
+def index_by_airtable_idno(
+    records: Iterable[AirtableSourceRecord],
+) -> dict[str, Any]:
+    """
+    Build a hash index over a source table.
+
+    :param records: Validated source records
+    :return: A dictionary of airtable_idno to record
+    """
+    return {rec.airtable_idno: rec for rec in records}
+
+
+class JoinIndex:
+    """
+    Hash indexes over every source table, used to turn Airtable links into destination records.
+
+    Entity and subject records are built once and shared by every item that links to them.
+    """
+
+    def __init__(
+        self,
+        accessions: Mapping[str, AccessionSourceRecord],
+        files: Mapping[str, FileSourceRecord],
+        items: Mapping[str, ItemSourceRecord],
+        entities: Mapping[str, EntitySourceRecord],
+        subjects: Mapping[str, SubjectSourceRecord],
+        relationships: Mapping[str, EntityRelationshipSourceRecord],
+    ) -> None:
+        """
+        Wrap existing indexes keyed on airtable_idno.
+
+        :param accessions: Accessions by airtable_idno
+        :param files: Files by airtable_idno
+        :param items: Items by airtable_idno
+        :param entities: Entities by airtable_idno
+        :param subjects: Subjects by airtable_idno
+        :param relationships: Relationships by airtable_idno
+        """
+        self.accessions = accessions
+        self.files = files
+        self.items = items
+        self.entities = entities
+        self.subjects = subjects
+        self.relationships = relationships
+        self.unresolved: list[tuple[str, str, str]] = []
+        self._entity_records: dict[str, EntityRecord] = {}
+        self._subject_records: dict[str, SubjectRecord] = {}
+        self._donors: dict[str, list[EntityRecord]] = {}
+
+    @classmethod
+    def from_records(
+        cls,
+        accessions: Iterable[AccessionSourceRecord] = (),
+        files: Iterable[FileSourceRecord] = (),
+        items: Iterable[ItemSourceRecord] = (),
+        entities: Iterable[EntitySourceRecord] = (),
+        subjects: Iterable[SubjectSourceRecord] = (),
+        relationships: Iterable[EntityRelationshipSourceRecord] = (),
+    ) -> "JoinIndex":
+        """
+        Index validated source records, e.g. the output of validate_inputs for each table.
+
+        :return: A JoinIndex
+        """
+        return cls(
+            index_by_airtable_idno(accessions),
+            index_by_airtable_idno(files),
+            index_by_airtable_idno(items),
+            index_by_airtable_idno(entities),
+            index_by_airtable_idno(subjects),
+            index_by_airtable_idno(relationships),
+        )
+
+    @classmethod
+    def from_reports(cls, reports: Mapping[str, ValidationReport]) -> "JoinIndex":
+        """
+        Index the output of validate_all.
+
+        :param reports: A dictionary of table name to ValidationReport
+        :return: A JoinIndex
+        """
+
+        def records(table: str) -> list[Any]:
+            return reports[table].records if table in reports else []
+
+        return cls.from_records(
+            accessions=records("accessions"),
+            files=records("files"),
+            items=records("items"),
+            entities=records("entities"),
+            subjects=records("subjects"),
+            relationships=records("relationships"),
+        )
+
+    def _resolve(
+        self, table: Mapping[str, Any], owner: str, field_name: str, value: Any
+    ) -> list[Any]:
+        found = []
+        for link in as_id_list(value):
+            rec = table.get(link)
+            if rec is None:
+                self.unresolved.append((owner, field_name, link))
+            else:
+                found.append(rec)
+        return found
+
+    def entity_record(self, src: EntitySourceRecord) -> EntityRecord:
+        """
+        Map a source entity, building it only the first time it is asked for.
+
+        :param src: A validated EntitySourceRecord
+        :return: The shared EntityRecord
+        """
+        rec = self._entity_records.get(src.airtable_idno)
+        if rec is None:
+            rec = EntityRecord(
+                idno=src.airtable_idno,
+                v3_airtable_created_time=src.airtable_created_time,
+                v3_airtable_idno=src.airtable_idno,
+                name=src.name,
+                entity_type=src.category,
+                alt_name=src.alt_name,
+                bio_hist=src.bio_hist,
+                legacy_idno_lchp=src.lchp_source_code,
+                date_of_birth=normalized_or_raw(src.date_of_birth),
+                date_of_death=normalized_or_raw(src.date_of_death),
+            )
+            self._entity_records[src.airtable_idno] = rec
+        return rec
+
+    def linked_entities(
+        self, owner: str, field_name: str, value: Union[str, list[str]]
+    ) -> list[EntityRecord]:
+        """
+        Resolve an entity link field to shared EntityRecords.
+
+        :param owner: airtable_idno of the record holding the link, for reporting
+        :param field_name: Name of the link field, for reporting
+        :param value: The link field
+        :return: EntityRecords in link order
+        """
+        return [
+            self.entity_record(src)
+            for src in self._resolve(self.entities, owner, field_name, value)
+        ]
+
+    def subject_record(self, src: SubjectSourceRecord) -> SubjectRecord:
+        """
+        Map a source subject, building it only the first time it is asked for.
+
+        :param src: A validated SubjectSourceRecord
+        :return: The shared SubjectRecord
+        """
+        rec = self._subject_records.get(src.airtable_idno)
+        if rec is None:
+            linked_items = self._resolve(
+                self.items,
+                src.airtable_idno,
+                "linked_items_array",
+                src.linked_items_array,
+            )
+            rec = SubjectRecord(
+                idno=src.airtable_idno,
+                v3_airtable_created_time=src.airtable_created_time,
+                v3_airtable_idno=src.airtable_idno,
+                name=src.name,
+                subject_type=src.category,
+                linked_items=[item.idno for item in linked_items],
+            )
+            self._subject_records[src.airtable_idno] = rec
+        return rec
+
+    def donors(self, accession_idno: str) -> list[EntityRecord]:
+        """
+        Resolve the donors of an accession once and reuse the list afterwards.
+
+        :param accession_idno: airtable_idno of the accession
+        :return: EntityRecords for the donors
+        """
+        found = self._donors.get(accession_idno)
+        if found is None:
+            acc = self.accessions[accession_idno]
+            found = self.linked_entities(
+                accession_idno, "linked_entity_array", acc.linked_entity_array
+            )
+            self._donors[accession_idno] = found
+        return found
+
+    def item_record(self, src: ItemSourceRecord) -> ItemRecord:
+        """
+        Map a source item with all of its entity and subject links resolved.
+
+        Donors come from the accessions of the item's files.
+
+        :param src: A validated ItemSourceRecord
+        :return: An ItemRecord
+        """
+        owner = src.airtable_idno
+
+        donors: dict[str, EntityRecord] = {}
+        for f in self._resolve(
+            self.files, owner, "linked_files_array", src.linked_files_array
+        ):
+            if f.linked_accession in self.accessions:
+                for donor in self.donors(f.linked_accession):
+                    donors.setdefault(donor.v3_airtable_idno, donor)
+
+        attachments = src.interview_summary_attachment
+        if isinstance(attachments, dict):
+            attachments = [attachments]
+
+        return ItemRecord(
+            idno=src.idno,
+            v3_airtable_created_time=src.airtable_created_time,
+            v3_airtable_idno=src.airtable_idno,
+            title=src.title,
+            description=src.description,
+            v3_created_date=src.created_date,
+            collection=src.collection,
+            item_type=src.obj_type,
+            linked_entities=self.linked_entities(
+                owner, "linked_people", src.linked_people
+            )
+            + self.linked_entities(owner, "linked_places_orgs", src.linked_places_orgs),
+            linked_entities_as_donors=list(donors.values()),
+            linked_entities_as_creators=[
+                e.idno
+                for e in self.linked_entities(
+                    owner, "linked_entity_as_creator", src.linked_entity_as_creator
+                )
+            ],
+            linked_entities_as_sources=self.linked_entities(
+                owner, "linked_entity_source", src.linked_entity_source
+            ),
+            linked_entities_as_interviewers=self.linked_entities(
+                owner, "linked_entity_interviewers", src.linked_entity_interviewers
+            ),
+            linked_entities_as_interviewees=self.linked_entities(
+                owner, "linked_entity_interviewees", src.linked_entity_interviewees
+            ),
+            linked_subjects=[
+                self.subject_record(s)
+                for s in self._resolve(
+                    self.subjects, owner, "linked_subjects", src.linked_subjects
+                )
+            ],
+            interview_summary_attachment=attachments,
+        )
+
+    def file_record(self, src: FileSourceRecord) -> FileRecord:
+        """
+        Map a source file, swapping Airtable links for v4 accession and item IDs.
+
+        :param src: A validated FileSourceRecord
+        :return: A FileRecord with fixity fields still unset
+        """
+        accession = self._resolve(
+            self.accessions, src.airtable_idno, "linked_accession", src.linked_accession
+        )
+        item = self._resolve(
+            self.items, src.airtable_idno, "part_of_item", src.part_of_item
+        )
+        return FileRecord(
+            idno=src.idno,
+            v3_airtable_created_time=src.airtable_created_time,
+            v3_airtable_idno=src.airtable_idno,
+            donation_grouping_id=accession[0].idno if accession else "",
+            item_id=item[0].idno if item else "",
+        )
+
+    def donation_grouping_record(
+        self, src: AccessionSourceRecord
+    ) -> DonationGroupingRecord:
+        """
+        Map a source accession.
+
+        :param src: A validated AccessionSourceRecord
+        :return: A DonationGroupingRecord
+        """
+        return DonationGroupingRecord(
+            idno=src.idno,
+            v3_airtable_created_time=src.airtable_created_time,
+            v3_airtable_idno=src.airtable_idno,
+            donor_name=src.donor_name,
+            donation_date=normalized_or_raw(src.donation_date),
+            donor_email="",
+            donor_phone="",
+            description=src.description,
+            v3_files_array=src.file_array,
+            title=src.title,
+            legacy_idno=src.legacy_idno_umd,
+        )
+
+    def entity_relationship_record(
+        self, src: EntityRelationshipSourceRecord
+    ) -> EntityRelationshipRecord:
+        """
+        Map a source relationship, checking both ends resolve.
+
+        :param src: A validated EntityRelationshipSourceRecord
+        :return: An EntityRelationshipRecord
+        """
+        subject = self.linked_entities(src.airtable_idno, "entity_1", src.entity_1)
+        obj = self.linked_entities(src.airtable_idno, "entity_2", src.entity_2)
+        return EntityRelationshipRecord(
+            idno=src.airtable_idno,
+            v3_airtable_created_time=src.airtable_created_time,
+            v3_airtable_idno=src.airtable_idno,
+            name=src.name,
+            subject_entity=subject[0].idno if subject else src.entity_1,
+            object_entity=obj[0].idno if obj else src.entity_2,
+            relationship_predicate=src.relation_type,
+            relationship_start_date=normalized_or_raw(src.start_date),
+            relationship_end_date=normalized_or_raw(src.end_date),
+        )
+
+    def build(self) -> MigratedRecords:
+        """
+        Map every indexed source record in one linear pass.
+
+        :return: MigratedRecords holding every destination record and any links that didn't resolve
+        """
+        out = MigratedRecords(unresolved=self.unresolved)
+        out.entities = [self.entity_record(e) for e in self.entities.values()]
+        out.subjects = [self.subject_record(s) for s in self.subjects.values()]
+
+        for src in self.items.values():
+            try:
+                out.items.append(self.item_record(src))
+            except (RuntimeError, ValidationError) as err:
+                print(
+                    "Error mapping item {} — (Item) {}: {}".format(
+                        src.airtable_idno, src.idno, err
+                    )
+                )
+
+        out.files = [self.file_record(f) for f in self.files.values()]
+        out.donation_groupings = [
+            self.donation_grouping_record(a) for a in self.accessions.values()
+        ]
+        out.relationships = [
+            self.entity_relationship_record(r) for r in self.relationships.values()
+        ]
+        return out
+
+
+def build_destination_records(
+    reports: Mapping[str, ValidationReport],
+) -> MigratedRecords:
+    """
+    Turn validated source tables into linked destination records.
+
+    :param reports: A dictionary of table name to ValidationReport, as returned by validate_all
+    :return: MigratedRecords
+    """
+    return JoinIndex.from_reports(reports).build()
@@ -0,0 +1,222 @@
+"""Validate all of the source tables at once across a process pool."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Final, Iterable, Iterator, Optional, Union
+
+from .fixity import bounded_map
+from .instrumentation import Instrumentation
+from .snapshot_cache import SnapshotCache
+from .source_mappings import (
+    accessions_source_column_mappings,
+    entities_source_column_mappings,
+    files_source_column_mappings,
+    items_source_column_mappings,
+    relationships_source_column_mappings,
+    subjects_source_column_mappings,
+)
+from .sources import (
+    AIRTABLE_JSON,
+    ValidationReport,
+    stream_from_file,
+    validate_records,
+    validator_switch,
+)
+
+TABLE_FIELDMAPS: Final[dict[str, dict[str, str]]] = {
+    "accessions": accessions_source_column_mappings,
+    "files": files_source_column_mappings,
+    "items": items_source_column_mappings,
+    "entities": entities_source_column_mappings,
+    "subjects": subjects_source_column_mappings,
+    "relationships": relationships_source_column_mappings,
+}
+
+# Big enough to amortize pickling, small enough that Files splits across every worker
+DEFAULT_CHUNK_SIZE: Final = 5000
+# Chunks handed to the pool per worker before waiting for the oldest to come back
+CHUNKS_IN_FLIGHT: Final = 2
+
+ChunkJob = tuple[str, list[AIRTABLE_JSON], Optional[Instrumentation]]
+
+
+def chunked(
+    records: Iterable[AIRTABLE_JSON], size: int
+) -> Iterator[list[AIRTABLE_JSON]]:
+    """
+    Split a stream of records into lists of at most size records.
+
+    :param records: An iterable of raw Airtable records
+    :param size: Maximum number of records per chunk
+    :return: An iterator over lists of records, in order
+    """
+    it = iter(records)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_chunk(
+    table: str,
+    records: list[AIRTABLE_JSON],
+    instrumentation: Optional[Instrumentation] = None,
+) -> tuple[ValidationReport, Optional[Instrumentation]]:
+    """
+    Validate one chunk of a table. Runs in a worker process.
+
+    :param table: Name of the table the records came from
+    :param records: Raw Airtable records
+    :param instrumentation: Optional Instrumentation to collect timings in
+    :return: A ValidationReport for just this chunk, and the instrumentation so a worker can send it back
+    """
+    report = validate_records(
+        records,
+        validator_switch[table],
+        TABLE_FIELDMAPS[table],
+        table,
+        instrumentation,
+    )
+    return (report, instrumentation)
+
+
+def validate_job(
+    job: ChunkJob,
+) -> tuple[str, tuple[ValidationReport, Optional[Instrumentation]]]:
+    """
+    Validate one chunk handed over as a single argument. Runs in a worker process.
+
+    :param job: A tuple of (table name, raw Airtable records, optional Instrumentation)
+    :return: The table name, and what validate_chunk returns
+    """
+    table, records, instrumentation = job
+    return (table, validate_chunk(table, records, instrumentation))
+
+
+def merge_reports(
+    table: str,
+    results: Iterable[tuple[ValidationReport, Optional[Instrumentation]]],
+    instrumentation: Optional[Instrumentation] = None,
+) -> ValidationReport:
+    """
+    Stitch chunk reports back together in the order they are given.
+
+    :param table: Name of the table the reports belong to
+    :param results: Chunk reports in original record order, each with the instrumentation it collected
+    :param instrumentation: Where to merge instrumentation collected by other processes
+    :return: A single ValidationReport; elapsed is the summed validation time of the chunks
+    """
+    merged = ValidationReport(table=table)
+    for report, chunk_instrumentation in results:
+        merged.records.extend(report.records)
+        merged.failures.extend(report.failures)
+        merged.elapsed += report.elapsed
+        if (
+            instrumentation is not None
+            and chunk_instrumentation is not None
+            and chunk_instrumentation is not instrumentation
+        ):
+            instrumentation.merge(chunk_instrumentation)
+    return merged
+
+
+def validate_all(
+    source_dir: Optional[Union[str, Path]] = None,
+    workers: Optional[int] = None,
+    tables: Optional[Iterable[str]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    instrumentation: Optional[Instrumentation] = None,
+    cache: Optional[SnapshotCache] = None,
+) -> dict[str, ValidationReport]:
+    """
+    Validate every source table, fanning tables and chunks of large tables out across processes.
+
+    Records come back in their original order and match what validate_table produces for each file.
+
+    :param source_dir: Directory holding the source data, defaults to source_data in the working directory
+    :param workers: Number of worker processes; 1 validates in this process, None uses one per CPU
+    :param tables: Names of the tables to validate, defaults to all six
+    :param chunk_size: Maximum number of records handed to a worker at once
+    :param instrumentation: Optional Instrumentation; timings from worker processes are merged into it, but its hooks only run when workers is 1
+    :param cache: Optional SnapshotCache; tables whose source hasn't changed are loaded from it instead of validated
+    :return: A dictionary of table name to ValidationReport
+    """
+    source_path = Path(source_dir) if source_dir else Path.cwd() / "source_data"
+    # A table listed twice would have its chunks merged twice, the second merge replacing the first
+    table_names = (
+        list(dict.fromkeys(tables)) if tables is not None else list(TABLE_FIELDMAPS)
+    )
+
+    for table in table_names:
+        if table not in TABLE_FIELDMAPS:
+            raise KeyError("Unexpected table: {}".format(table))
+
+    results: dict[str, ValidationReport] = {}
+    cache_keys: dict[str, str] = {}
+    if cache is not None:
+        for table in table_names:
+            target_file = source_path / "{}.json".format(table)
+            if not target_file.is_file():
+                continue
+            key = cache.key(
+                target_file, TABLE_FIELDMAPS[table], validator_switch[table].__name__
+            )
+            cached = cache.load(key)
+            if cached is not None:
+                results[table] = cached
+            else:
+                cache_keys[table] = key
+
+    to_validate = [t for t in table_names if t not in results]
+
+    def table_chunks(table: str) -> Iterator[list[AIRTABLE_JSON]]:
+        return chunked(
+            stream_from_file("{}.json".format(table), source_dir=source_path),
+            chunk_size,
+        )
+
+    if workers == 1:
+        for table in to_validate:
+            results[table] = merge_reports(
+                table,
+                (
+                    validate_chunk(table, c, instrumentation)
+                    for c in table_chunks(table)
+                ),
+                instrumentation,
+            )
+    elif to_validate:
+
+        def worker_instrumentation() -> Optional[Instrumentation]:
+            if instrumentation is None:
+                return None
+            return Instrumentation(
+                instrumentation.profile_every, instrumentation.profile_slowest
+            )
+
+        jobs: Iterator[ChunkJob] = (
+            (table, chunk, worker_instrumentation())
+            for table in to_validate
+            for chunk in table_chunks(table)
+        )
+        # Keep only a few chunks per worker pickled into the pool, and merge each table as soon as its last chunk is back
+        limit = CHUNKS_IN_FLIGHT * (workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            done = bounded_map(pool, validate_job, jobs, limit)
+            for table, group in groupby(done, key=itemgetter(0)):
+                results[table] = merge_reports(
+                    table, (result for _, result in group), instrumentation
+                )
+        # A table with no records never had a chunk to validate
+        for table in to_validate:
+            results.setdefault(table, ValidationReport(table=table))
+
+    if cache is not None:
+        for table, key in cache_keys.items():
+            cache.store(key, results[table])
+
+    return {table: results[table] for table in table_names}
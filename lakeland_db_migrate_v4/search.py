@@ -0,0 +1,425 @@
+"""Build and query a full-text index of items, entities and subjects for the archive site."""
+
+import dataclasses
+import heapq
+import json
+import math
+import mmap
+import re
+import struct
+import sys
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Final, Iterable, Optional, Type, Union
+
+from .writers import TABLE_NAMES
+
+# Field weights per destination record class; a term in a title counts three times one in a description
+SEARCH_FIELDS: Final[dict[str, dict[str, float]]] = {
+    "ItemRecord": {"title": 3.0, "description": 1.0},
+    "EntityRecord": {"name": 3.0, "alt_name": 2.0, "bio_hist": 1.0},
+    "SubjectRecord": {"name": 3.0},
+}
+STOPWORDS: Final = frozenset(
+    "a an and are as at be by for from in is it of on or that the this to was with".split()
+)
+BM25_K1: Final = 1.2
+BM25_B: Final = 0.75
+DEFAULT_LIMIT: Final = 10
+
+MAGIC: Final = b"LKSEARCH"
+FORMAT_VERSION: Final = 1
+# Doc kinds, doc lengths, doc offsets, doc names, term offsets, terms, posting offsets, posting docs, posting weights, metadata
+SECTIONS: Final = 10
+HEADER: Final = struct.Struct("<8sIIQQQd{}Q".format(SECTIONS + 1))
+
+token_regex = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split text into search terms.
+
+    Terms are case folded with accents stripped, so "Béla" and "BELA" match, and common English words are dropped.
+
+    :param text: A field value or a query
+    :return: Terms in the order they appear
+    """
+    text = text.casefold()
+    if not text.isascii():
+        text = "".join(
+            c
+            for c in unicodedata.normalize("NFKD", text)
+            if not unicodedata.combining(c)
+        )
+    return [t for t in token_regex.findall(text) if t not in STOPWORDS]
+
+
+@dataclasses.dataclass
+class SearchIndexStats:
+    """What went into a search index."""
+
+    documents: int = 0
+    terms: int = 0
+    postings: int = 0
+    bytes: int = 0
+    elapsed: float = 0.0
+
+
+@dataclasses.dataclass(frozen=True)
+class SearchHit:
+    """One ranked search result."""
+
+    idno: str
+    kind: str
+    score: float
+
+
+def pad(fobject: Any) -> int:
+    """Pad a file being written out to the next 8 byte boundary and return the position."""
+    position = fobject.tell()
+    if position % 8:
+        fobject.write(b"\0" * (8 - position % 8))
+    return int(fobject.tell())
+
+
+class SearchIndexBuilder:
+    """
+    Collect postings from destination records as they stream past, then write them out in one go.
+
+    Only the postings are held in memory, as flat arrays per term; records can be dropped as soon as they are added.
+    """
+
+    def __init__(self, fields: Optional[dict[str, dict[str, float]]] = None) -> None:
+        """
+        Start an empty index.
+
+        :param fields: Field weights per destination record class, defaults to SEARCH_FIELDS
+        """
+        self.fields = fields or SEARCH_FIELDS
+        self.kinds = [TABLE_NAMES.get(name, name) for name in self.fields]
+        self.kind_codes = {name: code for code, name in enumerate(self.fields)}
+        self.doc_kinds = array("B")
+        self.doc_lengths = array("f")
+        self.doc_names: list[bytes] = []
+        self.postings: dict[str, tuple[array, array]] = {}
+        self.total_length = 0.0
+
+    def add(self, record: Any) -> bool:
+        """
+        Index one destination record.
+
+        :param record: Any destination record; ones without searchable fields are ignored
+        :return: True if the record was indexed
+        """
+        name = type(record).__name__
+        weights = self.fields.get(name)
+        if weights is None:
+            return False
+
+        frequencies: dict[str, float] = {}
+        length = 0.0
+        for field_name, weight in weights.items():
+            terms = tokenize(str(getattr(record, field_name, "") or ""))
+            length += weight * len(terms)
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+        if not frequencies:
+            return False
+
+        doc = len(self.doc_kinds)
+        self.doc_kinds.append(self.kind_codes[name])
+        self.doc_lengths.append(length)
+        self.doc_names.append(str(record.idno).encode("utf-8"))
+        self.total_length += length
+        postings = self.postings
+        for term, frequency in frequencies.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("I"), array("f"))
+            entry[0].append(doc)
+            entry[1].append(frequency)
+        return True
+
+    def write(self, path: Union[str, Path]) -> SearchIndexStats:
+        """
+        Write the index atomically.
+
+        :param path: The index file
+        :return: SearchIndexStats, without elapsed
+        """
+        if sys.byteorder != "little":
+            raise RuntimeError("Search indexes are written little-endian only")
+        target = Path(path)
+        tmp = target.with_suffix(".tmp")
+        encoded = sorted((term.encode("utf-8"), term) for term in self.postings)
+        stats = SearchIndexStats(documents=len(self.doc_kinds), terms=len(encoded))
+        metadata = {
+            "kinds": self.kinds,
+            "fields": self.fields,
+            "k1": BM25_K1,
+            "b": BM25_B,
+        }
+
+        with open(tmp, "wb") as fobject:
+            fobject.write(b"\0" * HEADER.size)
+            offsets = []
+
+            offsets.append(pad(fobject))
+            self.doc_kinds.tofile(fobject)
+            offsets.append(pad(fobject))
+            self.doc_lengths.tofile(fobject)
+            offsets.append(pad(fobject))
+            doc_offsets = array("Q", [0])
+            for doc_name in self.doc_names:
+                doc_offsets.append(doc_offsets[-1] + len(doc_name))
+            doc_offsets.tofile(fobject)
+            offsets.append(pad(fobject))
+            fobject.write(b"".join(self.doc_names))
+
+            offsets.append(pad(fobject))
+            term_offsets = array("Q", [0])
+            for term_bytes, _ in encoded:
+                term_offsets.append(term_offsets[-1] + len(term_bytes))
+            term_offsets.tofile(fobject)
+            offsets.append(pad(fobject))
+            fobject.write(b"".join(term_bytes for term_bytes, _ in encoded))
+
+            offsets.append(pad(fobject))
+            posting_offsets = array("Q", [0])
+            for _, term in encoded:
+                posting_offsets.append(
+                    posting_offsets[-1] + len(self.postings[term][0])
+                )
+            posting_offsets.tofile(fobject)
+            offsets.append(pad(fobject))
+            for _, term in encoded:
+                self.postings[term][0].tofile(fobject)
+            offsets.append(pad(fobject))
+            for _, term in encoded:
+                self.postings[term][1].tofile(fobject)
+
+            offsets.append(pad(fobject))
+            fobject.write(json.dumps(metadata).encode("utf-8"))
+            offsets.append(fobject.tell())
+
+            stats.postings = posting_offsets[-1]
+            stats.bytes = offsets[-1]
+            fobject.seek(0)
+            fobject.write(
+                HEADER.pack(
+                    MAGIC,
+                    FORMAT_VERSION,
+                    len(self.kinds),
+                    stats.documents,
+                    stats.terms,
+                    stats.postings,
+                    self.total_length,
+                    *offsets,
+                )
+            )
+        tmp.replace(target)
+        return stats
+
+
+def build_search_index(
+    records: Iterable[Any],
+    path: Union[str, Path],
+    fields: Optional[dict[str, dict[str, float]]] = None,
+) -> SearchIndexStats:
+    """
+    Index destination records in a single pass and write the index to disk.
+
+    :param records: Destination records of any mix of types, e.g. iter_migrated(migrated); only items, entities and subjects are indexed by default
+    :param path: The index file
+    :param fields: Field weights per destination record class, defaults to SEARCH_FIELDS
+    :return: SearchIndexStats
+    """
+    start = time.perf_counter()
+    builder = SearchIndexBuilder(fields)
+    for record in records:
+        builder.add(record)
+    stats = builder.write(path)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+class SearchIndex:
+    """
+    A search index opened with mmap, so only the pages a query touches are read.
+
+    Use it as a context manager, or call close when done.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """
+        Open an index written by build_search_index.
+
+        :param path: The index file
+        """
+        if sys.byteorder != "little":
+            raise RuntimeError("Search indexes can only be read on little-endian hosts")
+        with open(path, "rb") as fobject:
+            self._mmap = mmap.mmap(fobject.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        (
+            magic,
+            version,
+            _,
+            self.documents,
+            self.terms,
+            self.postings,
+            total_length,
+            *offsets,
+        ) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            view.release()
+            self._mmap.close()
+            raise RuntimeError(
+                "Not a search index this version can read: {}".format(path)
+            )
+
+        self._views = [view]
+
+        def section(i: int, fmt: str = "B", count: int = -1) -> memoryview:
+            # Sections are padded up to 8 bytes, so trim each to what its type needs
+            raw = view[offsets[i] : offsets[i + 1]]
+            if count >= 0:
+                raw = raw[: count * struct.calcsize(fmt)]
+            typed = raw.cast(fmt) if fmt != "B" else raw
+            self._views.append(typed)
+            return typed
+
+        self.doc_kinds = section(0, "B", self.documents)
+        self.doc_lengths = section(1, "f", self.documents)
+        self.doc_offsets = section(2, "Q", self.documents + 1)
+        self.doc_names = section(3)
+        self.term_offsets = section(4, "Q", self.terms + 1)
+        self.term_bytes = section(5)
+        self.posting_offsets = section(6, "Q", self.terms + 1)
+        self.posting_docs = section(7, "I", self.postings)
+        self.posting_weights = section(8, "f", self.postings)
+        metadata = json.loads(bytes(section(9)).decode("utf-8"))
+
+        self.kinds: list[str] = metadata["kinds"]
+        self.fields: dict[str, dict[str, float]] = metadata["fields"]
+        self.k1: float = metadata["k1"]
+        self.b: float = metadata["b"]
+        self.average_length = total_length / self.documents if self.documents else 0.0
+
+    def term(self, i: int) -> bytes:
+        """The i-th term in sorted order, utf-8 encoded."""
+        return bytes(self.term_bytes[self.term_offsets[i] : self.term_offsets[i + 1]])
+
+    def find(self, term: str) -> int:
+        """
+        Binary search the term dictionary.
+
+        :param term: A single term, as tokenize returns it
+        :return: The term's number, or -1 if it isn't indexed
+        """
+        target = term.encode("utf-8")
+        lo, hi = 0, self.terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.terms and self.term(lo) == target:
+            return lo
+        return -1
+
+    def postings_for(self, term: str) -> tuple[memoryview, memoryview]:
+        """
+        Look up a term's posting list.
+
+        :param term: A single term, as tokenize returns it
+        :return: Views of the document numbers and weighted term frequencies, empty if the term isn't indexed
+        """
+        i = self.find(term)
+        if i < 0:
+            return (self.posting_docs[0:0], self.posting_weights[0:0])
+        start, end = self.posting_offsets[i], self.posting_offsets[i + 1]
+        return (self.posting_docs[start:end], self.posting_weights[start:end])
+
+    def idno(self, doc: int) -> str:
+        """The idno of an indexed record."""
+        return bytes(
+            self.doc_names[self.doc_offsets[doc] : self.doc_offsets[doc + 1]]
+        ).decode("utf-8")
+
+    def search(
+        self,
+        query: str,
+        limit: int = DEFAULT_LIMIT,
+        kinds: Optional[Iterable[str]] = None,
+    ) -> list[SearchHit]:
+        """
+        Rank records against a query with BM25 over field weighted term frequencies.
+
+        :param query: Free text; every term is optional, records matching more and rarer terms rank higher
+        :param limit: Most hits to return
+        :param kinds: Only return these kinds of record, e.g. ["items"]; a KeyError for one the index doesn't have
+        :return: SearchHits, best first
+        """
+        wanted = None
+        if kinds is not None:
+            wanted = set()
+            for kind in kinds:
+                if kind not in self.kinds:
+                    raise KeyError("Unexpected kind: {}".format(kind))
+                wanted.add(self.kinds.index(kind))
+        k1, b = self.k1, self.b
+        average = self.average_length or 1.0
+        lengths = self.doc_lengths
+        doc_kinds = self.doc_kinds
+        scores: dict[int, float] = {}
+
+        for term in dict.fromkeys(tokenize(query)):
+            docs, weights = self.postings_for(term)
+            if not len(docs):
+                continue
+            idf = math.log(1 + (self.documents - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc, frequency in zip(docs, weights):
+                if wanted is not None and doc_kinds[doc] not in wanted:
+                    continue
+                norm = k1 * (1 - b + b * lengths[doc] / average)
+                scores[doc] = scores.get(doc, 0.0) + idf * frequency * (k1 + 1) / (
+                    frequency + norm
+                )
+
+        best = heapq.nlargest(
+            limit, scores.items(), key=lambda item: (item[1], -item[0])
+        )
+        return [
+            SearchHit(self.idno(doc), self.kinds[doc_kinds[doc]], score)
+            for doc, score in best
+        ]
+
+    def close(self) -> None:
+        """
+        Unmap the file.
+
+        :return: None
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self) -> "SearchIndex":
+        """Use the open index."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc: Optional[BaseException],
+        tb: Optional[TracebackType],
+    ) -> None:
+        """Close the index."""
+        self.close()
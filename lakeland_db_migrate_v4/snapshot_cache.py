@@ -0,0 +1,140 @@
+"""Keep validated tables on disk so unchanged source data isn't validated twice."""
+
+import hashlib
+import json
+import pickle
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Final, Optional, Union
+
+import pydantic
+
+DEFAULT_CACHE_DIR: Final = ".lakeland_cache"
+HASH_CHUNK_SIZE: Final = 1024 * 1024
+# Validation behaviour lives in these modules, so edits to them invalidate the cache
+CODE_MODULES: Final = ("sources.py", "utils.py")
+
+
+def file_digest(path: Path) -> str:
+    """
+    Hash a file's contents.
+
+    :param path: The file to hash
+    :return: A SHA-256 hex digest
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as fobject:
+        for chunk in iter(lambda: fobject.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def package_version() -> str:
+    """Version of the installed package, or unknown when running from a checkout."""
+    try:
+        return metadata.version("lakeland-db-migrate-v4")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def code_fingerprint() -> str:
+    """
+    Hash the package version, pydantic version and the code that does validation.
+
+    :return: A hex digest
+    """
+    h = hashlib.sha256()
+    h.update(package_version().encode("utf-8"))
+    h.update(pydantic.VERSION.encode("utf-8"))
+    here = Path(__file__).parent
+    for name in CODE_MODULES:
+        h.update((here / name).read_bytes())
+    return h.hexdigest()
+
+
+class SnapshotCache:
+    """
+    Content-addressed pickles of validation results.
+
+    Entries are named after the source file's path and a digest of its contents, fieldmap, validator and code fingerprint, so any change to those simply misses. Only point this at a directory you trust: entries are unpickled.
+    """
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None) -> None:
+        """
+        Use (and create if needed) a cache directory.
+
+        :param directory: Where to keep entries, defaults to .lakeland_cache in the working directory
+        """
+        self.directory = (
+            Path(directory) if directory else Path.cwd() / DEFAULT_CACHE_DIR
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._code = code_fingerprint()
+        self.hits = 0
+        self.misses = 0
+
+    def key(
+        self, source_file: Path, fieldmap: dict[str, str], validator_name: str
+    ) -> str:
+        """
+        Work out the cache key for validating a source file.
+
+        :param source_file: The json export
+        :param fieldmap: The fieldmap it is validated with
+        :param validator_name: Name of the source record dataclass
+        :return: A key usable with load and store
+        """
+        # Exports of the same table from different directories each keep their own entry
+        location = hashlib.sha256(str(source_file.resolve()).encode("utf-8"))
+        h = hashlib.sha256()
+        h.update(file_digest(source_file).encode("utf-8"))
+        h.update(json.dumps(fieldmap, sort_keys=True).encode("utf-8"))
+        h.update(validator_name.encode("utf-8"))
+        h.update(self._code.encode("utf-8"))
+        return "{}-{}-{}".format(
+            source_file.stem, location.hexdigest()[:16], h.hexdigest()
+        )
+
+    def path_for(self, key: str) -> Path:
+        """Where an entry lives."""
+        return self.directory / "{}.pickle".format(key)
+
+    def load(self, key: str) -> Optional[Any]:
+        """
+        Fetch an entry.
+
+        :param key: From key()
+        :return: The stored value, or None on a miss
+        """
+        try:
+            with open(self.path_for(key), "rb") as fobject:
+                value = pickle.load(fobject)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def store(self, key: str, value: Any) -> None:
+        """
+        Save an entry, replacing any older entry for the same source file.
+
+        :param key: From key()
+        :param value: Anything picklable, usually a ValidationReport
+        :return: None
+        """
+        source = key.rsplit("-", 1)[0]
+        for stale in self.directory.glob("{}-*.pickle".format(source)):
+            if stale.stem.rsplit("-", 1)[0] == source:
+                stale.unlink()
+
+        target = self.path_for(key)
+        tmp = target.with_suffix(".tmp")
+        with open(tmp, "wb") as fobject:
+            pickle.dump(value, fobject, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(target)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        for entry in self.directory.glob("*.pickle"):
+            entry.unlink()
@@ -1,20 +1,47 @@
 """Handle input data coming from Airtable."""
+
+import cProfile
+import dataclasses
+import hashlib
 import json
+import random
+import time
 from pathlib import Path
-from collections import defaultdict
 from dataclasses import InitVar, field
-from typing import Final, Union, TypeVar, Tuple, DefaultDict, Text, Optional, Any
+from typing import (
+    Final,
+    Union,
+    TypeVar,
+    Tuple,
+    Text,
+    Optional,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    TextIO,
+)
 from pydantic import Field, ValidationError
 from pydantic.dataclasses import dataclass
+from .instrumentation import (
+    KEY_CHECK,
+    LOAD,
+    POST_INIT,
+    RENAME,
+    VALIDATE,
+    Instrumentation,
+    active_instrumentation,
+)
+from .snapshot_cache import DEFAULT_CACHE_DIR, SnapshotCache, code_fingerprint
 from .utils import handle_paths
 
-
 # TYPE HINTING HELPERS
 # Loose type hints for json that comes back from Airtable
 AIRTABLE_JSON = dict[str, Union[str, int, list[str]]]
 # Beyond a certain point it's not worth caring how this data is structured
 AIRTABLE_ATTACHMENTS_BLOB = Union[list[dict[str, Any]], dict[str, Any]]
 
+
 # TODO: Figure out how to move these dataclass declarations
 # to a separate file without mypy losing track of them
 @dataclass(frozen=True)
@@ -58,6 +85,8 @@ class FileSourceRecord(AirtableSourceRecord):
 
     def __post_init_post_parse__(self, virtual_location: str, file_path: str) -> None:
         """Handle the case of more than one file path."""
+        inst = active_instrumentation.get()
+        start = time.perf_counter() if inst is not None else 0.0
         all_locations = []
 
         if virtual_location is not None and virtual_location != "":
@@ -73,6 +102,9 @@ class FileSourceRecord(AirtableSourceRecord):
                 all_locations.extend(normed_paths)
                 object.__setattr__(self, "locations", all_locations)
 
+        if inst is not None:
+            inst.record(POST_INIT, time.perf_counter() - start, self.airtable_idno)
+
 
 @dataclass(frozen=True)
 class ItemSourceRecord(AirtableSourceRecord):
@@ -121,6 +153,8 @@ class EntitySourceRecord(AirtableSourceRecord):
     auth_relations: Union[str, list[str]] = Field(default_factory=list)
     auth_relations_2: Union[str, list[str]] = Field(default_factory=list)
     address: str = ""
+    date_of_birth: str = ""
+    date_of_death: str = ""
     latitude: str = ""
     longitude: str = ""
     alt_name: str = ""
@@ -163,29 +197,142 @@ AnyRecord = TypeVar(
 )
 
 # LIBRARY FUNCTIONS
-def load_from_file(fname: str) -> Tuple[list[AIRTABLE_JSON], Tuple[str, ...]]:
+STREAM_CHUNK_SIZE: Final = 64 * 1024
+JSON_WHITESPACE: Final = " \t\n\r"
+JSON_DELIMITERS: Final = JSON_WHITESPACE + ",]"
+
+
+def iter_json_array(
+    fobject: TextIO, chunk_size: int = STREAM_CHUNK_SIZE
+) -> Iterator[Any]:
     """
-    Load data from a json file representing the contents of a table from an Airtable base to be migrated.
+    Incrementally decode the members of a top-level json array.
 
-    :param fname: A string representing the name of the file to load
-    :return: A list of dictionaries representing the json data
+    Only a window of the file big enough to hold the member currently being decoded is kept in memory.
+
+    :param fobject: A text mode file object positioned at the start of a json array
+    :param chunk_size: How many characters to read from the file at a time
+    :return: An iterator over the decoded members of the array
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def read_more() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = fobject.read(chunk_size)
+        if chunk == "":
+            eof = True
+            return False
+        # Drop what has already been consumed so the window doesn't grow with the file
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def next_token() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in JSON_WHITESPACE:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not read_more():
+                raise json.JSONDecodeError("Unexpected end of data", buf, pos)
+
+    if next_token() == "\ufeff":
+        # Left by editors that save UTF-8 with a byte order mark
+        pos += 1
+    if next_token() != "[":
+        raise json.JSONDecodeError("Expected a json array", buf, pos)
+    pos += 1
+
+    if next_token() == "]":
+        return
+
+    while True:
+        next_token()
+        while True:
+            try:
+                member, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Most likely the member runs past the end of what we've read so far
+                if not read_more():
+                    raise
+                continue
+            if (
+                not isinstance(member, (dict, list, str))
+                and (end == len(buf) or buf[end] not in JSON_DELIMITERS)
+                and read_more()
+            ):
+                # A number could have been cut off at the edge of the window
+                continue
+            break
+        pos = end
+        yield member
+
+        token = next_token()
+        pos += 1
+        if token == "]":
+            return
+        if token != ",":
+            raise json.JSONDecodeError("Expected ',' or ']'", buf, pos - 1)
+
+
+def source_path(fname: str, source_dir: Optional[Path] = None) -> Path:
+    """
+    Find a source data file.
+
+    :param fname: A string representing the name of the file
+    :param source_dir: Directory holding the source data, defaults to source_data in the working directory
+    :return: The path to the file
     """
     V4_SOURCE_DATA_DIR: Final = Path().cwd() / "source_data"
 
-    target_file: Path = Path.joinpath(V4_SOURCE_DATA_DIR, fname)
-    target_data: list[AIRTABLE_JSON] = []
+    return Path.joinpath(Path(source_dir or V4_SOURCE_DATA_DIR), fname)
+
+
+def stream_from_file(
+    fname: str,
+    key_collector: Optional[dict[str, None]] = None,
+    source_dir: Optional[Path] = None,
+) -> Iterator[AIRTABLE_JSON]:
+    """
+    Stream records one at a time from a json file representing the contents of an Airtable table.
+
+    :param fname: A string representing the name of the file to load
+    :param key_collector: An optional dictionary that collects every key seen in the records as they stream past
+    :param source_dir: Directory holding the source data, defaults to source_data in the working directory
+    :return: An iterator over dictionaries representing the json data
+    """
+    target_file = source_path(fname, source_dir)
 
     try:
-        with Path.open(target_file, "r") as fobject:
-            target_data = json.loads(fobject.read())
+        fobject = Path.open(target_file, "r")
     except FileNotFoundError as err:
         print(err)
+        return
+
+    with fobject:
+        for jsonObj in iter_json_array(fobject):
+            if key_collector is not None:
+                for k in jsonObj.keys():
+                    key_collector[k] = None
+            yield jsonObj
 
+
+def load_from_file(fname: str) -> Tuple[list[AIRTABLE_JSON], Tuple[str, ...]]:
+    """
+    Load data from a json file representing the contents of a table from an Airtable base to be migrated.
+
+    :param fname: A string representing the name of the file to load
+    :return: A list of dictionaries representing the json data
+    """
     # Grab all the keys actually used in records to check our mappings later
-    key_collector: DefaultDict[str, str] = defaultdict()
-    for jsonObj in target_data:
-        for k in jsonObj.keys():
-            key_collector[k] = ""
+    key_collector: dict[str, None] = {}
+    target_data: list[AIRTABLE_JSON] = list(stream_from_file(fname, key_collector))
 
     uniq_keys: Tuple[str, ...] = tuple(key_collector.keys())
 
@@ -207,30 +354,26 @@ def check_key_mappings(probe: Tuple[str, ...], mapping: dict[str, str]) -> None:
             )
 
 
-def validate_inputs(fname: str, fieldmap: dict[str, str]) -> Tuple[AnyRecord, ...]:
+validator_switch: dict[str, type] = {
+    "accessions": AccessionSourceRecord,
+    "files": FileSourceRecord,
+    "items": ItemSourceRecord,
+    "entities": EntitySourceRecord,
+    "subjects": SubjectSourceRecord,
+    "relationships": EntityRelationshipSourceRecord,
+}
+
+
+def select_validator(fname: str) -> type:
     """
-    Create instances of dataclass from input data loaded from json returned by Airtable API.
+    Pick the dataclass used to validate a source data file.
 
     :param fname: String representing the name of the input file to process
-    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
-    :return: A tuple of dataclass instances representing records
+    :return: The source record dataclass for that table
     """
-    raw_json, extant_keys = load_from_file(fname)
-    validated_inputs: Tuple[AnyRecord, ...] = ()
-
-    validator_switch = {
-        "accessions": AccessionSourceRecord,
-        "files": FileSourceRecord,
-        "items": ItemSourceRecord,
-        "entities": EntitySourceRecord,
-        "items": ItemSourceRecord,
-        "subjects": SubjectSourceRecord,
-        "relationships": EntityRelationshipSourceRecord,
-    }
-
     # Matching on the names of the source data files to be processed so we need a check
     try:
-        validator = validator_switch[fname.split(".")[0].lower().strip()]
+        return validator_switch[fname.split(".")[0].lower().strip()]
     except KeyError as err:
         print(
             "Unexpected input type: {}. Are you running against correct source data?".format(
@@ -239,49 +382,769 @@ def validate_inputs(fname: str, fieldmap: dict[str, str]) -> Tuple[AnyRecord, ..
         )
         raise
 
-    try:
-        check_key_mappings(extant_keys, fieldmap)
-    except RuntimeError as err:
-        print("Warning — {}. Key: {}".format(err.args[0], err.args[1]))
-        raise
 
-    for rec in raw_json:
+def error_hint(cls_name: str, rec: dict[str, Any]) -> str:
+    """
+    Build a human readable hint about which record failed to load.
+
+    :param cls_name: Name of the dataclass the record was being validated against
+    :param rec: The renamed record that failed
+    :return: A short description of the record
+    """
+    # A missing required field is the usual cause of a TypeError so don't assume keys are there
+    hint: str = ""
+    if cls_name == "AccessionSourceRecord":
+        hint = "— (Donor) {}".format(rec.get("donor_name", ""))
+    if cls_name == "FileSourceRecord":
+        hint = "— (File) {}".format(rec.get("idno", ""))
+    if cls_name == "ItemSourceRecord":
+        hint = "— (Item) {}".format(rec.get("idno", ""))
+    if cls_name == "EntitySourceRecord":
+        hint = "— (Entity) {}".format(rec.get("name", ""))
+    if cls_name == "SubjectSourceRecord":
+        hint = "— (Subject) {}".format(rec.get("name", ""))
+    if cls_name == "EntityRelationshipSourceRecord":
+        hint = "— (Relationship) {}{}".format(
+            rec.get("entity_1", ""), rec.get("name", "")
+        )
+    else:
+        pass
+    return hint
+
+
+@dataclasses.dataclass
+class ValidationFailure:
+    """A source record that could not be turned into a dataclass instance."""
+
+    airtable_idno: str
+    hint: str
+    error_type: str
+    message: str
+
+    def __str__(self) -> str:
+        """Format the failure the way validation errors have always been printed."""
+        if self.error_type == "ValidationError":
+            return self.message
+        return "Error loading record {} {}: {}".format(
+            self.airtable_idno, self.hint, self.message
+        )
+
+
+@dataclasses.dataclass
+class ValidationReport:
+    """The outcome of validating one table of source data."""
+
+    table: str
+    records: list[Any] = field(default_factory=list)
+    failures: list[ValidationFailure] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def records_per_second(self) -> float:
+        """Throughput over valid and failed records alike."""
+        total = len(self.records) + len(self.failures)
+        return total / self.elapsed if self.elapsed else 0.0
+
+
+RecordTransformer = Callable[[AIRTABLE_JSON], Union[AnyRecord, ValidationFailure]]
+
+
+def compile_renamer(
+    fieldmap: dict[str, str],
+) -> Callable[[AIRTABLE_JSON], dict[str, Any]]:
+    """
+    Build the function that turns a raw Airtable record into dataclass init keywords.
+
+    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+    :return: A function renaming keys, dropping unmapped ones and unwrapping singletons in one pass
+    """
+    lookup = dict(fieldmap).get
+
+    def rename(raw: AIRTABLE_JSON) -> dict[str, Any]:
         # Rename keys we get from Airtable to match what dataclass init expects
-        rec = {fieldmap[name]: val for name, val in rec.items() if name in fieldmap}
+        # and unwrap singletons in the same pass
+        rec: dict[str, Any] = {}
+        for name, val in raw.items():
+            target = lookup(name)
+            if target is None:
+                continue
+            if isinstance(val, list) and len(val) == 1:
+                val = val[0]
+            rec[target] = val
+        return rec
 
-        # Unwrap singletons
-        for k in rec.keys():
-            if isinstance(rec[k], list):
-                if len(rec[k]) == 1:  # type: ignore[arg-type]
-                    rec[k] = rec[k][0]  # type: ignore[index]
-            else:
-                pass
+    return rename
+
+
+def compile_transformer(
+    validator: type,
+    fieldmap: dict[str, str],
+    instrumentation: Optional[Instrumentation] = None,
+) -> RecordTransformer:
+    """
+    Fold key renaming, singleton unwrapping and dataclass validation into one callable.
+
+    :param validator: The source record dataclass to build
+    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+    :param instrumentation: Optional Instrumentation to time rename and validation stages with
+    :return: A function taking a raw Airtable record and returning either a dataclass instance or a ValidationFailure
+    """
+    rename = compile_renamer(fieldmap)
+    cls_name = validator.__name__
 
+    def build(rec: dict[str, Any]) -> Union[AnyRecord, ValidationFailure]:
         try:
-            valid_input_record: AirtableSourceRecord = validator(**rec)  # type: ignore[call-arg]
-            validated_inputs += (valid_input_record,)
+            return validator(**rec)
         except ValidationError as err:
-            print(err)
+            return ValidationFailure(
+                str(rec.get("airtable_idno", "")), "", "ValidationError", str(err)
+            )
         except TypeError as e:
-            hint: str = ""
-            cls_name = validator.__name__
-            if cls_name == "AccessionSourceRecord":
-                hint = "— (Donor) {}".format(rec["donor_name"])
-            if cls_name == "FileSourceRecord":
-                hint = "— (File) {}".format(rec["idno"])
-            if cls_name == "ItemSourceRecord":
-                hint = "— (Item) {}".format(rec["idno"])
-            if cls_name == "EntitySourceRecord":
-                hint = "— (Entity) {}".format(rec["name"])
-            if cls_name == "SubjectSourceRecord":
-                hint = "— (Subject) {}".format(rec["name"])
-            if cls_name == "EntityRelationshipSourceRecord":
-                hint = "— (Relationship) {}{}".format(rec["entity_1"], rec["name"])
+            return ValidationFailure(
+                str(rec.get("airtable_idno", "")),
+                error_hint(cls_name, rec),
+                type(e).__name__,
+                str(e),
+            )
+
+    if instrumentation is None:
+
+        def transform(raw: AIRTABLE_JSON) -> Union[AnyRecord, ValidationFailure]:
+            return build(rename(raw))
+
+        return transform
+
+    inst = instrumentation
+
+    def instrumented(raw: AIRTABLE_JSON) -> Union[AnyRecord, ValidationFailure]:
+        airtable_idno = str(raw.get("airtable_id", ""))
+        token = active_instrumentation.set(inst)
+        try:
+            start = time.perf_counter()
+            rec = rename(raw)
+            renamed = time.perf_counter()
+            inst.record(RENAME, renamed - start, airtable_idno)
+
+            if inst.should_profile():
+                profile = cProfile.Profile()
+                profile.enable()
+                result = build(rec)
+                profile.disable()
+                elapsed = time.perf_counter() - renamed
+                inst.keep_profile(elapsed, airtable_idno, profile)
+            else:
+                result = build(rec)
+                elapsed = time.perf_counter() - renamed
+        finally:
+            active_instrumentation.reset(token)
+
+        inst.record(VALIDATE, elapsed, airtable_idno)
+        if type(result) is ValidationFailure:
+            inst.record_failure(result.error_type, airtable_idno)
+        return result
+
+    return instrumented
+
+
+def iter_transformed(
+    records: Iterable[AIRTABLE_JSON],
+    validator: type,
+    fieldmap: dict[str, str],
+    instrumentation: Optional[Instrumentation] = None,
+    table: str = "",
+    transformer: Optional[RecordTransformer] = None,
+) -> Iterator[Union[AnyRecord, ValidationFailure]]:
+    """
+    Run raw records through a compiled transformer, checking keys against the fieldmap as they are first seen.
+
+    :param records: An iterable of raw Airtable records
+    :param validator: The source record dataclass to build
+    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+    :param instrumentation: Optional Instrumentation to report load, key check, rename and validation stages to
+    :param table: Name of the table the records came from, for instrumentation
+    :param transformer: Use this instead of compiling one with compile_transformer
+    :return: An iterator of dataclass instances and ValidationFailures in input order
+    """
+    transform = transformer or compile_transformer(validator, fieldmap, instrumentation)
+    seen_keys: set[str] = set()
+
+    if instrumentation is not None:
+        instrumentation.table = table or validator.__name__
+        instrumentation.record_class = validator.__name__
+        records = instrumentation.timed_iter(LOAD, records)
+
+    for rec in records:
+        if not seen_keys.issuperset(rec.keys()):
+            start = time.perf_counter()
+            new_keys = tuple(k for k in rec.keys() if k not in seen_keys)
+            try:
+                check_key_mappings(new_keys, fieldmap)
+            except RuntimeError as err:
+                print("Warning — {}. Key: {}".format(err.args[0], err.args[1]))
+                raise
+            seen_keys.update(new_keys)
+            if instrumentation is not None:
+                instrumentation.record(KEY_CHECK, time.perf_counter() - start)
+
+        yield transform(rec)
+
+
+def validate_records(
+    records: Iterable[AIRTABLE_JSON],
+    validator: type,
+    fieldmap: dict[str, str],
+    table: str = "",
+    instrumentation: Optional[Instrumentation] = None,
+    transformer: Optional[RecordTransformer] = None,
+) -> ValidationReport:
+    """
+    Validate a batch of raw Airtable records in a single linear pass.
+
+    :param records: An iterable of raw Airtable records
+    :param validator: The source record dataclass to build
+    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+    :param table: Name of the table the records came from, for the report
+    :param instrumentation: Optional Instrumentation to collect per stage timings in
+    :param transformer: Use this instead of compiling one with compile_transformer
+    :return: A ValidationReport with valid records, failures and timing
+    """
+    report = ValidationReport(table=table or validator.__name__)
+    valid_append = report.records.append
+    failure_append = report.failures.append
+
+    start = time.perf_counter()
+    for result in iter_transformed(
+        records, validator, fieldmap, instrumentation, report.table, transformer
+    ):
+        if type(result) is ValidationFailure:
+            failure_append(result)
+        else:
+            valid_append(result)
+    report.elapsed = time.perf_counter() - start
+
+    return report
+
+
+# TRUSTED FAST CONSTRUCTION
+SCHEMA_FINGERPRINT_FILE: Final = "schema_fingerprints.json"
+DEFAULT_SAMPLE_RATE: Final = 0.01
+
+# (field name, value tag) pairs describing the shape of one renamed record
+RecordShape = frozenset[Tuple[str, str]]
+
+
+def value_tag(val: Any) -> str:
+    """
+    Name the json shape of a value, which is what decides how pydantic coerces it.
+
+    :param val: A value from a renamed record
+    :return: e.g. "str", "bool", "NoneType", "list[str]" or "list[]" for an empty list
+    """
+    if type(val) is list:
+        return "list[{}]".format(",".join(sorted({value_tag(v) for v in val})))
+    return type(val).__name__
+
+
+def record_shape(rec: dict[str, Any]) -> RecordShape:
+    """
+    Describe a renamed record by its fields and the shapes of their values.
+
+    :param rec: A record as returned by the renamer
+    :return: A frozenset of (field name, value tag) pairs
+    """
+    return frozenset((name, value_tag(val)) for name, val in rec.items())
+
+
+def same_value(a: Any, b: Any) -> bool:
+    """
+    Compare strictly: equal, with the same types all the way down, and dataclass attributes in the same order.
+
+    :param a: A value, usually a source record
+    :param b: Another value
+    :return: True if nothing downstream could tell them apart
+    """
+    if type(a) is not type(b):
+        return False
+    if type(a) is list or type(a) is tuple:
+        return len(a) == len(b) and all(map(same_value, a, b))
+    if type(a) is dict:
+        return list(a) == list(b) and all(same_value(a[k], b[k]) for k in a)
+    if dataclasses.is_dataclass(a):
+        return same_value(a.__dict__, b.__dict__)
+    return bool(a == b)
+
+
+def detach(val: Any) -> Any:
+    """Copy containers one level deep, the way pydantic hands back new lists and dicts."""
+    if type(val) is list:
+        return [dict(v) if type(v) is dict else v for v in val]
+    if type(val) is dict:
+        return dict(val)
+    return val
+
+
+def schema_fingerprint_path(directory: Optional[Union[str, Path]] = None) -> Path:
+    """
+    Where schema fingerprints are recorded.
+
+    :param directory: Defaults to .lakeland_cache in the working directory
+    :return: The path of the fingerprint file
+    """
+    return Path(directory or Path.cwd() / DEFAULT_CACHE_DIR) / SCHEMA_FINGERPRINT_FILE
+
+
+def fieldmap_digest(fieldmap: dict[str, str]) -> str:
+    """Hash a fieldmap, since fingerprints are recorded against renamed fields."""
+    return hashlib.sha256(
+        json.dumps(fieldmap, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+def load_schema_fingerprint(
+    validator: type, fieldmap: dict[str, str], path: Path
+) -> Optional[dict[str, list[str]]]:
+    """
+    Look up the recorded schema fingerprint for a validator.
+
+    :param validator: The source record dataclass
+    :param fieldmap: The fieldmap records are renamed with
+    :param path: The fingerprint file
+    :return: Field names mapped to the value tags seen to build identically, or None if nothing current is recorded
+    """
+    try:
+        with open(path) as fobject:
+            recorded = json.load(fobject)
+    except (OSError, ValueError):
+        return None
+    entry = recorded.get(validator.__name__)
+    if (
+        entry is None
+        or entry.get("code") != code_fingerprint()
+        or entry.get("fieldmap") != fieldmap_digest(fieldmap)
+    ):
+        return None
+    return dict(entry["schema"])
+
+
+def store_schema_fingerprint(
+    validator: type,
+    fieldmap: dict[str, str],
+    schema: Optional[dict[str, list[str]]],
+    path: Path,
+) -> None:
+    """
+    Record, or with schema None forget, the schema fingerprint for a validator.
+
+    :param validator: The source record dataclass
+    :param fieldmap: The fieldmap records are renamed with
+    :param schema: Field names mapped to trusted value tags
+    :param path: The fingerprint file
+    :return: None
+    """
+    try:
+        with open(path) as fobject:
+            recorded = json.load(fobject)
+    except (OSError, ValueError):
+        recorded = {}
+    if schema is None:
+        recorded.pop(validator.__name__, None)
+    else:
+        recorded[validator.__name__] = {
+            "code": code_fingerprint(),
+            "fieldmap": fieldmap_digest(fieldmap),
+            "schema": schema,
+        }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as fobject:
+        json.dump(recorded, fobject, indent=1, sort_keys=True)
+    tmp.replace(path)
+
+
+def check_schema_fingerprint(
+    shape: RecordShape, schema: dict[str, frozenset[str]]
+) -> None:
+    """
+    Check that a record's values have shapes the recorded schema fingerprint vouches for.
+
+    Keys are checked against the fieldmap by check_key_mappings as usual, this goes on to their values.
+
+    :param shape: The record's shape, from record_shape
+    :param schema: Field names mapped to trusted value tags
+    :return: None
+    """
+    for name, tag in shape:
+        if tag not in schema.get(name, ()):
+            raise RuntimeError(
+                "A value shape in input data not found in schema fingerprint",
+                "{}: {}".format(name, tag),
+            )
+
+
+class TrustedBuilder:
+    """
+    Build source records without pydantic's field by field validation.
+
+    Records whose shape matches the schema fingerprint are assembled directly, the way pydantic would leave them, and their post init hook runs as usual. Everything else goes through compile_transformer.
+    """
+
+    def __init__(
+        self,
+        validator: type,
+        fieldmap: dict[str, str],
+        schema: dict[str, list[str]],
+        sample_rate: float = 0.0,
+        seed: Optional[int] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ) -> None:
+        """
+        Work out how to assemble instances of a validator.
+
+        :param validator: The source record dataclass to build
+        :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+        :param schema: Field names mapped to trusted value tags
+        :param sample_rate: Fraction of fast built records to validate in full as well and compare
+        :param seed: Seed for picking the sample
+        :param instrumentation: Optional Instrumentation for records validated in full
+        """
+        self.validator = validator
+        self.schema = {name: frozenset(tags) for name, tags in schema.items()}
+        self.sample_rate = sample_rate
+        self.random = random.Random(seed)
+        self.rename = compile_renamer(fieldmap)
+        self.full = compile_transformer(validator, fieldmap, instrumentation)
+
+        model_fields = validator.__pydantic_model__.__fields__  # type: ignore[attr-defined]
+        self.fields = [
+            (f.name, f.init, model_fields[f.name])
+            for f in dataclasses.fields(validator)
+        ]
+        self.initvars = [
+            (name, f.default)
+            for name, f in validator.__dataclass_fields__.items()  # type: ignore[attr-defined]
+            if isinstance(f.type, InitVar)
+        ]
+        self.required = frozenset(
+            name
+            for name, f in validator.__dataclass_fields__.items()  # type: ignore[attr-defined]
+            if f.init
+            and f.default is dataclasses.MISSING
+            and f.default_factory is dataclasses.MISSING
+        )
+        # Passing one of these to the dataclass init is a TypeError
+        self.not_init = frozenset(
+            f.name for f in dataclasses.fields(validator) if not f.init
+        )
+        self.post_init = getattr(validator, "__post_init_post_parse__", None)
+
+        self.fast = 0
+        self.fallbacks = 0
+        self.sampled = 0
+        self.mismatches: list[str] = []
+
+    def complete(self, rec: dict[str, Any]) -> bool:
+        """Whether a renamed record has what the dataclass init needs and nothing it would refuse."""
+        return self.required.issubset(rec) and self.not_init.isdisjoint(rec)
+
+    def kept(self, result: Any, rec: dict[str, Any]) -> bool:
+        """Whether validation left every value of a renamed record exactly as it came in, so construct would give the same instance."""
+        return all(
+            same_value(getattr(result, name), rec[name])
+            for name, init, _ in self.fields
+            if init and name in rec
+        )
+
+    def distrust(self) -> None:
+        """Stop trusting the schema fingerprint, so every record from here on is validated in full."""
+        self.schema = {}
+        self.sample_rate = 0.0
+
+    def construct(self, rec: dict[str, Any]) -> Any:
+        """
+        Assemble an instance straight from a renamed record.
+
+        :param rec: A complete record as returned by the renamer
+        :return: An instance laid out exactly as pydantic lays out a validated one
+        """
+        obj = object.__new__(self.validator)
+        values = obj.__dict__
+        for name, init, model_field in self.fields:
+            if init and name in rec:
+                values[name] = detach(rec[name])
             else:
-                pass
+                values[name] = model_field.get_default()
+        values["__pydantic_initialised__"] = True
+        if self.post_init is not None:
+            self.post_init(
+                obj, **{name: rec.get(name, default) for name, default in self.initvars}
+            )
+        return obj
+
+    def __call__(self, raw: AIRTABLE_JSON) -> Union[AnyRecord, ValidationFailure]:
+        """Build one record, fast if its shape is trusted."""
+        rec = self.rename(raw)
+        try:
+            check_schema_fingerprint(record_shape(rec), self.schema)
+        except RuntimeError:
+            self.fallbacks += 1
+            return self.full(raw)
+        if not self.complete(rec):
+            self.fallbacks += 1
+            return self.full(raw)
+        try:
+            result = self.construct(rec)
+        except (TypeError, ValueError):
+            # Let the full path turn it into a ValidationFailure
+            self.fallbacks += 1
+            return self.full(raw)
+        self.fast += 1
+
+        if self.sample_rate and self.random.random() < self.sample_rate:
+            self.sampled += 1
+            validated = self.full(raw)
+            if not same_value(result, validated):
+                self.mismatches.append(str(rec.get("airtable_idno", "")))
+                self.distrust()
+                return validated
+        return result
+
+
+class SchemaRecorder:
+    """
+    Validate records in full while working out which shapes a TrustedBuilder can be trusted with.
+
+    A shape is trusted once a record with it validates with every value left as it came in, which is what the fast build would give. Shapes only ever seen on records that failed or were changed by validation stay untrusted.
+    """
+
+    def __init__(self, builder: TrustedBuilder) -> None:
+        """
+        Record against a builder that hasn't been given a schema yet.
+
+        :param builder: A TrustedBuilder, normally with an empty schema
+        """
+        self.builder = builder
+        self.trusted: set[Tuple[str, str]] = set()
+        self.rejected: list[RecordShape] = []
+
+    def __call__(self, raw: AIRTABLE_JSON) -> Union[AnyRecord, ValidationFailure]:
+        """Validate one record in full and note whether its shape came through unchanged."""
+        builder = self.builder
+        result = builder.full(raw)
+        rec = builder.rename(raw)
+        if not builder.complete(rec):
+            # These always go the slow way, so they can't teach us anything
+            return result
+        shape = record_shape(rec)
+        if type(result) is ValidationFailure or not builder.kept(result, rec):
+            self.rejected.append(shape)
+        else:
+            self.trusted.update(shape)
+        return result
+
+    def schema(self) -> Optional[dict[str, list[str]]]:
+        """
+        Put together the schema fingerprint learned so far.
+
+        :return: Field names mapped to trusted value tags, or None if some rejected record has no untrusted value to tell it apart
+        """
+        for shape in self.rejected:
+            if shape.issubset(self.trusted):
+                return None
+        schema: dict[str, list[str]] = {}
+        for name, tag in sorted(self.trusted):
+            schema.setdefault(name, []).append(tag)
+        return schema
+
+
+def validate_trusted(
+    records: Iterable[AIRTABLE_JSON],
+    validator: type,
+    fieldmap: dict[str, str],
+    table: str = "",
+    instrumentation: Optional[Instrumentation] = None,
+    sample_rate: float = DEFAULT_SAMPLE_RATE,
+    schema_file: Optional[Path] = None,
+    reopen: Optional[Callable[[], Iterable[AIRTABLE_JSON]]] = None,
+) -> ValidationReport:
+    """
+    Validate a batch of raw Airtable records, skipping per field validation for records shaped like ones that validated before.
+
+    Records are streamed, never held all at once. Without a current schema fingerprint the batch is validated in full and a fingerprint is recorded from that pass for next time. With one, records it vouches for are built directly and the rest validated in full. If any sampled record comes out differently the fingerprint is dropped, the rest of the batch is validated in full, and the whole batch again from reopen if given.
+
+    :param records: An iterable of raw Airtable records
+    :param validator: The source record dataclass to build
+    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+    :param table: Name of the table the records came from, for the report
+    :param instrumentation: Optional Instrumentation; fast built records skip the rename and validation stages
+    :param sample_rate: Fraction of fast built records to validate in full as well, 0 to trust them all
+    :param schema_file: Where fingerprints are recorded, defaults to schema_fingerprints.json in .lakeland_cache
+    :param reopen: Optional callable giving the same records again, to validate them all in full after a mismatch
+    :return: A ValidationReport with the same records validate_records would give, unless a mismatch turned up without reopen to fall back on
+    """
+    path = schema_file or schema_fingerprint_path()
+    name = table or validator.__name__
+    schema = load_schema_fingerprint(validator, fieldmap, path)
+
+    if schema is None:
+        print("No schema fingerprint for {}, validating in full".format(name))
+        recorder = SchemaRecorder(
+            TrustedBuilder(validator, fieldmap, {}, instrumentation=instrumentation)
+        )
+        report = validate_records(
+            records, validator, fieldmap, table, instrumentation, recorder
+        )
+        learned = recorder.schema()
+        if learned is None:
             print(
-                "Error loading record {} {}: {}".format(rec["airtable_idno"], hint, e)
+                "Warning — couldn't tell failing records in {} apart by shape, not recording a schema fingerprint".format(
+                    name
+                )
+            )
+        else:
+            store_schema_fingerprint(validator, fieldmap, learned, path)
+        return report
+
+    builder = TrustedBuilder(
+        validator, fieldmap, schema, sample_rate, instrumentation=instrumentation
+    )
+    report = validate_records(
+        records, validator, fieldmap, table, instrumentation, builder
+    )
+    if builder.mismatches:
+        print(
+            "Warning — {} of {} sampled records in {} came out differently without validation (e.g. {}), validating in full".format(
+                len(builder.mismatches), builder.sampled, name, builder.mismatches[0]
+            )
+        )
+        store_schema_fingerprint(validator, fieldmap, None, path)
+        if reopen is not None:
+            return validate_records(
+                reopen(), validator, fieldmap, table, instrumentation
             )
-            pass
+        print(
+            "Warning — records in {} built before the mismatch were only sampled".format(
+                name
+            )
+        )
+    elif builder.fallbacks:
+        print(
+            "{} of {} records in {} didn't match the schema fingerprint and were validated in full".format(
+                builder.fallbacks, builder.fast + builder.fallbacks, name
+            )
+        )
+    return report
+
+
+def validate_table(
+    fname: str,
+    fieldmap: dict[str, str],
+    source_dir: Optional[Path] = None,
+    instrumentation: Optional[Instrumentation] = None,
+    cache: Optional[SnapshotCache] = None,
+    trusted: bool = False,
+) -> ValidationReport:
+    """
+    Validate a source data file and report on the results instead of printing them.
+
+    :param fname: String representing the name of the input file to process
+    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+    :param source_dir: Directory holding the source data, defaults to source_data in the working directory
+    :param instrumentation: Optional Instrumentation to collect per stage timings in
+    :param cache: Optional SnapshotCache to reuse an earlier report from when nothing has changed
+    :param trusted: Skip per field validation for records matching the recorded schema fingerprint, see validate_trusted
+    :return: A ValidationReport with valid records, failures and timing
+    """
+    validator = select_validator(fname)
+
+    key = ""
+    if cache is not None:
+        target_file = source_path(fname, source_dir)
+        if target_file.is_file():
+            key = cache.key(target_file, fieldmap, validator.__name__)
+            cached = cache.load(key)
+            if cached is not None:
+                return cached
+
+    if trusted:
+        report = validate_trusted(
+            stream_from_file(fname, source_dir=source_dir),
+            validator,
+            fieldmap,
+            fname.split(".")[0],
+            instrumentation,
+            reopen=lambda: stream_from_file(fname, source_dir=source_dir),
+        )
+    else:
+        report = validate_records(
+            stream_from_file(fname, source_dir=source_dir),
+            validator,
+            fieldmap,
+            fname.split(".")[0],
+            instrumentation,
+        )
+
+    if cache is not None and key:
+        cache.store(key, report)
+    return report
+
+
+def iter_validated_inputs(
+    fname: str,
+    fieldmap: dict[str, str],
+    instrumentation: Optional[Instrumentation] = None,
+) -> Iterator[AnyRecord]:
+    """
+    Lazily create instances of dataclass from input data streamed from json returned by Airtable API.
+
+    Keys are checked against the fieldmap as they are first seen, so records come out before the whole file has been read.
+
+    :param fname: String representing the name of the input file to process
+    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+    :param instrumentation: Optional Instrumentation to collect per stage timings in
+    :return: An iterator of dataclass instances representing records
+    """
+    validator = select_validator(fname)
+
+    for result in iter_transformed(
+        stream_from_file(fname),
+        validator,
+        fieldmap,
+        instrumentation,
+        fname.split(".")[0],
+    ):
+        if type(result) is ValidationFailure:
+            print(result)
+        else:
+            yield result
+
+
+def validate_inputs(
+    fname: str,
+    fieldmap: dict[str, str],
+    instrumentation: Optional[Instrumentation] = None,
+    cache: Optional[SnapshotCache] = None,
+    trusted: bool = False,
+) -> Tuple[AnyRecord, ...]:
+    """
+    Create instances of dataclass from input data loaded from json returned by Airtable API.
+
+    :param fname: String representing the name of the input file to process
+    :param fieldmap: A dictionary mapping keys in API data to internal set of keys
+    :param instrumentation: Optional Instrumentation to collect per stage timings in
+    :param cache: Optional SnapshotCache; on a hit the records are loaded instead of validated
+    :param trusted: Opt in to building records that match the recorded schema fingerprint without per field validation; falls back to full validation when the fingerprint doesn't match
+    :return: A tuple of dataclass instances representing records
+    """
+    if cache is not None or trusted:
+        report = validate_table(
+            fname,
+            fieldmap,
+            instrumentation=instrumentation,
+            cache=cache,
+            trusted=trusted,
+        )
+        for failure in report.failures:
+            print(failure)
+        return tuple(report.records)
 
-    return validated_inputs
\ No newline at end of file
+    return tuple(iter_validated_inputs(fname, fieldmap, instrumentation))
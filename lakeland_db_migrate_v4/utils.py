@@ -1,8 +1,12 @@
-"""Helper function to deal with the mess of NAS paths."""
+"""Helper functions to deal with the mess of NAS paths and dates."""
+
+import calendar
 import re
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Final, Iterable, Optional
 
 root_mapping: dict[str, str] = {
     "Assorted Jump Drives": "Projects/lakeland-digital-archive/object files/LCHP Accession 2021",
@@ -23,6 +27,30 @@ ldt_path_regex = re.compile(r"[a-z0-9]{6}")
 ldt_nas_root = Path(
     "Projects/lakeland-digital-archive/object files/2019 Digitization Event/Digitized Images"
 )
+multiple_whitespace_regex = re.compile(r"[\s]{2,}")
+
+
+def split_segments(path: str) -> list[str]:
+    """Break a relative path into segments the way pathlib would, minus the Path objects."""
+    return [seg for seg in path.split("/") if seg and seg != "."]
+
+
+@lru_cache(maxsize=65536)
+def root_prefix(segment: str) -> Optional[str]:
+    """
+    Work out where on the NAS a path starting with this segment lives.
+
+    Results are memoized, so call root_prefix.cache_clear() after changing root_mapping.
+
+    :param segment: The first segment of a path from Airtable
+    :return: The prefix to put in front of the path ("" for none), or None if we can't place it
+    """
+    if segment in root_mapping:
+        return "/".join(split_segments(root_mapping[segment]))
+    elif ldt_path_regex.match(segment):
+        return ldt_nas_root.as_posix()
+    else:
+        return None
 
 
 def handle_paths(pathstrings: list[str]) -> list[str]:
@@ -31,7 +59,8 @@ def handle_paths(pathstrings: list[str]) -> list[str]:
     normed = []
 
     for p in pathstrings:
-        p = re.sub(r"[\s]{2,}", " ", p)
+        if "  " in p or not p.isprintable():
+            p = multiple_whitespace_regex.sub(" ", p)
         unquoted_p = p.strip('"')
         if unquoted_p.startswith("/"):
             deslashed.append(unquoted_p[1:])
@@ -39,17 +68,21 @@ def handle_paths(pathstrings: list[str]) -> list[str]:
             deslashed.append(unquoted_p)
 
     if deslashed != [""]:
-        pathobjs = [Path(p) for p in deslashed]
-        for po in pathobjs:
-            if po.parts[0] in root_mapping:
-                full_path = Path(root_mapping[po.parts[0]])
-                normed.append(full_path.joinpath(po))
-            elif ldt_path_regex.match(po.parts[0]):
-                normed.append(ldt_nas_root.joinpath(po))
-            else:
+        for d in deslashed:
+            if d.startswith("/"):
+                # Still absolute, so pathlib would have made the root its first part
+                continue
+            segments = split_segments(d)
+            # Like Path("").parts[0] this raises IndexError on an empty path
+            prefix = root_prefix(segments[0])
+            if prefix is None:
                 # 9 files have paths we can't do anything with
                 pass
-    return [n.as_posix() for n in normed]
+            elif prefix:
+                normed.append(prefix + "/" + "/".join(segments))
+            else:
+                normed.append("/".join(segments))
+    return normed
 
 
 def derive_date(datestring: str) -> Optional[datetime]:
@@ -61,4 +94,256 @@ def derive_date(datestring: str) -> Optional[datetime]:
         except ValueError as err:
             raise RuntimeError("Couldn't handle date: {}".format(err))
     else:
-        return None
\ No newline at end of file
+        return None
+
+
+DAY: Final = "day"
+MONTH: Final = "month"
+YEAR: Final = "year"
+DECADE: Final = "decade"
+UNPARSED: Final = "unparsed"
+# Coarsest last, so a range takes the precision of its vaguer end
+PRECISIONS: Final = (DAY, MONTH, YEAR, DECADE, UNPARSED)
+DATE_CACHE_SIZE: Final = 16384
+
+MONTH_NAMES: Final[dict[str, int]] = {
+    name.lower(): i for i, name in enumerate(calendar.month_name) if name
+}
+MONTH_NAMES.update(
+    {name.lower(): i for i, name in enumerate(calendar.month_abbr) if name}
+)
+MONTH_NAMES["sept"] = 9
+
+approximate_regex = re.compile(
+    r"^(?:circa|ca\.?|c\.|c(?=\d)|approx\.?|approximately|about|~)\s*|\s*\?$|~$",
+    re.IGNORECASE,
+)
+range_regex = re.compile(
+    r"^(?:between\s+)?(.+?)\s*(?:\s-\s|–|—|/|\bto\b|\band\b|(?:(?<=\d{4})|(?<=\d{3}0s))-(?=\d{4}s?$))\s*(.+)$",
+    re.IGNORECASE,
+)
+year_regex = re.compile(r"^(\d{4})$")
+decade_regex = re.compile(r"^(\d{3})0'?s$")
+year_month_regex = re.compile(r"^(\d{4})-(\d{1,2})$")
+us_date_regex = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+month_year_regex = re.compile(r"^([a-z]+)\.?,?\s+(\d{4})$", re.IGNORECASE)
+month_day_year_regex = re.compile(
+    r"^([a-z]+)\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})$", re.IGNORECASE
+)
+day_month_year_regex = re.compile(
+    r"^(\d{1,2})(?:st|nd|rd|th)?\s+([a-z]+)\.?,?\s+(\d{4})$", re.IGNORECASE
+)
+
+
+@dataclass(frozen=True)
+class NormalizedDate:
+    """
+    A date from Airtable, as precise as the source allowed.
+
+    start and end bound the period the string could mean, so "1968" runs from 1968-01-01 to 1968-12-31. A range takes the precision of its vaguer end.
+    """
+
+    raw: str
+    precision: str
+    start: Optional[date] = None
+    end: Optional[date] = None
+    approximate: bool = False
+    is_range: bool = False
+    start_precision: str = ""
+    end_precision: str = ""
+
+    @property
+    def parsed(self) -> bool:
+        """Whether we understood the string at all."""
+        return self.precision != UNPARSED
+
+    @property
+    def year(self) -> str:
+        """The year the period starts in, or an empty string."""
+        return "{:04d}".format(self.start.year) if self.start else ""
+
+    @property
+    def edtf(self) -> str:
+        """
+        The date in Extended Date/Time Format, e.g. 1968-05-02, 1968-05, 196X, 1950/1955 or 1950~.
+
+        Unparsed dates come back as they were received.
+        """
+        if not self.parsed or self.start is None or self.end is None:
+            return self.raw
+        mark = "~" if self.approximate else ""
+        if self.is_range:
+            return "{}{}/{}{}".format(
+                format_period(self.start, self.start_precision or self.precision),
+                mark,
+                format_period(self.end, self.end_precision or self.precision),
+                mark,
+            )
+        return format_period(self.start, self.precision) + mark
+
+
+def format_period(d: date, precision: str) -> str:
+    """Format one end of a period at a given precision."""
+    if precision == DAY:
+        return d.isoformat()
+    if precision == MONTH:
+        return "{:04d}-{:02d}".format(d.year, d.month)
+    if precision == DECADE:
+        return "{:03d}X".format(d.year // 10)
+    return "{:04d}".format(d.year)
+
+
+def month_period(year: int, month: int) -> tuple[date, date]:
+    """The first and last day of a month."""
+    return (
+        date(year, month, 1),
+        date(year, month, calendar.monthrange(year, month)[1]),
+    )
+
+
+def parse_single(text: str) -> Optional[tuple[str, date, date]]:
+    """
+    Parse one date that isn't a range.
+
+    :param text: A stripped date string
+    :return: A tuple of (precision, start, end), or None
+    """
+    m = year_regex.match(text)
+    if m:
+        year = int(m.group(1))
+        try:
+            return (YEAR, date(year, 1, 1), date(year, 12, 31))
+        except ValueError:
+            # Year 0
+            return None
+
+    m = decade_regex.match(text)
+    if m:
+        decade = int(m.group(1)) * 10
+        try:
+            return (DECADE, date(decade, 1, 1), date(decade + 9, 12, 31))
+        except ValueError:
+            return None
+
+    m = year_month_regex.match(text)
+    if m:
+        year, month = int(m.group(1)), int(m.group(2))
+        try:
+            return (MONTH,) + month_period(year, month)
+        except ValueError:
+            return None
+
+    m = us_date_regex.match(text)
+    if m:
+        try:
+            d = date(int(m.group(3)), int(m.group(1)), int(m.group(2)))
+        except ValueError:
+            return None
+        return (DAY, d, d)
+
+    m = month_year_regex.match(text)
+    if m and m.group(1).lower() in MONTH_NAMES:
+        try:
+            return (MONTH,) + month_period(
+                int(m.group(2)), MONTH_NAMES[m.group(1).lower()]
+            )
+        except ValueError:
+            return None
+
+    for regex, month_group, day_group in (
+        (month_day_year_regex, 1, 2),
+        (day_month_year_regex, 2, 1),
+    ):
+        m = regex.match(text)
+        if m and m.group(month_group).lower() in MONTH_NAMES:
+            try:
+                d = date(
+                    int(m.group(3)),
+                    MONTH_NAMES[m.group(month_group).lower()],
+                    int(m.group(day_group)),
+                )
+            except ValueError:
+                return None
+            return (DAY, d, d)
+
+    try:
+        # Python before 3.11 doesn't accept a trailing Z
+        dt = datetime.fromisoformat(
+            text[:-1] + "+00:00" if text.endswith("Z") else text
+        )
+    except ValueError:
+        return None
+    return (DAY, dt.date(), dt.date())
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def normalize_date(datestring: str) -> Optional[NormalizedDate]:
+    """
+    Make sense of the partial and fuzzy dates found in the archive.
+
+    Handles full ISO dates and datetimes, years, year-months, decades, US style and written out dates, "circa"/"c."/"?" qualifiers and ranges. Repeated strings are answered from a bounded cache.
+
+    :param datestring: The string we receive from Airtable
+    :return: A NormalizedDate, with precision "unparsed" if nothing matched, or None for an empty string
+    """
+    text = " ".join(datestring.split())
+    if text == "":
+        return None
+
+    stripped = approximate_regex.sub("", text).strip()
+    approximate = stripped != text
+
+    single = parse_single(stripped)
+    if single is not None:
+        precision, start, end = single
+        return NormalizedDate(datestring, precision, start, end, approximate)
+
+    m = range_regex.match(stripped)
+    if m:
+        first = parse_single(approximate_regex.sub("", m.group(1)).strip())
+        last = parse_single(approximate_regex.sub("", m.group(2)).strip())
+        if first is not None and last is not None and first[1] <= last[2]:
+            precision = max(first[0], last[0], key=PRECISIONS.index)
+            return NormalizedDate(
+                datestring,
+                precision,
+                first[1],
+                last[2],
+                approximate,
+                is_range=True,
+                start_precision=first[0],
+                end_precision=last[0],
+            )
+
+    return NormalizedDate(datestring, UNPARSED)
+
+
+def normalize_dates(datestrings: Iterable[str]) -> list[Optional[NormalizedDate]]:
+    """
+    Normalize a whole column of dates, parsing each distinct string once.
+
+    :param datestrings: Date strings, e.g. every created_date in the Items table
+    :return: A NormalizedDate (or None for empty strings) per input, in order
+    """
+    seen: dict[str, Optional[NormalizedDate]] = {}
+    out = []
+    for datestring in datestrings:
+        try:
+            out.append(seen[datestring])
+        except KeyError:
+            result = seen[datestring] = normalize_date(datestring)
+            out.append(result)
+    return out
+
+
+def normalized_or_raw(datestring: str) -> str:
+    """
+    Normalize a date for a destination record, keeping the original if we can't make sense of it.
+
+    :param datestring: The string we receive from Airtable
+    :return: An EDTF string, the raw string, or an empty string
+    """
+    result = normalize_date(datestring)
+    if result is None:
+        return ""
+    return result.edtf
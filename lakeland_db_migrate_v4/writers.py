@@ -0,0 +1,406 @@
+"""Stream v4 destination records out to NDJSON, CSV or SQLite."""
+
+import csv
+import dataclasses
+import json
+import sqlite3
+import time
+from itertools import chain, islice
+from pathlib import Path
+from typing import Any, Final, Iterable, Iterator, Optional, Union
+from .destinations import (
+    DonationGroupingRecord,
+    EntityRecord,
+    EntityRelationshipRecord,
+    FileRecord,
+    ItemRecord,
+    SubjectRecord,
+)
+from .joins import MigratedRecords
+
+DEFAULT_BATCH_SIZE: Final = 5000
+
+TABLE_NAMES: Final[dict[str, str]] = {
+    "DonationGroupingRecord": "donation_groupings",
+    "FileRecord": "files",
+    "ItemRecord": "items",
+    "EntityRecord": "entities",
+    "SubjectRecord": "subjects",
+    "EntityRelationshipRecord": "relationships",
+}
+
+AnyDestinationRecord = Union[
+    DonationGroupingRecord,
+    FileRecord,
+    ItemRecord,
+    EntityRecord,
+    SubjectRecord,
+    EntityRelationshipRecord,
+]
+
+
+@dataclasses.dataclass
+class WriteStats:
+    """How much a writer wrote and how fast."""
+
+    rows: int = 0
+    links: int = 0
+    elapsed: float = 0.0
+    tables: dict[str, int] = dataclasses.field(default_factory=dict)
+
+    @property
+    def rows_per_second(self) -> float:
+        """Records written per second."""
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def batched(records: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """
+    Group a stream into lists of at most size items.
+
+    :param records: Any iterable
+    :param size: Maximum batch size
+    :return: An iterator over lists
+    """
+    it = iter(records)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_migrated(migrated: MigratedRecords) -> Iterator[AnyDestinationRecord]:
+    """
+    Chain every destination record in a MigratedRecords together.
+
+    :param migrated: Output of JoinIndex.build
+    :return: An iterator over destination records
+    """
+    return chain(
+        migrated.entities,
+        migrated.subjects,
+        migrated.donation_groupings,
+        migrated.items,
+        migrated.files,
+        migrated.relationships,
+    )
+
+
+def link_value(value: Any) -> Any:
+    """
+    Replace linked destination records with their idno.
+
+    Items link to shared entity and subject records, which would otherwise be written out again for every item.
+
+    :param value: A field value
+    :return: The value with any records swapped for idnos
+    """
+    if isinstance(value, list):
+        return [v.idno if dataclasses.is_dataclass(v) else v for v in value]
+    return value
+
+
+def flatten(record: AnyDestinationRecord) -> dict[str, Any]:
+    """
+    Turn a destination record into json-friendly data.
+
+    :param record: A destination dataclass instance
+    :return: A dictionary of field name to value with links as idnos
+    """
+    return {
+        f.name: link_value(getattr(record, f.name)) for f in dataclasses.fields(record)
+    }
+
+
+def link_fields(record_class: type) -> list[str]:
+    """
+    Find the fields that hold lists of links to other records.
+
+    :param record_class: A destination dataclass
+    :return: Field names
+    """
+    return [
+        f.name for f in dataclasses.fields(record_class) if f.name.startswith("linked_")
+    ]
+
+
+def write_ndjson(
+    records: Iterable[AnyDestinationRecord],
+    path: Union[str, Path],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> WriteStats:
+    """
+    Write records as newline delimited json, one record per line.
+
+    Each line gets a record_type so different kinds of record can share a file.
+
+    :param records: Destination records, e.g. a generator
+    :param path: Output file
+    :param batch_size: Records serialized per write
+    :return: WriteStats
+    """
+    stats = WriteStats()
+    start = time.perf_counter()
+    with open(path, "w") as fobject:
+        for batch in batched(records, batch_size):
+            lines = []
+            for rec in batch:
+                row = flatten(rec)
+                row["record_type"] = type(rec).__name__
+                lines.append(json.dumps(row, ensure_ascii=False))
+                table = TABLE_NAMES[type(rec).__name__]
+                stats.tables[table] = stats.tables.get(table, 0) + 1
+            fobject.write("\n".join(lines))
+            fobject.write("\n")
+            stats.rows += len(batch)
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def csv_cell(value: Any) -> Any:
+    """Encode lists and dicts as json so they fit in one cell."""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def write_csv(
+    records: Iterable[AnyDestinationRecord],
+    path: Union[str, Path],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> WriteStats:
+    """
+    Write records of a single type as CSV with a header row.
+
+    Link lists and attachments are json-encoded within their cell.
+
+    :param records: Destination records of one class, e.g. a generator
+    :param path: Output file
+    :param batch_size: Records written per writerows call
+    :return: WriteStats
+    """
+    stats = WriteStats()
+    start = time.perf_counter()
+    record_class: Optional[type] = None
+
+    with open(path, "w", newline="") as fobject:
+        writer = csv.writer(fobject)
+        for batch in batched(records, batch_size):
+            if record_class is None:
+                record_class = type(batch[0])
+                writer.writerow([f.name for f in dataclasses.fields(record_class)])
+            rows = []
+            for rec in batch:
+                if type(rec) is not record_class:
+                    raise ValueError(
+                        "CSV output takes one record type, got {} after {}".format(
+                            type(rec).__name__, record_class.__name__
+                        )
+                    )
+                rows.append([csv_cell(v) for v in flatten(rec).values()])
+            writer.writerows(rows)
+            stats.rows += len(batch)
+
+    if record_class is not None:
+        stats.tables[TABLE_NAMES[record_class.__name__]] = stats.rows
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def sqlite_type(field_type: Any) -> str:
+    """Map a dataclass annotation to an SQLite column type."""
+    if field_type in (int, bool):
+        return "INTEGER"
+    return "TEXT"
+
+
+def sqlite_value(value: Any) -> Any:
+    """Encode a value for an SQLite column."""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class SQLiteTable:
+    """Statements for one destination record class and its link tables."""
+
+    def __init__(self, conn: sqlite3.Connection, record_class: type) -> None:
+        """
+        Create the table and its join tables.
+
+        :param conn: An open connection
+        :param record_class: A destination dataclass
+        """
+        self.name = TABLE_NAMES[record_class.__name__]
+        self.links = link_fields(record_class)
+        self.columns = [
+            f for f in dataclasses.fields(record_class) if f.name not in self.links
+        ]
+
+        column_defs = ", ".join(
+            "{} {}{}".format(
+                f.name, sqlite_type(f.type), " PRIMARY KEY" if f.name == "idno" else ""
+            )
+            for f in self.columns
+        )
+        conn.execute("CREATE TABLE {} ({})".format(self.name, column_defs))
+        self.insert = "INSERT INTO {} VALUES ({})".format(
+            self.name, ", ".join("?" for _ in self.columns)
+        )
+
+        self.link_tables = {}
+        for field_name in self.links:
+            link_table = "{}_{}".format(self.name, field_name)
+            conn.execute(
+                "CREATE TABLE {} (idno TEXT NOT NULL, position INTEGER NOT NULL,"
+                " linked_idno TEXT NOT NULL, PRIMARY KEY (idno, position))".format(
+                    link_table
+                )
+            )
+            self.link_tables[field_name] = link_table
+
+    def write(self, conn: sqlite3.Connection, batch: list[Any]) -> int:
+        """
+        Insert a batch of records and their links.
+
+        :param conn: An open connection inside a transaction
+        :param batch: Records of this table's class
+        :return: Number of link rows written
+        """
+        conn.executemany(
+            self.insert,
+            (
+                [sqlite_value(getattr(rec, f.name)) for f in self.columns]
+                for rec in batch
+            ),
+        )
+        links = 0
+        for field_name, link_table in self.link_tables.items():
+            rows = [
+                (rec.idno, position, linked)
+                for rec in batch
+                for position, linked in enumerate(link_value(getattr(rec, field_name)))
+            ]
+            conn.executemany("INSERT INTO {} VALUES (?, ?, ?)".format(link_table), rows)
+            links += len(rows)
+        return links
+
+    def first_duplicate(self, conn: sqlite3.Connection, batch: list[Any]) -> str:
+        """
+        Find the record an insert stopped at because its idno was already taken.
+
+        :param conn: The connection, after the failed batch was rolled back
+        :param batch: The batch of this table's records that failed
+        :return: The duplicated idno
+        """
+        seen = set()
+        query = "SELECT 1 FROM {} WHERE idno = ?".format(self.name)
+        for rec in batch:
+            if rec.idno in seen or conn.execute(query, (rec.idno,)).fetchone():
+                return str(rec.idno)
+            seen.add(rec.idno)
+        return ""
+
+
+def write_sqlite(
+    records: Iterable[AnyDestinationRecord],
+    path: Union[str, Path],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> WriteStats:
+    """
+    Write records of any mix of types to an SQLite database.
+
+    Each record class gets a table keyed on idno, and each linked_* list gets a join table of (idno, position, linked_idno). Records are inserted with executemany, one transaction per batch, and two records of the same class with one idno raise a RuntimeError. Like the other writers this replaces whatever was at path: the database is built next to it and only moved into place once every record is in.
+
+    :param records: Destination records, e.g. a generator
+    :param path: Database file
+    :param batch_size: Records per transaction
+    :return: WriteStats
+    """
+    stats = WriteStats()
+    start = time.perf_counter()
+    target = Path(path)
+    tmp = target.with_suffix(".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(tmp))
+    tables: dict[type, SQLiteTable] = {}
+
+    try:
+        for batch in batched(records, batch_size):
+            by_class: dict[type, list[Any]] = {}
+            for rec in batch:
+                by_class.setdefault(type(rec), []).append(rec)
+
+            try:
+                with conn:
+                    for record_class, recs in by_class.items():
+                        table = tables.get(record_class)
+                        if table is None:
+                            table = tables[record_class] = SQLiteTable(
+                                conn, record_class
+                            )
+                        stats.links += table.write(conn, recs)
+                        stats.tables[table.name] = stats.tables.get(
+                            table.name, 0
+                        ) + len(recs)
+            except sqlite3.IntegrityError as err:
+                raise RuntimeError(
+                    "Duplicate idno in {}: {}".format(
+                        table.name, table.first_duplicate(conn, recs)
+                    )
+                ) from err
+            stats.rows += len(batch)
+    except BaseException:
+        conn.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    conn.close()
+    tmp.replace(target)
+
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+def write_migrated(
+    migrated: MigratedRecords, out_dir: Union[str, Path], output_format: str = "ndjson"
+) -> WriteStats:
+    """
+    Write everything JoinIndex.build produced.
+
+    NDJSON and CSV get one file per table; SQLite gets a single lakeland_v4.sqlite3.
+
+    :param migrated: Output of JoinIndex.build
+    :param out_dir: Directory to write into
+    :param output_format: One of ndjson, csv or sqlite
+    :return: Combined WriteStats
+    """
+    out_path = Path(out_dir)
+    out_path.mkdir(parents=True, exist_ok=True)
+
+    if output_format == "sqlite":
+        return write_sqlite(iter_migrated(migrated), out_path / "lakeland_v4.sqlite3")
+
+    writers = {"ndjson": write_ndjson, "csv": write_csv}
+    if output_format not in writers:
+        raise ValueError("Unknown output format: {}".format(output_format))
+
+    total = WriteStats()
+    for table in (
+        "entities",
+        "subjects",
+        "donation_groupings",
+        "items",
+        "files",
+        "relationships",
+    ):
+        records = getattr(migrated, table)
+        if not records:
+            continue
+        stats = writers[output_format](
+            records, out_path / "{}.{}".format(table, output_format)
+        )
+        total.rows += stats.rows
+        total.elapsed += stats.elapsed
+        total.tables.update(stats.tables)
+    return total
@@ -0,0 +1,45 @@
+"""Fixtures shared by the tests: a small synthetic export and the local Airtable stub."""
+
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from lakeland_db_migrate_v4.joins import MigratedRecords, build_destination_records
+from lakeland_db_migrate_v4.parallel import validate_all
+from lakeland_db_migrate_v4.sources import ValidationReport
+
+# The export generator and the stub server live with the benchmarks, which use them too
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+from airtable_stub import AirtableStub  # noqa: E402
+from synthetic import generate_export  # noqa: E402
+
+SOURCE_FILES = 300
+
+
+@pytest.fixture(scope="session")
+def source_dir(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    """An airtable-export directory with every table, a few pages of files long."""
+    out = tmp_path_factory.mktemp("source_data")
+    generate_export(out, SOURCE_FILES)
+    return out
+
+
+@pytest.fixture(scope="session")
+def reports(source_dir: Path) -> dict[str, ValidationReport]:
+    """Every table of source_dir, validated."""
+    return validate_all(source_dir, workers=1)
+
+
+@pytest.fixture(scope="session")
+def migrated(reports: dict[str, ValidationReport]) -> MigratedRecords:
+    """Destination records for source_dir."""
+    return build_destination_records(reports)
+
+
+@pytest.fixture
+def stub(source_dir: Path) -> Iterator[AirtableStub]:
+    """The stub serving source_dir."""
+    with AirtableStub.from_directory(source_dir) as running:
+        yield running
@@ -0,0 +1,125 @@
+"""Fetching from the Airtable API, against the local stub."""
+
+import asyncio
+import queue
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pytest
+from airtable_stub import AirtableStub
+
+from lakeland_db_migrate_v4 import airtable
+from lakeland_db_migrate_v4.airtable import (
+    MAX_RETRIES,
+    AirtableClient,
+    TokenBucket,
+    fetch_all,
+    fetch_tables,
+    hand_over,
+)
+from lakeland_db_migrate_v4.parallel import validate_all
+
+
+def test_fetch_all_matches_validate_all(source_dir: Path, stub: AirtableStub) -> None:
+    """Fetching every table gives what validating the export on disk gives."""
+    expected = validate_all(source_dir, workers=1)
+    reports = fetch_all(stub.base_id, stub.token, api_url=stub.url)
+    assert set(reports) == set(expected)
+    for table, report in expected.items():
+        assert reports[table].records == report.records, table
+        assert reports[table].failures == report.failures, table
+
+
+def test_fetch_follows_pagination(source_dir: Path, stub: AirtableStub) -> None:
+    """Small pages are followed to the end of the table, in order."""
+    expected = validate_all(source_dir, workers=1, tables=["files"])["files"]
+    client = AirtableClient(stub.base_id, stub.token, stub.url, page_size=7)
+    reports = asyncio.run(fetch_tables(client, {"files": "files"}, rate=1000.0))
+    assert reports["files"].records == expected.records
+    assert stub.requests == -(-len(expected.records) // 7)
+
+
+def test_one_failing_table_raises_instead_of_hanging(stub: AirtableStub) -> None:
+    """A table that can't be fetched fails the whole fetch without leaving the others stuck."""
+    # In a subprocess, so a hang can be killed instead of holding up the test run at exit
+    code = (
+        "import sys\n"
+        "from lakeland_db_migrate_v4.airtable import fetch_all\n"
+        "try:\n"
+        "    fetch_all(sys.argv[1], sys.argv[2], {'files': 'files', 'items': 'nosuch'}, api_url=sys.argv[3])\n"
+        "except RuntimeError as err:\n"
+        "    print(err)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code, stub.base_id, stub.token, stub.url],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "Couldn't fetch nosuch: HTTP 404" in result.stdout
+
+
+def test_token_bucket_spaces_requests() -> None:
+    """Past the first token, requests go out no faster than the rate."""
+
+    async def take(bucket: TokenBucket, count: int) -> float:
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(count)))
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(take(TokenBucket(rate=50.0), 6))
+    assert elapsed >= 5 / 50.0 * 0.9
+
+
+class CountingBucket(TokenBucket):
+    """A rate limiter that counts the requests it lets through."""
+
+    acquired = 0
+
+    async def acquire(self) -> None:
+        self.acquired += 1
+        await super().acquire()
+
+
+def test_retries_wait_for_the_rate_limiter(
+    stub: AirtableStub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Every attempt at a rate limited page takes a token, not just the first."""
+    monkeypatch.setattr(airtable, "RATE_LIMIT_PENALTY", 0.0)
+    stub.rate_limit = 0
+    client = AirtableClient(stub.base_id, stub.token, stub.url)
+    bucket = CountingBucket(rate=1000.0)
+
+    async def fetch() -> None:
+        conn = client.connect()
+        try:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                await client.get_page(conn, "files", "", bucket, executor)
+        finally:
+            conn.close()
+
+    with pytest.raises(RuntimeError, match="Couldn't fetch files: HTTP 429"):
+        asyncio.run(fetch())
+    assert bucket.acquired == stub.requests == client.requests == MAX_RETRIES + 1
+
+
+def test_hand_over_gives_up_when_validation_stops() -> None:
+    """A full queue holds pages back until there's room, unless nothing will ever make room."""
+    pages: "queue.Queue[Any]" = queue.Queue(1)
+
+    async def run() -> tuple[bool, bool, bool]:
+        validation = asyncio.get_running_loop().create_future()
+        first = await hand_over(pages, [], validation)
+        asyncio.get_running_loop().call_later(0.05, pages.get_nowait)
+        second = await hand_over(pages, [], validation)
+        validation.set_result(None)
+        third = await hand_over(pages, None, validation)
+        return (first, second, third)
+
+    assert asyncio.run(run()) == (True, True, False)
+    assert pages.qsize() == 1
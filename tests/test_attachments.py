@@ -0,0 +1,123 @@
+"""Mirroring attachments from a local HTTP server."""
+
+import os
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
+from airtable_stub import AirtableStub
+
+from lakeland_db_migrate_v4.attachments import mirror_attachments
+from lakeland_db_migrate_v4.destinations import ItemRecord
+from lakeland_db_migrate_v4.sources import ItemSourceRecord
+
+ATTACHMENTS = 10
+SIZE = 64 * 1024
+
+
+@pytest.fixture
+def contents() -> dict[str, bytes]:
+    """Random attachment bodies by file name."""
+    return {
+        "summary_{:02d}.pdf".format(i): os.urandom(SIZE) for i in range(ATTACHMENTS)
+    }
+
+
+@pytest.fixture
+def attachment_stub(contents: dict[str, bytes]) -> Iterator[AirtableStub]:
+    """A stub serving the attachments, dropping every other one partway through the first time."""
+    with AirtableStub({}, attachments=contents) as running:
+        for i, name in enumerate(contents):
+            if i % 2:
+                running.interrupt[name] = SIZE // 3
+        yield running
+
+
+def attachment(stub: AirtableStub, i: int, name: str) -> dict[str, Any]:
+    """An attachment dictionary the way Airtable hands it over."""
+    return {
+        "id": "att{:014d}".format(i),
+        "url": stub.attachment_url(name),
+        "filename": name,
+        "size": SIZE,
+        "type": "application/pdf",
+    }
+
+
+def item_records(stub: AirtableStub, contents: dict[str, bytes]) -> list[ItemRecord]:
+    """Two validated destination records per attachment."""
+    return [
+        ItemRecord(
+            idno="lakeland:item{:05d}{}".format(i, copy),
+            v3_airtable_created_time="2021-03-04T15:16:17.000Z",
+            v3_airtable_idno="recI{:013d}{}".format(i, copy),
+            title=name,
+            description="",
+            v3_created_date="",
+            collection="",
+            item_type="Oral History",
+            interview_summary_attachment=[attachment(stub, i, name)],
+        )
+        for i, name in enumerate(contents)
+        for copy in range(2)
+    ]
+
+
+def test_mirror_item_records(
+    tmp_path: Path, attachment_stub: AirtableStub, contents: dict[str, bytes]
+) -> None:
+    """Downloads resume, each attachment is fetched once and records point at the local copies."""
+    records = item_records(attachment_stub, contents)
+    # Validation turns sizes into strings, which the mirror has to cope with
+    assert records[0].interview_summary_attachment[0]["size"] == str(SIZE)
+
+    report = mirror_attachments(records, tmp_path, workers=4)
+    assert not report.failed, report.failed
+    assert report.downloaded == ATTACHMENTS
+    assert report.resumed == ATTACHMENTS // 2
+    assert report.rewritten == 2 * ATTACHMENTS
+    for rec in records:
+        local = rec.interview_summary_attachment[0]
+        assert local["source_url"].startswith(attachment_stub.url)
+        assert Path(local["url"]).read_bytes() == contents[local["filename"]]
+
+
+def test_mirror_skips_intact_copies(
+    tmp_path: Path, attachment_stub: AirtableStub, contents: dict[str, bytes]
+) -> None:
+    """A second run fetches nothing, and a damaged copy is the only one fetched again."""
+    records = item_records(attachment_stub, contents)
+    mirror_attachments(records, tmp_path, workers=4)
+
+    requests = attachment_stub.attachment_requests
+    report = mirror_attachments(records, tmp_path, workers=4)
+    assert report.skipped == ATTACHMENTS
+    assert attachment_stub.attachment_requests == requests
+
+    damaged = Path(records[0].interview_summary_attachment[0]["url"])
+    with open(damaged, "r+b") as fobject:
+        fobject.write(b"\0")
+    report = mirror_attachments(records, tmp_path, workers=4)
+    assert report.downloaded == 1
+    assert report.skipped == ATTACHMENTS - 1
+    assert damaged.read_bytes() == contents[damaged.name]
+
+
+def test_mirror_item_source_records(
+    tmp_path: Path, attachment_stub: AirtableStub, contents: dict[str, bytes]
+) -> None:
+    """Source records carry a single attachment dictionary as often as a list."""
+    records = [
+        ItemSourceRecord(
+            airtable_created_time="2021-03-04T15:16:17.000Z",
+            airtable_idno="recI{:013d}".format(i),
+            idno="lakeland:item{:05d}".format(i),
+            legacy_idno_umd="",
+            linked_files_array=[],
+            interview_summary_attachment=attachment(attachment_stub, i, name),
+        )
+        for i, name in enumerate(contents)
+    ]
+    report = mirror_attachments(records, tmp_path, workers=4, rewrite=False)
+    assert not report.failed, report.failed
+    assert report.downloaded == ATTACHMENTS
@@ -0,0 +1,45 @@
+"""The lakeland-migrate command."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from bench_startup import timed_run
+
+from lakeland_db_migrate_v4.cli import STARTUP_BUDGET, main
+
+RUNS = 7
+
+
+def test_help_does_not_load_pydantic() -> None:
+    """Building the parser imports nothing heavy."""
+    code = (
+        "import sys, lakeland_db_migrate_v4.cli as cli; cli.build_parser()\n"
+        "print(' '.join(m for m in ('pydantic', 'lakeland_db_migrate_v4.sources') if m in sys.modules))"
+    )
+    loaded = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout.split()
+    assert loaded == []
+
+
+def test_help_starts_within_budget() -> None:
+    """--help adds no more than STARTUP_BUDGET to a bare interpreter's startup."""
+    bare = timed_run(["-c", "pass"], RUNS)
+    help_time = timed_run(["-m", "lakeland_db_migrate_v4", "--help"], RUNS)
+    assert help_time - bare <= STARTUP_BUDGET
+
+
+def test_run_writes_sqlite(source_dir: Path, tmp_path: Path) -> None:
+    """The run subcommand goes from an export to a database in one go."""
+    out = tmp_path / "out"
+    status = main(
+        ["run", str(source_dir), str(out), "--format", "sqlite", "--workers", "1"]
+    )
+    assert status == 0
+    assert (out / "lakeland_v4.sqlite3").is_file()
+
+
+def test_run_refuses_to_overwrite_source(source_dir: Path) -> None:
+    """Writing output into the export directory is refused."""
+    assert main(["run", str(source_dir), str(source_dir)]) == 2
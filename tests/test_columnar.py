@@ -0,0 +1,49 @@
+"""Holding validated records as columns."""
+
+import dataclasses
+
+import pytest
+
+from lakeland_db_migrate_v4 import columnar
+from lakeland_db_migrate_v4.columnar import ColumnarTable, DictColumn
+from lakeland_db_migrate_v4.sources import ValidationReport, validator_switch
+
+
+@pytest.mark.parametrize("sample_rows", [columnar.DICT_SAMPLE_ROWS, 16])
+def test_rows_decode_to_the_records(
+    reports: dict[str, ValidationReport],
+    monkeypatch: pytest.MonkeyPatch,
+    sample_rows: int,
+) -> None:
+    """Every row reads back as its record, whether its strings are encoded or not."""
+    monkeypatch.setattr(columnar, "DICT_SAMPLE_ROWS", sample_rows)
+    for table, report in reports.items():
+        columns = ColumnarTable.from_records(report.records, validator_switch[table])
+        assert len(columns) == len(report.records), table
+        assert [row.as_dict() for row in columns] == [
+            dataclasses.asdict(rec) for rec in report.records
+        ], table
+
+
+def test_mostly_distinct_strings_are_kept_plain(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Ids give up on the dictionary once sampled, categories keep it, and short columns decide when frozen."""
+    monkeypatch.setattr(columnar, "DICT_SAMPLE_ROWS", 8)
+    ids, categories, short = DictColumn(), DictColumn(), DictColumn()
+    for n in range(20):
+        ids.append("rec{}".format(n))
+        categories.append(["Person", "Organization"][n % 2])
+    assert ids.plain == ["rec{}".format(n) for n in range(20)]
+    assert (ids.values, len(ids.codes)) == ([], 0)
+    assert categories.plain is None
+    assert categories.values == ["Person", "Organization"]
+    for value in ("a", "b", "c"):
+        short.append(value)
+    for column in (ids, categories, short):
+        column.freeze()
+    assert short.plain == ["a", "b", "c"]
+    assert [categories[n] for n in range(3)] == ["Person", "Organization", "Person"]
+    assert ids[19] == "rec19"
+    categories.append("Place")
+    assert categories[20] == "Place"
@@ -0,0 +1,195 @@
+"""Diffing two export snapshots."""
+
+import json
+import shutil
+from pathlib import Path
+
+from lakeland_db_migrate_v4.delta import diff_snapshots
+
+# Item fields whose links become whole EntityRecords
+EMBEDDING_KEYS = (
+    "People",
+    "Places/Organizations",
+    "Source (Provenance)",
+    "Interviewer",
+    "Interviewee",
+)
+
+
+def load(source_dir: Path, table: str) -> list[dict]:
+    """Raw records of one table."""
+    with open(source_dir / "{}.json".format(table)) as fobject:
+        return json.load(fobject)
+
+
+def test_renamed_entity_reaches_items_that_embed_it(
+    source_dir: Path, tmp_path: Path
+) -> None:
+    """Items and relationships linking to a changed entity are mapped again with its new name."""
+    previous = tmp_path / "previous"
+    current = tmp_path / "current"
+    shutil.copytree(source_dir, previous)
+    shutil.copytree(source_dir, current)
+
+    entities = load(current, "entities")
+    renamed = entities[0]["airtable_id"]
+    entities[0]["Name"] = "Renamed Entity"
+    with open(current / "entities.json", "w") as fobject:
+        json.dump(entities, fobject)
+
+    # Items link to it directly, or hold files from an accession it donated
+    accessions = {
+        a["airtable_id"]
+        for a in load(current, "accessions")
+        if renamed in a.get("Donor Name (Linked)", [])
+    }
+    files = {
+        f["airtable_id"]
+        for f in load(current, "files")
+        if set(f.get("Part of Accession", [])) & accessions
+    }
+    items = {
+        i["airtable_id"]
+        for i in load(current, "items")
+        if any(renamed in i.get(key, []) for key in EMBEDDING_KEYS)
+        or set(i.get("Files", [])) & files
+    }
+    relationships = {
+        r["airtable_id"]
+        for r in load(current, "relationships")
+        if renamed in r.get("Entity 1", []) + r.get("Entity 2", [])
+    }
+    assert items
+
+    changeset = diff_snapshots(previous, current)
+    assert [e.v3_airtable_idno for e in changeset.tables["entities"].changed] == [
+        renamed
+    ]
+    item_delta = changeset.tables["items"]
+    assert set(item_delta.dependent) == items
+    assert {i.v3_airtable_idno for i in item_delta.changed} == items
+    for item in item_delta.changed:
+        embedded = [
+            e.name
+            for e in item.linked_entities
+            + item.linked_entities_as_donors
+            + item.linked_entities_as_sources
+            + item.linked_entities_as_interviewers
+            + item.linked_entities_as_interviewees
+            if e.v3_airtable_idno == renamed
+        ]
+        assert embedded == ["Renamed Entity"] * len(embedded) and embedded
+    assert set(changeset.tables["relationships"].dependent) == relationships
+    assert changeset.tables["accessions"].changed == []
+    assert changeset.tables["files"].changed == []
+    total = len(load(current, "items"))
+    assert item_delta.unchanged == total - len(items)
+
+
+def test_identical_snapshots_have_no_changes(source_dir: Path) -> None:
+    """Nothing changed, so nothing is mapped."""
+    changeset = diff_snapshots(source_dir, source_dir)
+    for delta in changeset.tables.values():
+        assert not (delta.added or delta.changed or delta.removed or delta.dependent)
+    assert changeset.validated == 0
+
+
+def test_renumbered_item_reaches_records_holding_its_idno(
+    source_dir: Path, tmp_path: Path
+) -> None:
+    """Files and subjects holding a renumbered item's idno, and items embedding those subjects, are mapped again."""
+    previous = tmp_path / "previous"
+    current = tmp_path / "current"
+    shutil.copytree(source_dir, previous)
+    shutil.copytree(source_dir, current)
+
+    items = load(current, "items")
+    renumbered = items[0]["airtable_id"]
+    items[0]["ID"] = "LAI9999999"
+    with open(current / "items.json", "w") as fobject:
+        json.dump(items, fobject)
+
+    files = {
+        f["airtable_id"]
+        for f in load(current, "files")
+        if renumbered in f.get("Part of Item", [])
+    }
+    subjects = {
+        s["airtable_id"]
+        for s in load(current, "subjects")
+        if renumbered in s.get("Items", [])
+    }
+    embedding = {
+        i["airtable_id"]
+        for i in items
+        if set(i.get("Subjects", [])) & subjects and i["airtable_id"] != renumbered
+    }
+    assert files and subjects
+
+    changeset = diff_snapshots(previous, current)
+    assert set(changeset.tables["files"].dependent) == files
+    assert {f.item_id for f in changeset.tables["files"].changed} == {"LAI9999999"}
+    assert set(changeset.tables["subjects"].dependent) == subjects
+    for subject in changeset.tables["subjects"].changed:
+        assert "LAI9999999" in subject.linked_items
+    assert set(changeset.tables["items"].dependent) == embedding
+    assert changeset.tables["entities"].changed == []
+
+
+# An attachment the way the Airtable API and airtable-export send it
+ATTACHMENT = {
+    "id": "attAbCdEfGhIjKlMn",
+    "width": 1275,
+    "height": 1650,
+    "url": "https://dl.airtable.com/.attachments/0123/4567/summary.pdf",
+    "filename": "summary.pdf",
+    "size": 48213,
+    "type": "application/pdf",
+    "thumbnails": {
+        "small": {
+            "url": "https://dl.airtable.com/small.png",
+            "width": 28,
+            "height": 36,
+        },
+        "large": {
+            "url": "https://dl.airtable.com/large.png",
+            "width": 512,
+            "height": 662,
+        },
+        "full": {
+            "url": "https://dl.airtable.com/full.png",
+            "width": 3000,
+            "height": 3000,
+        },
+    },
+}
+
+
+def test_item_with_attachment_doesnt_stop_the_diff(
+    source_dir: Path, tmp_path: Path
+) -> None:
+    """A changed item carrying a real-shaped attachment is mapped with the rest of the diff."""
+    previous = tmp_path / "previous"
+    current = tmp_path / "current"
+    shutil.copytree(source_dir, previous)
+    shutil.copytree(source_dir, current)
+
+    items = load(current, "items")
+    attached = items[0]["airtable_id"]
+    items[0]["Interview Summary"] = [ATTACHMENT]
+    with open(current / "items.json", "w") as fobject:
+        json.dump(items, fobject)
+    entities = load(current, "entities")
+    entities[0]["Name"] = "Renamed Entity"
+    with open(current / "entities.json", "w") as fobject:
+        json.dump(entities, fobject)
+
+    changeset = diff_snapshots(previous, current)
+    item_delta = changeset.tables["items"]
+    assert item_delta.failures == []
+    [item] = [i for i in item_delta.changed if i.v3_airtable_idno == attached]
+    assert (
+        item.interview_summary_attachment[0]["thumbnails"] == ATTACHMENT["thumbnails"]
+    )
+    assert [e.name for e in changeset.tables["entities"].changed] == ["Renamed Entity"]
+    json.dumps(changeset.as_dict())
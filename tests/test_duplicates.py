@@ -0,0 +1,137 @@
+"""Finding files stored more than once on the NAS."""
+
+import hashlib
+import os
+from pathlib import Path
+
+from lakeland_db_migrate_v4.duplicates import PARTIAL_HASH_SIZE, find_duplicates
+from lakeland_db_migrate_v4.fixity_cache import FixityCache
+from lakeland_db_migrate_v4.sources import FileSourceRecord
+
+# Big enough that the partial hash only samples the ends
+LARGE: int = 2 * PARTIAL_HASH_SIZE + 1000
+
+
+def source(n: int, location: str) -> FileSourceRecord:
+    """A validated source file at a location under Projects."""
+    return FileSourceRecord(
+        airtable_created_time="2021-03-04T15:16:17.000Z",
+        airtable_idno="recF{:013d}".format(n),
+        idno="LAF{:07d}".format(n),
+        linked_accession="recA{:013d}".format(n),
+        file_path='"/Projects/{}"'.format(location),
+    )
+
+
+def write(root: Path, location: str, content: bytes) -> None:
+    """Put a file on the NAS."""
+    path = root / "Projects" / location
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+
+def test_identical_content_is_clustered(tmp_path: Path) -> None:
+    """Copies cluster together, while a file of the same size with other content doesn't."""
+    content = b"scan of a picnic" * 100
+    write(tmp_path, "a/copy.tif", content)
+    write(tmp_path, "b/copy.tif", content)
+    write(tmp_path, "c/other.tif", content[::-1])
+    write(tmp_path, "c/unique.tif", b"no other file this size")
+    write(tmp_path, "c/empty.tif", b"")
+    sources = [
+        source(0, "a/copy.tif"),
+        source(1, "b/copy.tif"),
+        source(2, "c/other.tif"),
+        source(3, "c/unique.tif"),
+        source(4, "c/empty.tif"),
+        source(5, "c/gone.tif"),
+    ]
+
+    report = find_duplicates(sources, tmp_path, workers=2)
+    assert report.files == 4
+    assert (report.size_candidates, report.partial_candidates) == (3, 2)
+    assert report.missing == ["Projects/c/gone.tif"]
+    (cluster,) = report.clusters
+    assert cluster.sha256_hexdigest == hashlib.sha256(content).hexdigest()
+    assert (cluster.size, cluster.stored) == (len(content), 2)
+    assert [c.location for c in cluster.copies] == [
+        "Projects/a/copy.tif",
+        "Projects/b/copy.tif",
+    ]
+    assert cluster.accessions == [
+        sources[0].linked_accession,
+        sources[1].linked_accession,
+    ]
+    assert report.wasted_bytes == len(content)
+
+
+def test_same_ends_different_middle(tmp_path: Path) -> None:
+    """Large files alike at both ends get past the partial hash but not the full one."""
+    content = bytes(LARGE)
+    changed = bytearray(content)
+    changed[LARGE // 2] = 1
+    write(tmp_path, "a/one.wav", content)
+    write(tmp_path, "a/two.wav", bytes(changed))
+    write(tmp_path, "b/one.wav", content)
+    sources = [source(0, "a/one.wav"), source(1, "a/two.wav"), source(2, "b/one.wav")]
+
+    report = find_duplicates(sources, tmp_path)
+    assert (report.size_candidates, report.partial_candidates) == (3, 3)
+    assert report.bytes_hashed == 3 * LARGE
+    (cluster,) = report.clusters
+    assert [c.file_idno for c in cluster.copies] == [sources[0].idno, sources[2].idno]
+
+    with FixityCache(tmp_path / "cache.sqlite3") as cache:
+        find_duplicates(sources, tmp_path, cache=cache)
+        again = find_duplicates(sources, tmp_path, cache=cache)
+    assert (again.cache_hits, again.bytes_hashed) == (3, 0)
+    assert again.clusters == report.clusters
+
+
+def test_hard_links_are_reported(tmp_path: Path) -> None:
+    """A file only reached through hard links or a shared location is one file stored once."""
+    write(tmp_path, "a/linked.tif", b"one file, two names")
+    os.link(tmp_path / "Projects/a/linked.tif", tmp_path / "Projects/b.tif")
+    write(tmp_path, "a/shared.tif", b"two records, one location")
+    write(tmp_path, "a/alone.tif", b"nothing else points here")
+    sources = [
+        source(0, "a/linked.tif"),
+        source(1, "b.tif"),
+        source(2, "a/shared.tif"),
+        source(3, "a/shared.tif"),
+        source(4, "a/alone.tif"),
+    ]
+
+    report = find_duplicates(sources, tmp_path)
+    assert report.files == 3
+    assert report.wasted_bytes == 0
+    clusters = {c.sha256_hexdigest: c for c in report.clusters}
+    assert set(clusters) == {
+        hashlib.sha256(b"one file, two names").hexdigest(),
+        hashlib.sha256(b"two records, one location").hexdigest(),
+    }
+    linked = clusters[hashlib.sha256(b"one file, two names").hexdigest()]
+    assert linked.stored == 1
+    assert [c.location for c in linked.copies] == [
+        "Projects/a/linked.tif",
+        "Projects/b.tif",
+    ]
+    shared = clusters[hashlib.sha256(b"two records, one location").hexdigest()]
+    assert [c.file_idno for c in shared.copies] == [sources[2].idno, sources[3].idno]
+
+
+def test_hard_links_join_their_copies(tmp_path: Path) -> None:
+    """Hard links count once towards the space a cluster wastes."""
+    content = b"an interview recording"
+    write(tmp_path, "a/tape.wav", content)
+    os.link(tmp_path / "Projects/a/tape.wav", tmp_path / "Projects/a/link.wav")
+    write(tmp_path, "b/tape.wav", content)
+    sources = [
+        source(0, "a/tape.wav"),
+        source(1, "a/link.wav"),
+        source(2, "b/tape.wav"),
+    ]
+
+    (cluster,) = find_duplicates(sources, tmp_path).clusters
+    assert (cluster.stored, len(cluster.copies)) == (2, 3)
+    assert cluster.wasted_bytes == len(content)
@@ -0,0 +1,154 @@
+"""Suggesting entities to merge."""
+
+from types import SimpleNamespace
+
+from lakeland_db_migrate_v4.entity_duplicates import (
+    birth_year,
+    find_duplicate_entities,
+    find_duplicate_records,
+    name_variants,
+    soundex,
+)
+from lakeland_db_migrate_v4.sources import ValidationReport
+
+from bench_entity_duplicates import generate
+
+
+def entity(
+    n: int,
+    name: str,
+    alt_name: str = "",
+    category: str = "Person",
+    date_of_birth: str = "",
+    lchp_source_code: str = "",
+) -> SimpleNamespace:
+    """An entity as validated from the export."""
+    return SimpleNamespace(
+        airtable_idno="recE{:09d}".format(n),
+        airtable_created_time="2021-03-04T15:16:{:02d}.000Z".format(n),
+        name=name,
+        alt_name=alt_name,
+        category=category,
+        lchp_source_code=lchp_source_code,
+        date_of_birth=date_of_birth,
+    )
+
+
+def pairs(entities: list[SimpleNamespace]) -> set[tuple[str, str]]:
+    """Suggested pairs by name, ignoring which one is kept."""
+    report = find_duplicate_records(entities)
+    return {tuple(sorted((s.keep_name, s.merge_name))) for s in report.suggestions}
+
+
+def test_soundex() -> None:
+    assert soundex("smith") == soundex("smyth") == "s530"
+    assert soundex("ashcraft") == "a261"
+    assert soundex("lee") == "l000"
+    assert soundex("1920") == "1920"
+
+
+def test_name_variants() -> None:
+    variants = name_variants(entity(1, "Dr. Mary Smith", "Mary Smyth; | "))
+    assert [sorted(v.tokens) for v in variants] == [
+        ["mary", "smith"],
+        ["mary", "smyth"],
+    ]
+
+
+def test_variants_are_suggested() -> None:
+    entities = [
+        entity(1, "Mary Smith"),
+        entity(2, "Mary Smyth"),
+        entity(3, "Smith, Mary"),
+        entity(4, "Theodore Okonkwo"),
+        entity(5, "Lakeland Civic Association", category="Organization"),
+        entity(6, "Wu Xiaoling", alt_name="Theodore Okonkwo"),
+    ]
+    assert pairs(entities) == {
+        ("Mary Smith", "Mary Smyth"),
+        ("Mary Smith", "Smith, Mary"),
+        ("Mary Smyth", "Smith, Mary"),
+        ("Theodore Okonkwo", "Wu Xiaoling"),
+    }
+
+
+def test_different_people_are_kept_apart() -> None:
+    """Birth years and categories that disagree count against a pair."""
+    entities = [
+        entity(1, "Mary Smith", date_of_birth="1901"),
+        entity(2, "Mary Smith", date_of_birth="1950"),
+        entity(3, "Mary Smith", category="Organization"),
+    ]
+    report = find_duplicate_records(entities)
+    assert report.candidate_pairs == 3
+    assert report.suggestions == []
+
+
+def test_unreadable_dates_of_birth_are_ignored() -> None:
+    entities = [
+        entity(1, "Mary Smith", date_of_birth="0000"),
+        entity(2, "Mary Smith", date_of_birth="00/00/0000"),
+        entity(3, "Mary Smith", date_of_birth="1901"),
+    ]
+    assert [birth_year(rec) for rec in entities] == ["", "", "1901"]
+    assert len(find_duplicate_records(entities).suggestions) == 3
+
+
+def test_links_decide_which_to_keep() -> None:
+    """The entity linked from more records is kept, and links to the other are listed."""
+    original, copy = entity(1, "Mary Smith"), entity(2, "Mary Smyth")
+    linking = {
+        "items": [
+            SimpleNamespace(airtable_idno="recI1", linked_people=[copy.airtable_idno]),
+            SimpleNamespace(airtable_idno="recI2", linked_people=[copy.airtable_idno]),
+            SimpleNamespace(
+                airtable_idno="recI3", linked_people=[original.airtable_idno]
+            ),
+        ],
+        "relationships": [
+            SimpleNamespace(
+                airtable_idno="recR1",
+                entity_1=original.airtable_idno,
+                entity_2=copy.airtable_idno,
+            )
+        ],
+    }
+    report = find_duplicate_entities(
+        {
+            "entities": ValidationReport("entities", [original, copy]),
+            **{
+                table: ValidationReport(table, records)
+                for table, records in linking.items()
+            },
+        }
+    )
+    (suggestion,) = report.suggestions
+    assert (suggestion.keep, suggestion.merge) == (
+        copy.airtable_idno,
+        original.airtable_idno,
+    )
+    assert suggestion.items == ["recI3"]
+    assert suggestion.relationships == ["recR1"]
+
+
+def test_oversized_blocks_are_skipped() -> None:
+    entities = [entity(n, "Mary Smith") for n in range(5)]
+    report = find_duplicate_records(entities, max_block_size=4)
+    assert report.oversized_blocks == report.blocks > 0
+    assert report.suggestions == []
+
+
+def test_planted_duplicates_are_found() -> None:
+    """Nearly every planted copy is suggested, with the item and relationship linking to it."""
+    entities, linking, planted = generate(600, 0)
+    report = find_duplicate_records(entities, linking)
+    suggested = {tuple(sorted((s.keep, s.merge))): s for s in report.suggestions}
+    found = planted & set(suggested)
+    assert len(planted) >= 20
+    assert len(found) >= 0.9 * len(planted)
+    for pair in found:
+        suggestion = suggested[pair]
+        copy = max(pair)
+        assert "recR" + copy[4:] in suggestion.relationships, suggestion
+        if suggestion.merge == copy:
+            assert suggestion.items == ["recI" + copy[4:]], suggestion
@@ -0,0 +1,116 @@
+"""Hashing and identifying files on the NAS."""
+
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from lakeland_db_migrate_v4 import fixity
+from lakeland_db_migrate_v4.fixity import (
+    build_file_records,
+    detect_format,
+    hash_file,
+    legacy_algorithm_for,
+)
+from lakeland_db_migrate_v4.fixity_cache import FixityCache
+from lakeland_db_migrate_v4.sources import FileSourceRecord
+
+PNG: bytes = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 3
+
+
+def source(n: int, location: str, legacy_checksum: str = "") -> FileSourceRecord:
+    """A validated source file at a location under Projects."""
+    return FileSourceRecord(
+        airtable_created_time="2021-03-04T15:16:17.000Z",
+        airtable_idno="recF{:013d}".format(n),
+        idno="LAF{:07d}".format(n),
+        linked_accession="recA0000000000000",
+        file_path='"/Projects/{}"'.format(location),
+        legacy_checksum=legacy_checksum,
+    )
+
+
+@pytest.mark.parametrize("mmap_threshold", [fixity.MMAP_THRESHOLD, 0])
+@pytest.mark.parametrize("size", [0, 1, 100, 1000])
+def test_hash_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, mmap_threshold: int, size: int
+) -> None:
+    """Buffered and mapped reads give hashlib's digests whatever the chunk size."""
+    monkeypatch.setattr(fixity, "MMAP_THRESHOLD", mmap_threshold or 1)
+    content = (PNG * 4)[:size]
+    path = tmp_path / "file"
+    path.write_bytes(content)
+    for chunk_size in (7, 64, fixity.HASH_CHUNK_SIZE):
+        assert hash_file(path, "md5", chunk_size) == (
+            hashlib.sha256(content).hexdigest(),
+            hashlib.md5(content).hexdigest(),
+            content[: fixity.MAGIC_READ_SIZE],
+        )
+    assert hash_file(path) == (hashlib.sha256(content).hexdigest(), "", content[:32])
+    sha256 = hashlib.sha256(content).hexdigest()
+    assert hash_file(path, "sha256") == (sha256, sha256, content[:32])
+
+
+@pytest.mark.parametrize(
+    "head,expected",
+    [
+        (PNG[:32], "png"),
+        (b"\xff\xd8\xff\xe0" + bytes(28), "jpeg"),
+        (b"RIFF\x00\x00\x00\x00WAVEfmt ", "wav"),
+        (b"RIFF\x00\x00\x00\x00AVI LIST", "avi"),
+        (b"RIFF", ""),
+        (b"%PDF-1.4", "pdf"),
+        (b"plain text", ""),
+        (b"", ""),
+    ],
+)
+def test_detect_format(head: bytes, expected: str) -> None:
+    """Signatures at an offset all have to match, and anything else is unknown."""
+    assert detect_format(head) == expected
+
+
+def test_legacy_algorithm_for() -> None:
+    """Recorded checksums are told apart by length."""
+    assert legacy_algorithm_for(hashlib.md5().hexdigest()) == "md5"
+    assert legacy_algorithm_for(" " + hashlib.sha1().hexdigest() + "\n") == "sha1"
+    assert legacy_algorithm_for("not a checksum") == ""
+
+
+def test_build_file_records(tmp_path: Path) -> None:
+    """Records get fixity filled in, legacy checksums are compared and missing files listed."""
+    root = tmp_path / "nas"
+    (root / "Projects/box").mkdir(parents=True)
+    (root / "Projects/box/match.png").write_bytes(PNG)
+    (root / "Projects/box/mismatch.dat").write_bytes(b"changed since")
+    sources = [
+        source(0, "box/match.png", hashlib.md5(PNG).hexdigest().upper()),
+        source(1, "box/mismatch.dat", hashlib.md5(b"recorded").hexdigest()),
+        source(2, "box/gone.png"),
+    ]
+
+    report = build_file_records(sources, root, workers=2)
+    assert [rec.idno for rec in report.records] == [s.idno for s in sources]
+    assert report.missing == [sources[2].idno]
+    assert report.legacy_matches == 1
+    assert report.legacy_mismatches == [sources[1].idno]
+    assert (report.files, report.bytes) == (2, len(PNG) + len(b"changed since"))
+    first = report.records[0]
+    assert first.location == "Projects/box/match.png"
+    assert first.size == len(PNG)
+    assert first.sha256_hexdigest == hashlib.sha256(PNG).hexdigest()
+    assert first.file_format == "png"
+    assert report.records[1].file_format == "dat"
+
+
+def test_cache_hits_arent_counted_as_hashed(tmp_path: Path) -> None:
+    """A second run from the cache reads nothing, so it reports no bytes hashed."""
+    root = tmp_path / "nas"
+    (root / "Projects").mkdir(parents=True)
+    (root / "Projects/a.png").write_bytes(PNG)
+    sources = [source(0, "a.png")]
+    with FixityCache(tmp_path / "fixity_cache.sqlite3") as cache:
+        first = build_file_records(sources, root, cache=cache)
+        second = build_file_records(sources, root, cache=cache)
+    assert (first.cache_misses, first.bytes) == (1, len(PNG))
+    assert (second.cache_hits, second.files, second.bytes) == (1, 1, 0)
+    assert second.records[0].sha256_hexdigest == first.records[0].sha256_hexdigest
@@ -0,0 +1,128 @@
+"""Keeping fixity results between runs."""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from lakeland_db_migrate_v4.fixity import FixityResult, compute_fixity
+from lakeland_db_migrate_v4.fixity_cache import FixityCache
+from lakeland_db_migrate_v4.source_mappings import files_source_column_mappings
+from lakeland_db_migrate_v4.sources import validate_table
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> Iterator[FixityCache]:
+    """An empty cache."""
+    with FixityCache(tmp_path / "fixity_cache.sqlite3") as opened:
+        yield opened
+
+
+def hashed(root: Path, location: str, content: bytes) -> FixityResult:
+    """Write a file under root and compute its fixity."""
+    path = root / location
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return compute_fixity(location, root, "md5")
+
+
+def test_lookup_misses_once_the_file_changes(
+    cache: FixityCache, tmp_path: Path
+) -> None:
+    """A change of size, mtime or inode makes the entry untrustworthy."""
+    root = tmp_path / "nas"
+    result = hashed(root, "box/one.txt", b"first version")
+    path = root / "box/one.txt"
+    st = path.stat()
+    cache.store(result, st.st_ino)
+
+    assert cache.lookup("box/one.txt", st, "md5") == result
+    assert cache.lookup("box/one.txt", st, "sha1") is None
+    assert cache.lookup("box/two.txt", st) is None
+
+    path.write_bytes(b"second version, longer")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert cache.lookup("box/one.txt", path.stat()) is None
+
+    path.write_bytes(b"first versioN")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert cache.lookup("box/one.txt", path.stat()) is None
+
+    # Same size and mtime, but a different file now lives at the path
+    copy = root / "box/copy.txt"
+    shutil.copyfile(path, copy)
+    os.utime(copy, ns=(st.st_atime_ns, st.st_mtime_ns))
+    os.replace(copy, path)
+    moved = path.stat()
+    assert (moved.st_size, moved.st_mtime_ns) == (st.st_size, st.st_mtime_ns)
+    assert moved.st_ino != st.st_ino
+    assert cache.lookup("box/one.txt", moved) is None
+
+    assert (cache.hits, cache.misses) == (1, 5)
+
+
+def test_store_replaces_and_invalidate_forgets(
+    cache: FixityCache, tmp_path: Path
+) -> None:
+    """Storing a location again replaces its entry, and invalidate and clear drop entries."""
+    root = tmp_path / "nas"
+    first = hashed(root, "a.txt", b"a")
+    cache.store(first, 1)
+    cache.store(first, 2)
+    cache.store(hashed(root, "b.txt", b"b"), 3)
+    assert len(cache) == 2
+    cache.invalidate("a.txt")
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_prune(cache: FixityCache, tmp_path: Path) -> None:
+    """Only locations still referenced are kept."""
+    root = tmp_path / "nas"
+    for name in ("a.txt", "b.txt", "c.txt"):
+        cache.store(hashed(root, name, name.encode()), 0)
+    assert cache.prune(["a.txt", "c.txt", "elsewhere.txt"]) == 1
+    assert len(cache) == 2
+
+
+def test_prune_to_export(cache: FixityCache, source_dir: Path, tmp_path: Path) -> None:
+    """Entries for files no longer in files.json go, everything the export still points at stays."""
+    report = validate_table("files.json", files_source_column_mappings, source_dir)
+    locations = [loc for rec in report.records for loc in rec.locations]
+    template = hashed(tmp_path / "nas", "template.txt", b"x")
+    for location in locations + ["gone/stale.txt"]:
+        cache.store(FixityResult(**{**vars(template), "location": location}), 0)
+
+    assert cache.prune_to_export(source_dir) == 1
+    assert len(cache) == len(set(locations))
+
+
+def test_prune_to_export_refuses_a_bad_export(
+    cache: FixityCache, source_dir: Path, tmp_path: Path
+) -> None:
+    """A missing, empty or partly invalid files.json leaves the cache alone."""
+    cache.store(hashed(tmp_path / "nas", "a.txt", b"a"), 0)
+
+    with pytest.raises(RuntimeError, match="no files.json"):
+        cache.prune_to_export(tmp_path / "nowhere")
+
+    empty = tmp_path / "empty"
+    empty.mkdir()
+    (empty / "files.json").write_text("[]")
+    with pytest.raises(RuntimeError, match="has no records"):
+        cache.prune_to_export(empty)
+
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    with open(source_dir / "files.json") as fobject:
+        records = json.load(fobject)
+    del records[0]["airtable_createdTime"]
+    (broken / "files.json").write_text(json.dumps(records))
+    with pytest.raises(RuntimeError, match="1 records .* failed validation"):
+        cache.prune_to_export(broken)
+
+    assert len(cache) == 1
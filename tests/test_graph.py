@@ -0,0 +1,189 @@
+"""Building and walking the entity graph."""
+
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from lakeland_db_migrate_v4.destinations import (
+    EntityRecord,
+    EntityRelationshipRecord,
+    ItemRecord,
+)
+from lakeland_db_migrate_v4.graph import (
+    ITEM_LINK_PREDICATES,
+    Edge,
+    EntityGraph,
+    build_entity_graph,
+)
+from lakeland_db_migrate_v4.joins import MigratedRecords
+from lakeland_db_migrate_v4.writers import iter_migrated, link_value
+
+CREATED: str = "2021-03-04T15:16:17.000Z"
+
+
+def entity(n: int, landing_page: bool = False) -> EntityRecord:
+    """A person."""
+    return EntityRecord(
+        idno="LAE{:07d}".format(n),
+        v3_airtable_created_time=CREATED,
+        v3_airtable_idno="recE{:013d}".format(n),
+        name="Person {}".format(n),
+        entity_type="Person",
+        create_landing_page=landing_page,
+    )
+
+
+def relationship(
+    n: int, subject: str, predicate: str, obj: str
+) -> EntityRelationshipRecord:
+    """A relationship between two entities."""
+    return EntityRelationshipRecord(
+        idno="LAR{:07d}".format(n),
+        v3_airtable_created_time=CREATED,
+        v3_airtable_idno="recR{:013d}".format(n),
+        name="",
+        subject_entity=subject,
+        object_entity=obj,
+        relationship_predicate=predicate,
+    )
+
+
+@pytest.fixture(scope="module")
+def graph(
+    migrated: MigratedRecords, tmp_path_factory: pytest.TempPathFactory
+) -> Iterator[EntityGraph]:
+    """The graph of the synthetic export."""
+    path = tmp_path_factory.mktemp("graph") / "entities.graph"
+    build_entity_graph(iter_migrated(migrated), path)
+    with EntityGraph(path) as opened:
+        yield opened
+
+
+def test_small_graph(tmp_path: Path) -> None:
+    """Relationships show on both ends, flipped on the object's, and item links on every entity they name."""
+    a, b, c = entity(1, landing_page=True), entity(2), entity(3)
+    item = ItemRecord(
+        idno="LAI0000001",
+        v3_airtable_created_time=CREATED,
+        v3_airtable_idno="recI0000000000001",
+        title="Picnic",
+        description="",
+        v3_created_date="",
+        collection="",
+        item_type="",
+        linked_entities=[a, b],
+        linked_entities_as_creators=[c.idno],
+    )
+    records = [
+        a,
+        b,
+        c,
+        item,
+        relationship(1, a.idno, "parent_of", b.idno),
+        relationship(2, b.idno, "sibling_of", c.idno),
+    ]
+    path = tmp_path / "entities.graph"
+    stats = build_entity_graph(records, path)
+    assert (stats.entities, stats.items) == (3, 1)
+
+    with EntityGraph(path) as small:
+        assert [page.idno for page in small.iter_landing_pages()] == [a.idno]
+        pages = {
+            page.idno: page for page in small.iter_landing_pages(every_entity=True)
+        }
+        assert pages[b.idno].relationships == [
+            Edge(a.idno, "entities", "parent_of", True),
+            Edge(c.idno, "entities", "sibling_of", False),
+        ]
+        assert pages[b.idno].items == [Edge(item.idno, "items", "depicts", True)]
+        assert [e.predicate for e in pages[c.idno].items] == ["created_by"]
+
+        assert small.k_hop(a.idno, 1) == {a.idno: 0, b.idno: 1, item.idno: 1}
+        assert small.k_hop(a.idno, 2, kinds=["entities"]) == {
+            a.idno: 0,
+            b.idno: 1,
+            c.idno: 2,
+        }
+        assert small.k_hop(a.idno, 5, predicates=["parent_of"]) == {
+            a.idno: 0,
+            b.idno: 1,
+        }
+        with pytest.raises(KeyError, match="Not in graph"):
+            small.k_hop("LAE9999999", 1)
+
+
+def scanned_page(migrated: MigratedRecords, idno: str) -> tuple[Counter, Counter]:
+    """Put a landing page together by scanning every relationship and item."""
+    relationships: Counter = Counter()
+    for rel in migrated.relationships:
+        if rel.subject_entity == idno:
+            relationships[(rel.object_entity, rel.relationship_predicate, False)] += 1
+        if rel.object_entity == idno:
+            relationships[(rel.subject_entity, rel.relationship_predicate, True)] += 1
+    items: Counter = Counter()
+    for item in migrated.items:
+        for field_name, predicate in ITEM_LINK_PREDICATES.items():
+            for target in link_value(getattr(item, field_name)):
+                if target == idno:
+                    items[(item.idno, predicate, True)] += 1
+    return (relationships, items)
+
+
+def test_landing_pages_match_scanning(
+    migrated: MigratedRecords, graph: EntityGraph
+) -> None:
+    """Every entity's page from the graph holds what scanning the records finds."""
+    pages = {page.idno: page for page in graph.iter_landing_pages(every_entity=True)}
+    assert set(pages) == {e.idno for e in migrated.entities}
+    assert any(page.relationships for page in pages.values())
+    assert any(page.items for page in pages.values())
+    for idno, page in pages.items():
+        relationships, items = scanned_page(migrated, idno)
+        assert relationships == Counter(
+            (e.target, e.predicate, e.inverse) for e in page.relationships
+        ), idno
+        assert items == Counter(
+            (e.target, e.predicate, e.inverse) for e in page.items
+        ), idno
+    flagged = [e.idno for e in migrated.entities if e.create_landing_page]
+    assert [page.idno for page in graph.iter_landing_pages()] == flagged
+
+
+def test_two_hops_match_breadth_first_search(
+    migrated: MigratedRecords, graph: EntityGraph
+) -> None:
+    """Entity neighbourhoods agree with a search over the relationships themselves."""
+    adjacency: dict[str, set[str]] = {}
+    for rel in migrated.relationships:
+        adjacency.setdefault(rel.subject_entity, set()).add(rel.object_entity)
+        adjacency.setdefault(rel.object_entity, set()).add(rel.subject_entity)
+    for entity_record in migrated.entities:
+        idno = entity_record.idno
+        expected = {idno: 0}
+        for hop in (1, 2):
+            for node in [n for n, d in expected.items() if d == hop - 1]:
+                for other in adjacency.get(node, ()):
+                    expected.setdefault(other, hop)
+        assert graph.k_hop(idno, 2, kinds=["entities"]) == expected, idno
+
+
+def test_k_hop_filters(migrated: MigratedRecords, graph: EntityGraph) -> None:
+    """Kinds are table names, as in search hits, and unknown kinds or predicates are errors rather than ignored."""
+    rel = migrated.relationships[0]
+    reached = graph.k_hop(rel.subject_entity, 2, kinds=["entities"])
+    assert reached[rel.object_entity] == 1
+    assert set(reached) <= {entity.idno for entity in migrated.entities}
+    assert len(graph.k_hop(rel.subject_entity, 2, kinds=["entities", "items"])) > len(
+        reached
+    )
+    via = graph.k_hop(rel.subject_entity, 1, predicates=[rel.relationship_predicate])
+    assert via[rel.object_entity] == 1
+    with pytest.raises(KeyError, match="Unexpected kind: entity"):
+        graph.k_hop(rel.subject_entity, 1, kinds=["entity"])
+    with pytest.raises(KeyError, match="Unexpected predicate: nosuch"):
+        graph.k_hop(rel.subject_entity, 1, predicates=["nosuch"])
+    for page in graph.iter_landing_pages(every_entity=True):
+        assert all(edge.kind == "entities" for edge in page.relationships)
+        assert all(edge.kind == "items" for edge in page.items)
@@ -0,0 +1,123 @@
+"""Timing and counting what a validation run does."""
+
+import cProfile
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from lakeland_db_migrate_v4.instrumentation import (
+    KEY_CHECK,
+    LOAD,
+    RENAME,
+    VALIDATE,
+    Instrumentation,
+    StageEvent,
+)
+from lakeland_db_migrate_v4.parallel import validate_all
+from lakeland_db_migrate_v4.sources import ValidationReport, validator_switch
+
+
+def finished_profile() -> cProfile.Profile:
+    """A profile of nothing much."""
+    profile = cProfile.Profile()
+    profile.enable()
+    profile.disable()
+    return profile
+
+
+def counts(instrumentation: Instrumentation) -> dict[tuple[str, str, str], int]:
+    """How many times each table, record class and stage was timed."""
+    return {
+        (table, record_class, stage): summary["count"]
+        for table, classes in instrumentation.report()["tables"].items()
+        for record_class, stages in classes.items()
+        for stage, summary in stages.items()
+    }
+
+
+def test_report_counts_every_record(
+    source_dir: Path, reports: dict[str, ValidationReport]
+) -> None:
+    """Each record is loaded, renamed and validated once, and hooks see every one."""
+    instrumentation = Instrumentation()
+    seen: Counter = Counter()
+    instrumentation.add_hook(VALIDATE, lambda event: seen.update([event.table]))
+    validate_all(source_dir, workers=1, instrumentation=instrumentation)
+
+    timed = counts(instrumentation)
+    for table, report in reports.items():
+        total = len(report.records) + len(report.failures)
+        record_class = validator_switch[table].__name__
+        for stage in (LOAD, RENAME, VALIDATE):
+            assert timed[(table, record_class, stage)] == total, (table, stage)
+        assert seen[table] == total
+    expected = {
+        table: dict(Counter(f.error_type for f in report.failures))
+        for table, report in reports.items()
+        if report.failures
+    }
+    assert instrumentation.report()["failures"] == expected
+
+
+def test_workers_merge_to_the_same_counts(source_dir: Path) -> None:
+    """Per record stages add up the same across worker processes; keys are checked again in every chunk."""
+    serial = Instrumentation()
+    validate_all(source_dir, workers=1, instrumentation=serial)
+    pooled = Instrumentation()
+    validate_all(source_dir, workers=2, chunk_size=50, instrumentation=pooled)
+    serial_counts, pooled_counts = counts(serial), counts(pooled)
+    for key in serial_counts:
+        if key[2] != KEY_CHECK:
+            assert pooled_counts[key] == serial_counts[key], key
+    assert pooled.report()["failures"] == serial.report()["failures"]
+
+
+def test_merge_adds_up() -> None:
+    """Timings and failures add up, and only the slowest profiles are kept."""
+    first, second = Instrumentation(profile_slowest=2), Instrumentation(
+        profile_slowest=2
+    )
+    for instrumentation, seconds in ((first, [0.001, 0.004]), (second, [0.002])):
+        instrumentation.table = "files"
+        instrumentation.record_class = "FileSourceRecord"
+        for s in seconds:
+            instrumentation.record(VALIDATE, s)
+        instrumentation.record_failure("TypeError")
+    second.table = "items"
+    second.record_failure("ValidationError")
+    for instrumentation, seconds, idno in (
+        (first, 0.3, "recA"),
+        (second, 0.1, "recB"),
+        (second, 0.5, "recC"),
+    ):
+        instrumentation.keep_profile(seconds, idno, finished_profile())
+
+    first.merge(second)
+    report: dict[str, Any] = first.report()
+    validate = report["tables"]["files"]["FileSourceRecord"][VALIDATE]
+    assert validate["count"] == 3
+    assert validate["total_seconds"] == pytest.approx(0.007)
+    assert (validate["min_seconds"], validate["max_seconds"]) == (0.001, 0.004)
+    assert report["failures"] == {
+        "files": {"TypeError": 2},
+        "items": {"ValidationError": 1},
+    }
+    assert [p["airtable_idno"] for p in report["slowest_profiles"]] == [
+        "recC",
+        "recA",
+    ]
+
+
+def test_hooks_need_a_known_stage() -> None:
+    instrumentation = Instrumentation()
+    events: list[StageEvent] = []
+    instrumentation.add_hook("failure", events.append)
+    instrumentation.table = "files"
+    instrumentation.record_failure("TypeError", "recF")
+    assert [(e.table, e.stage, e.error_type, e.airtable_idno) for e in events] == [
+        ("files", "failure", "TypeError", "recF")
+    ]
+    with pytest.raises(ValueError, match="Unknown stage: parse"):
+        instrumentation.add_hook("parse", events.append)
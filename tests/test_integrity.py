@@ -0,0 +1,95 @@
+"""Checking links between source tables."""
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from lakeland_db_migrate_v4.integrity import (
+    MISSING,
+    ONE_SIDED,
+    REMOVED,
+    check_integrity,
+    check_records,
+)
+from lakeland_db_migrate_v4.parallel import TABLE_FIELDMAPS
+from lakeland_db_migrate_v4.sources import ValidationReport, stream_from_file
+
+
+def load(source_dir: Path) -> dict[str, list[Any]]:
+    """Every table with its keys renamed, as records check_records can take and we can edit."""
+    return {
+        table: [
+            SimpleNamespace(**{fieldmap[k]: v for k, v in raw.items() if k in fieldmap})
+            for raw in stream_from_file(table + ".json", source_dir=source_dir)
+        ]
+        for table, fieldmap in TABLE_FIELDMAPS.items()
+    }
+
+
+def test_clean_export(reports: dict[str, ValidationReport]) -> None:
+    """The synthetic export's links all hold up."""
+    report = check_integrity(reports)
+    assert report.ok, str(report)
+    assert report.links
+
+
+def test_planted_violations(source_dir: Path) -> None:
+    """One dangling link of each kind is found, and nothing else."""
+    tables = load(source_dir)
+    tables["files"][0].part_of_item = ["recNOPE"]
+    tables["relationships"][0].entity_1 = ["recGONE"]
+    report = check_records(tables)
+    assert report.counts() == {
+        "files": {"part_of_item": {MISSING: 1}},
+        "relationships": {"entity_1": {MISSING: 1}},
+        "items": {"linked_files_array": {ONE_SIDED: 1}},
+    }, str(report)
+    [missing] = report.violations["files"]["part_of_item"]
+    assert (missing.airtable_idno, missing.link) == (
+        tables["files"][0].airtable_idno,
+        "recNOPE",
+    )
+
+
+def test_links_to_removed_records(source_dir: Path) -> None:
+    """Links to a record flagged for removal are reported on every field that holds one."""
+    tables = load(source_dir)
+    subject = tables["subjects"][0]
+    subject.remove = "yes"
+    linking = [
+        item
+        for item in tables["items"]
+        if subject.airtable_idno in item.linked_subjects
+    ]
+    assert linking
+    assert check_records(tables).counts() == {
+        "items": {"linked_subjects": {REMOVED: len(linking)}}
+    }
+
+
+def test_missing_tables_are_skipped(source_dir: Path) -> None:
+    """Links into a table that wasn't supplied can't be judged."""
+    tables = load(source_dir)
+    del tables["entities"]
+    report = check_records(tables)
+    assert report.ok
+    assert (
+        "relationships.entity_1: no entities table to check against" in report.skipped
+    )
+
+
+def test_repeated_links_are_matched_by_count(source_dir: Path) -> None:
+    """A link listed twice on one side has to be listed twice on the other."""
+    tables = load(source_dir)
+    item = next(i for i in tables["items"] if i.linked_files_array)
+    link = item.linked_files_array[0]
+    item.linked_files_array = item.linked_files_array + [link]
+    report = check_records(tables)
+    assert report.counts() == {"items": {"linked_files_array": {ONE_SIDED: 1}}}
+
+    file = next(f for f in tables["files"] if f.airtable_idno == link)
+    file.part_of_item = file.part_of_item + [item.airtable_idno]
+    assert check_records(tables).ok
+
+    file.part_of_item = file.part_of_item + [item.airtable_idno]
+    assert check_records(tables).counts() == {"files": {"part_of_item": {ONE_SIDED: 1}}}
@@ -0,0 +1,60 @@
+"""Mapping source records to linked destination records."""
+
+import pytest
+
+from lakeland_db_migrate_v4.joins import JoinIndex
+from lakeland_db_migrate_v4.sources import ItemSourceRecord
+
+
+def item(n: int, **fields: object) -> ItemSourceRecord:
+    """A validated source item without links."""
+    return ItemSourceRecord(
+        airtable_created_time="2021-03-04T15:16:17.000Z",
+        airtable_idno="recI{:013d}".format(n),
+        idno="lakeland:item{:05d}".format(n),
+        legacy_idno_umd="",
+        linked_files_array=[],
+        **fields,
+    )
+
+
+def test_item_that_fails_to_map_is_skipped(capsys: pytest.CaptureFixture) -> None:
+    """An item ItemRecord rejects is reported and the rest still map."""
+    items = [item(1, title="Fine"), item(2, created_date="not a date at all")]
+    migrated = JoinIndex.from_records(items=items).build()
+    assert [rec.v3_airtable_idno for rec in migrated.items] == [items[0].airtable_idno]
+    out = capsys.readouterr().out
+    assert "Error mapping item {}".format(items[1].airtable_idno) in out
+
+
+def test_attachment_thumbnails_are_kept() -> None:
+    """Attachments come from Airtable with thumbnails nested by size, and map as they are."""
+    attachment = {
+        "id": "att00000000000001",
+        "url": "https://dl.airtable.com/summary.pdf",
+        "filename": "summary.pdf",
+        "size": 5000,
+        "type": "application/pdf",
+        "thumbnails": {
+            "small": {
+                "url": "https://dl.airtable.com/small.png",
+                "width": 28,
+                "height": 36,
+            },
+            "large": {
+                "url": "https://dl.airtable.com/large.png",
+                "width": 512,
+                "height": 662,
+            },
+        },
+    }
+    items = [
+        item(1, interview_summary_attachment=[attachment]),
+        item(2, interview_summary_attachment=dict(attachment)),
+    ]
+    migrated = JoinIndex.from_records(items=items).build()
+    assert len(migrated.items) == 2
+    for rec in migrated.items:
+        [mapped] = rec.interview_summary_attachment
+        assert mapped["thumbnails"] == attachment["thumbnails"]
+        assert mapped["url"] == attachment["url"]
@@ -0,0 +1,63 @@
+"""Validating every table across a process pool."""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from lakeland_db_migrate_v4.fixity import bounded_map
+from lakeland_db_migrate_v4.instrumentation import VALIDATE, Instrumentation
+from lakeland_db_migrate_v4.parallel import TABLE_FIELDMAPS, validate_all
+from lakeland_db_migrate_v4.sources import ValidationReport, validate_table
+
+
+def test_pool_matches_serial(source_dir: Path) -> None:
+    """Small chunks across two processes give what validating each file in turn gives."""
+    pooled = validate_all(source_dir, workers=2, chunk_size=17)
+    assert list(pooled) == list(TABLE_FIELDMAPS)
+    for table, fieldmap in TABLE_FIELDMAPS.items():
+        serial = validate_table(
+            "{}.json".format(table), fieldmap, source_dir=source_dir
+        )
+        assert pooled[table].records == serial.records, table
+        assert pooled[table].failures == serial.failures, table
+
+
+def test_bounded_map_pulls_inputs_lazily() -> None:
+    """No more than limit inputs are taken before the first result comes back, and results keep input order."""
+    pulled = []
+
+    def inputs() -> Iterator[int]:
+        for i in range(100):
+            pulled.append(i)
+            yield i
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = bounded_map(pool, lambda i: i * i, inputs(), 4)
+        assert next(results) == 0
+        assert len(pulled) <= 4
+        assert list(results) == [i * i for i in range(1, 100)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_repeated_tables_are_validated_once(
+    source_dir: Path, reports: dict[str, ValidationReport], workers: int
+) -> None:
+    instrumentation = Instrumentation()
+    results = validate_all(
+        source_dir,
+        workers=workers,
+        tables=["files", "items", "files"],
+        chunk_size=50,
+        instrumentation=instrumentation,
+    )
+    assert list(results) == ["files", "items"]
+    timings = instrumentation.report()["tables"]
+    for table, record_class in (
+        ("files", "FileSourceRecord"),
+        ("items", "ItemSourceRecord"),
+    ):
+        assert results[table].records == reports[table].records
+        validated = timings[table][record_class][VALIDATE]["count"]
+        assert validated == len(reports[table].records) + len(reports[table].failures)
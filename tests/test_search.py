@@ -0,0 +1,165 @@
+"""Building and querying the search index."""
+
+import math
+import random
+from pathlib import Path
+from typing import Any, Iterator
+
+import pytest
+
+from lakeland_db_migrate_v4.destinations import EntityRecord, ItemRecord, SubjectRecord
+from lakeland_db_migrate_v4.joins import MigratedRecords
+from lakeland_db_migrate_v4.search import (
+    BM25_B,
+    BM25_K1,
+    SEARCH_FIELDS,
+    SearchIndex,
+    build_search_index,
+    tokenize,
+)
+from lakeland_db_migrate_v4.writers import iter_migrated
+
+CREATED: str = "2021-03-04T15:16:17.000Z"
+
+
+def item(n: int, title: str, description: str = "") -> ItemRecord:
+    """An item with nothing linked."""
+    return ItemRecord(
+        idno="LAI{:07d}".format(n),
+        v3_airtable_created_time=CREATED,
+        v3_airtable_idno="recI{:013d}".format(n),
+        title=title,
+        description=description,
+        v3_created_date="",
+        collection="",
+        item_type="",
+    )
+
+
+RECORDS: list[Any] = [
+    item(1, "Lakeland Mill", "Photograph of the old building"),
+    item(2, "Church picnic", "Families outside the mill on a Sunday"),
+    item(3, "Interview", "A conversation about the school and the church"),
+    EntityRecord(
+        idno="LAE0000001",
+        v3_airtable_created_time=CREATED,
+        v3_airtable_idno="recE0000000000001",
+        name="Béla Smith",
+        entity_type="Person",
+        bio_hist="Worked at the mill for thirty years",
+    ),
+    SubjectRecord(
+        idno="LAS0000001",
+        v3_airtable_created_time=CREATED,
+        v3_airtable_idno="recS0000000000001",
+        name="Churches",
+        subject_type="Topic",
+    ),
+]
+
+
+def brute_force(documents: list, query: str) -> dict[str, float]:
+    """Score every record against a query the slow way."""
+    weighted = []
+    for rec in documents:
+        frequencies: dict[str, float] = {}
+        length = 0.0
+        for field_name, weight in SEARCH_FIELDS[type(rec).__name__].items():
+            terms = tokenize(str(getattr(rec, field_name, "") or ""))
+            length += weight * len(terms)
+            for term in terms:
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+        if frequencies:
+            weighted.append((rec.idno, frequencies, length))
+    average = sum(length for _, _, length in weighted) / len(weighted)
+
+    scores: dict[str, float] = {}
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(1 for _, frequencies, _ in weighted if term in frequencies)
+        idf = math.log(1 + (len(weighted) - df + 0.5) / (df + 0.5))
+        for idno, frequencies, length in weighted:
+            tf = frequencies.get(term)
+            if tf:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average)
+                scores[idno] = scores.get(idno, 0.0) + idf * tf * (BM25_K1 + 1) / (
+                    tf + norm
+                )
+    return scores
+
+
+@pytest.fixture
+def small_index(tmp_path: Path) -> Iterator[SearchIndex]:
+    """An index of RECORDS."""
+    path = tmp_path / "search.idx"
+    stats = build_search_index(RECORDS, path)
+    assert stats.documents == len(RECORDS)
+    with SearchIndex(path) as index:
+        yield index
+
+
+@pytest.fixture(scope="module")
+def documents(migrated: MigratedRecords) -> list[Any]:
+    """Every destination record the search index takes."""
+    return [
+        rec for rec in iter_migrated(migrated) if type(rec).__name__ in SEARCH_FIELDS
+    ]
+
+
+def test_titles_outrank_descriptions(small_index: SearchIndex) -> None:
+    """A term in a title counts for more than the same term in a longer description."""
+    hits = small_index.search("mill")
+    assert [hit.idno for hit in hits][0] == "LAI0000001"
+    assert {hit.idno for hit in hits} == {"LAI0000001", "LAI0000002", "LAE0000001"}
+    assert hits == sorted(hits, key=lambda hit: -hit.score)
+    assert len(small_index.search("mill", limit=2)) == 2
+
+
+def test_terms_are_folded(small_index: SearchIndex) -> None:
+    """Case and accents don't matter, stopwords and unknown words match nothing."""
+    assert [hit.idno for hit in small_index.search("BELA")] == ["LAE0000001"]
+    assert small_index.search("the of and") == []
+    assert small_index.search("zeppelin") == []
+
+
+def test_scores_match_brute_force(
+    migrated: MigratedRecords, documents: list[Any], tmp_path: Path
+) -> None:
+    """Every query gets exactly the records and BM25 scores a scan of every record gives."""
+    path = tmp_path / "search.idx"
+    build_search_index(iter_migrated(migrated), path)
+    vocabulary = sorted(
+        {
+            term
+            for rec in documents
+            for field_name in ("name", "title")
+            for term in tokenize(str(getattr(rec, field_name, "")))
+        }
+    )
+    rng = random.Random(0)
+    queries = [" ".join(rng.sample(vocabulary, rng.randint(1, 3))) for _ in range(20)]
+    with SearchIndex(path) as index:
+        for query in queries:
+            expected = brute_force(documents, query)
+            hits = index.search(query, limit=len(expected) or 1)
+            assert len(hits) == len(expected), query
+            for hit in hits:
+                assert math.isclose(hit.score, expected[hit.idno], rel_tol=1e-5), (
+                    query,
+                    hit,
+                )
+
+
+def test_kinds_filter(migrated: MigratedRecords, tmp_path: Path) -> None:
+    """Hits are labelled with table names, the same ones the kinds filter takes, and an unknown kind is an error."""
+    index_path = tmp_path / "search.idx"
+    build_search_index(iter_migrated(migrated), index_path)
+    query = migrated.items[0].title
+    with SearchIndex(index_path) as index:
+        hits = index.search(query, limit=50)
+        assert {hit.kind for hit in hits} <= {"items", "entities", "subjects"}
+        assert migrated.items[0].idno in {hit.idno for hit in hits}
+        items = index.search(query, limit=50, kinds=["items"])
+        assert items
+        assert all(hit.kind == "items" for hit in items)
+        with pytest.raises(KeyError, match="Unexpected kind: item"):
+            index.search(query, kinds=["item"])
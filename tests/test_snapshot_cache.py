@@ -0,0 +1,69 @@
+"""Reusing validated tables between runs."""
+
+import json
+import shutil
+from pathlib import Path
+
+from lakeland_db_migrate_v4.parallel import TABLE_FIELDMAPS, validate_all
+from lakeland_db_migrate_v4.snapshot_cache import SnapshotCache
+
+
+def copy_export(source_dir: Path, target: Path) -> Path:
+    """Copy the synthetic files table somewhere it can be changed."""
+    target.mkdir(parents=True)
+    shutil.copy(source_dir / "files.json", target / "files.json")
+    return target
+
+
+def test_hit_then_miss_after_a_change(source_dir: Path, tmp_path: Path) -> None:
+    """An unchanged table is loaded, a changed one validated again and its old entry replaced."""
+    export = copy_export(source_dir, tmp_path / "export")
+    cache = SnapshotCache(tmp_path / "cache")
+    first = validate_all(export, workers=1, tables=["files"], cache=cache)
+    again = validate_all(export, workers=1, tables=["files"], cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert again["files"].records == first["files"].records
+
+    records = json.loads((export / "files.json").read_text())
+    del records[0]
+    (export / "files.json").write_text(json.dumps(records))
+    changed = validate_all(export, workers=1, tables=["files"], cache=cache)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert changed["files"].records == first["files"].records[1:]
+    assert len(list(cache.directory.glob("*.pickle"))) == 1
+
+
+def test_fieldmap_and_validator_change_the_key(tmp_path: Path) -> None:
+    path = tmp_path / "files.json"
+    path.write_text("[]")
+    cache = SnapshotCache(tmp_path / "cache")
+    fieldmap = TABLE_FIELDMAPS["files"]
+    key = cache.key(path, fieldmap, "FileSourceRecord")
+    assert cache.key(path, dict(fieldmap), "FileSourceRecord") == key
+    renamed = {**fieldmap, "Legacy Checksum": "legacy_idno_lchp"}
+    assert cache.key(path, renamed, "FileSourceRecord") != key
+    assert cache.key(path, fieldmap, "ItemSourceRecord") != key
+
+    cache.store(key, "validated")
+    assert cache.load(cache.key(path, renamed, "FileSourceRecord")) is None
+    assert cache.load(key) == "validated"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_exports_of_the_same_table_keep_their_own_entries(
+    source_dir: Path, tmp_path: Path
+) -> None:
+    """Two directories with a files.json don't evict each other."""
+    older = copy_export(source_dir, tmp_path / "older")
+    newer = copy_export(source_dir, tmp_path / "newer")
+    records = json.loads((newer / "files.json").read_text())
+    (newer / "files.json").write_text(json.dumps(records[:10]))
+    cache = SnapshotCache(tmp_path / "cache")
+    for export in (older, newer, older, newer):
+        validate_all(export, workers=1, tables=["files"], cache=cache)
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert len(list(cache.directory.glob("files-*.pickle"))) == 2
+
+    cache.clear()
+    validate_all(older, workers=1, tables=["files"], cache=cache)
+    assert cache.misses == 3
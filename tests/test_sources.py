@@ -0,0 +1,217 @@
+"""Streaming source exports and validating them, in full or trusted."""
+
+import io
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from lakeland_db_migrate_v4.instrumentation import Instrumentation
+from lakeland_db_migrate_v4.parallel import TABLE_FIELDMAPS
+from lakeland_db_migrate_v4.sources import (
+    AIRTABLE_JSON,
+    FileSourceRecord,
+    compile_renamer,
+    iter_json_array,
+    load_schema_fingerprint,
+    same_value,
+    store_schema_fingerprint,
+    stream_from_file,
+    validate_records,
+    validate_trusted,
+    validator_switch,
+)
+
+# Numbers, escapes and nesting that a small chunk_size cuts in awkward places
+AWKWARD = [
+    {
+        "airtable_id": "rec0000000000000",
+        "quote": 'say "hi" \\ back\\',
+        "unicode": "caf\u00e9 \U0001f600 \u2028",
+        "numbers": [0, -0.0, 12345678901234567890, 1.5e-7, -42, 3.25],
+        "nested": {"empty": {}, "list": [[], [None, True, False]]},
+    },
+    "a bare string with a ] and a , in it",
+    123456789,
+    -1.25e10,
+    None,
+    True,
+    [],
+    {},
+]
+
+
+def decoded(text: str, chunk_size: int) -> list:
+    """Everything iter_json_array gets out of text."""
+    return list(iter_json_array(io.StringIO(text), chunk_size))
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_json_array_across_chunk_boundaries(indent: object) -> None:
+    """Members come out as json.loads gives them, wherever the chunks split."""
+    text = json.dumps(AWKWARD, indent=indent, ensure_ascii=bool(indent))
+    for chunk_size in list(range(1, 40)) + [len(text), 65536]:
+        assert decoded(text, chunk_size) == AWKWARD, chunk_size
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("[]", []),
+        ("  \n\t[ \n ]  ", []),
+        ("\n  [1,2 , 3\n]", [1, 2, 3]),
+        ("\ufeff[1, 22]", [1, 22]),
+        ("[12][3]", [12]),
+    ],
+)
+def test_iter_json_array_whitespace_and_bom(text: str, expected: list) -> None:
+    """Whitespace and a leading byte order mark are skipped, and decoding stops at the closing bracket."""
+    for chunk_size in (1, 2, 3, 65536):
+        assert decoded(text, chunk_size) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "   ",
+        "{}",
+        "[1, 2",
+        "[1 2]",
+        '["unterminated',
+        "[1,]",
+        "[{",
+        "[tru]",
+        "[1,,2]",
+    ],
+)
+def test_iter_json_array_rejects_bad_input(text: str) -> None:
+    """Truncated or malformed input is a JSONDecodeError, not silently fewer records."""
+    for chunk_size in (1, 3, 65536):
+        with pytest.raises(json.JSONDecodeError):
+            decoded(text, chunk_size)
+
+
+def test_stream_from_file(tmp_path: Path, capsys: pytest.CaptureFixture) -> None:
+    """Records stream out with their keys collected, and a missing file is reported and gives nothing."""
+    records = [{"airtable_id": "rec1", "ID": "A"}, {"airtable_id": "rec2", "Name": "B"}]
+    (tmp_path / "entities.json").write_text(json.dumps(records))
+    keys: dict[str, None] = {}
+    assert list(stream_from_file("entities.json", keys, tmp_path)) == records
+    assert list(keys) == ["airtable_id", "ID", "Name"]
+
+    assert list(stream_from_file("missing.json", source_dir=tmp_path)) == []
+    assert "missing.json" in capsys.readouterr().out
+
+
+def test_trusted_matches_full(source_dir: Path, tmp_path: Path) -> None:
+    """Recording a fingerprint and then building from it both give what full validation gives, from one-shot streams."""
+    schema_file = tmp_path / "schema_fingerprints.json"
+    for table, fieldmap in TABLE_FIELDMAPS.items():
+        validator = validator_switch[table]
+        fname = table + ".json"
+        full = validate_records(
+            stream_from_file(fname, source_dir=source_dir), validator, fieldmap, table
+        )
+        for _ in range(2):
+            trusted = validate_trusted(
+                stream_from_file(fname, source_dir=source_dir),
+                validator,
+                fieldmap,
+                table,
+                schema_file=schema_file,
+            )
+            assert same_value(trusted.records, full.records), table
+            assert same_value(trusted.failures, full.failures), table
+        assert load_schema_fingerprint(validator, fieldmap, schema_file), table
+
+
+def test_mismatch_drops_fingerprint(source_dir: Path, tmp_path: Path) -> None:
+    """A fingerprint that vouches for a value validation would coerce is caught by sampling, dropped, and the batch validated in full."""
+    schema_file = tmp_path / "schema_fingerprints.json"
+    validator = validator_switch["entities"]
+    fieldmap = TABLE_FIELDMAPS["entities"]
+    raw = list(stream_from_file("entities.json", source_dir=source_dir))
+    validate_trusted(raw, validator, fieldmap, schema_file=schema_file)
+
+    schema = load_schema_fingerprint(validator, fieldmap, schema_file)
+    assert schema is not None
+    schema["airtable_created_time"].append("int")
+    store_schema_fingerprint(validator, fieldmap, schema, schema_file)
+    drifted: list[AIRTABLE_JSON] = [dict(rec) for rec in raw]
+    drifted[0]["airtable_createdTime"] = 20210304
+
+    full = validate_records(drifted, validator, fieldmap)
+    trusted = validate_trusted(
+        iter(drifted),
+        validator,
+        fieldmap,
+        sample_rate=1.0,
+        schema_file=schema_file,
+        reopen=lambda: iter(drifted),
+    )
+    assert same_value(trusted.records, full.records)
+    assert same_value(trusted.failures, full.failures)
+    assert load_schema_fingerprint(validator, fieldmap, schema_file) is None
+
+
+def old_rename(raw: AIRTABLE_JSON, fieldmap: dict[str, str]) -> dict[str, Any]:
+    """Rename and unwrap a record the way validate_inputs did one record at a time."""
+    rec = {fieldmap[name]: val for name, val in raw.items() if name in fieldmap}
+    for k in rec.keys():
+        if isinstance(rec[k], list):
+            if len(rec[k]) == 1:
+                rec[k] = rec[k][0]
+    return rec
+
+
+def test_compiled_renamer_matches_old_mapping(source_dir: Path) -> None:
+    for table, fieldmap in TABLE_FIELDMAPS.items():
+        rename = compile_renamer(fieldmap)
+        for raw in stream_from_file("{}.json".format(table), source_dir=source_dir):
+            assert rename(raw) == old_rename(raw, fieldmap), raw["airtable_id"]
+
+
+def test_failures_carry_hints_and_table(source_dir: Path) -> None:
+    """A missing field names the record it was in, a bad value gets pydantic's message, and both count against the table."""
+    fieldmap = TABLE_FIELDMAPS["files"]
+    raw_name = {target: name for name, target in fieldmap.items()}
+    records = list(stream_from_file("files.json", source_dir=source_dir))[:3]
+    missing = dict(records[0])
+    del missing[raw_name["linked_accession"]]
+    bad = dict(records[1], **{raw_name["legacy_checksum"]: {"md5": "abc"}})
+
+    instrumentation = Instrumentation()
+    report = validate_records(
+        [missing, bad, records[2]],
+        FileSourceRecord,
+        fieldmap,
+        "files",
+        instrumentation,
+    )
+    assert report.table == "files"
+    assert len(report.records) == 1
+    typed, invalid = report.failures
+    idno = old_rename(missing, fieldmap)["idno"]
+    assert (typed.airtable_idno, typed.hint, typed.error_type) == (
+        missing["airtable_id"],
+        "— (File) {}".format(idno),
+        "TypeError",
+    )
+    assert "linked_accession" in typed.message
+    assert str(typed) == "Error loading record {} — (File) {}: {}".format(
+        missing["airtable_id"], idno, typed.message
+    )
+    assert (invalid.airtable_idno, invalid.error_type) == (
+        bad["airtable_id"],
+        "ValidationError",
+    )
+    assert "legacy_checksum" in str(invalid)
+    assert instrumentation.report()["failures"] == {
+        "files": {"TypeError": 1, "ValidationError": 1}
+    }
+
+    unnamed = validate_records([missing], FileSourceRecord, fieldmap)
+    assert unnamed.table == "FileSourceRecord"
+    assert unnamed.failures == [typed]
@@ -0,0 +1,143 @@
+"""Normalizing NAS paths and dates."""
+
+import random
+
+import pytest
+from bench_paths import outcome, random_field, reference_handle_paths
+from synthetic import iso_date
+
+from lakeland_db_migrate_v4.utils import (
+    derive_date,
+    handle_paths,
+    normalize_date,
+    normalize_dates,
+    normalized_or_raw,
+)
+
+CASES = 20000
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_handle_paths_matches_pathlib_version(seed: int) -> None:
+    """Randomized messy path fields get the same output, or the same exception, as the old implementation."""
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        field = random_field(rng)
+        assert outcome(handle_paths, field) == outcome(
+            reference_handle_paths, field
+        ), field
+
+
+@pytest.mark.parametrize(
+    "field",
+    [
+        [""],
+        ["", ""],
+        ["/"],
+        ['""'],
+        ["Photos//Box 1/./scan.jpg"],
+        ['"/abc123/Box 1/scan.jpg"'],
+        ["Unknown Root/scan.jpg"],
+        ["//Photos/scan.jpg"],
+        ["Projects/lakeland-digital-archive/x.pdf"],
+        ["Photos/a  b/c  d.tif"],
+    ],
+)
+def test_handle_paths_edge_cases(field: list[str]) -> None:
+    """Inputs that tripped up string handling, checked by hand."""
+    assert outcome(handle_paths, field) == outcome(reference_handle_paths, field)
+
+
+def test_iso_dates_match_derive_date() -> None:
+    """Full ISO dates give the created_date and creation_year ItemRecord got from derive_date."""
+    rng = random.Random(0)
+    for datestring in [iso_date(rng) for _ in range(2000)] + [
+        "1968-05-02T10:00:00.000Z"
+    ]:
+        dtobj = derive_date(datestring)
+        normalized = normalize_date(datestring)
+        assert dtobj is not None and normalized is not None, datestring
+        assert normalized.edtf == dtobj.strftime("%Y-%m-%d"), datestring
+        assert normalized.year == dtobj.strftime("%Y"), datestring
+
+
+@pytest.mark.parametrize(
+    "datestring,precision,edtf",
+    [
+        ("1968", "year", "1968"),
+        ("1968-05", "month", "1968-05"),
+        ("May 1968", "month", "1968-05"),
+        ("Sept. 1968", "month", "1968-09"),
+        ("May 2, 1968", "day", "1968-05-02"),
+        ("2nd May 1968", "day", "1968-05-02"),
+        ("5/2/1968", "day", "1968-05-02"),
+        ("   1968  ", "year", "1968"),
+        ("circa 1968", "year", "1968~"),
+        ("c. 1968", "year", "1968~"),
+        ("c1968", "year", "1968~"),
+        ("1968?", "year", "1968~"),
+        ("1960s", "decade", "196X"),
+        ("1960's", "decade", "196X"),
+        ("ca. 1960s", "decade", "196X~"),
+        ("1950-1955", "year", "1950/1955"),
+        ("1950 - 1955", "year", "1950/1955"),
+        ("between 1950 and 1955", "year", "1950/1955"),
+        ("1950s-1960s", "decade", "195X/196X"),
+        ("May 1968 to June 1970", "month", "1968-05/1970-06"),
+        ("circa 1950-1955", "year", "1950~/1955~"),
+    ],
+)
+def test_partial_circa_and_ranged_dates(
+    datestring: str, precision: str, edtf: str
+) -> None:
+    """Partial, circa, decade and ranged dates keep their precision."""
+    normalized = normalize_date(datestring)
+    assert normalized is not None
+    assert normalized.precision == precision
+    assert normalized.edtf == edtf
+
+
+def test_periods() -> None:
+    """start and end bound everything the string could mean."""
+    decade = normalize_date("1960s")
+    assert decade is not None
+    assert (str(decade.start), str(decade.end)) == ("1960-01-01", "1969-12-31")
+    february = normalize_date("1968-02")
+    assert february is not None
+    assert str(february.end) == "1968-02-29"
+    ranged = normalize_date("1950-1955")
+    assert ranged is not None and ranged.is_range
+    assert (str(ranged.start), str(ranged.end)) == ("1950-01-01", "1955-12-31")
+
+
+@pytest.mark.parametrize(
+    "datestring",
+    [
+        "garbage",
+        "n.d.",
+        "Smarch 1968",
+        "1968-13-01",
+        "1968-13",
+        "31/31/1968",
+        "1950 - 1940",
+        "0000",
+        "0000s",
+        "0000-05",
+        "May 0000",
+        "c. 0000",
+        "0000/1968",
+    ],
+)
+def test_unparseable_dates_are_kept_raw(datestring: str) -> None:
+    """Anything we can't make sense of, year 0 included, is flagged and kept as received."""
+    normalized = normalize_date(datestring)
+    assert normalized is not None and not normalized.parsed
+    assert normalized_or_raw(datestring) == datestring
+
+
+def test_empty_and_repeated_dates() -> None:
+    """Empty strings normalize to None, and a column keeps its order."""
+    assert normalize_date("") is None
+    assert normalized_or_raw("") == ""
+    column = ["1968", "", "1968", "garbage"]
+    assert normalize_dates(column) == [normalize_date(d) for d in column]
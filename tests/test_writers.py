@@ -0,0 +1,75 @@
+"""Writing destination records out."""
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from lakeland_db_migrate_v4.destinations import EntityRecord, SubjectRecord
+from lakeland_db_migrate_v4.writers import write_sqlite
+
+
+def entity(n: int) -> EntityRecord:
+    """A minimal entity."""
+    return EntityRecord(
+        idno="recE{:013d}".format(n),
+        v3_airtable_created_time="2021-03-04T15:16:17.000Z",
+        v3_airtable_idno="recE{:013d}".format(n),
+        name="Entity {}".format(n),
+        entity_type="Person",
+    )
+
+
+def subject(n: int, items: list[str]) -> SubjectRecord:
+    """A minimal subject linking to some items."""
+    return SubjectRecord(
+        idno="recS{:013d}".format(n),
+        v3_airtable_created_time="2021-03-04T15:16:17.000Z",
+        v3_airtable_idno="recS{:013d}".format(n),
+        name="Subject {}".format(n),
+        subject_type="Topic",
+        linked_items=items,
+    )
+
+
+def count(path: Path, table: str) -> int:
+    """Rows in one table of a database."""
+    conn = sqlite3.connect(str(path))
+    try:
+        return conn.execute("SELECT COUNT(*) FROM {}".format(table)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_sqlite_rows_match_stats(tmp_path: Path) -> None:
+    """Every record and link written is in the database, across batches."""
+    path = tmp_path / "out.sqlite3"
+    records = [entity(n) for n in range(30)] + [
+        subject(n, ["LAI{:07d}".format(i) for i in range(n % 3)]) for n in range(10)
+    ]
+    stats = write_sqlite(iter(records), path, batch_size=7)
+    assert stats.rows == 40
+    assert stats.tables == {"entities": 30, "subjects": 10}
+    assert count(path, "entities") == 30
+    assert count(path, "subjects") == 10
+    assert count(path, "subjects_linked_items") == stats.links == 9
+
+
+def test_sqlite_duplicate_idno_fails(tmp_path: Path) -> None:
+    """A second record with the same idno is an error, not a silent replacement."""
+    path = tmp_path / "out.sqlite3"
+    records = [entity(n) for n in range(10)] + [entity(3)]
+    with pytest.raises(
+        RuntimeError, match="Duplicate idno in entities: recE0000000000003"
+    ):
+        write_sqlite(iter(records), path, batch_size=4)
+    assert not path.exists()
+    assert not path.with_suffix(".tmp").exists()
+
+
+def test_sqlite_rewrite_replaces_previous_run(tmp_path: Path) -> None:
+    """Writing to the same file again leaves only the new records."""
+    path = tmp_path / "out.sqlite3"
+    write_sqlite(iter([entity(n) for n in range(10)]), path)
+    write_sqlite(iter([entity(n) for n in range(100, 103)]), path)
+    assert count(path, "entities") == 3